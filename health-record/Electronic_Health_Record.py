@@ -1,115 +1,28 @@
+import io
+import os
+import pandas as pd
 import streamlit as st
-import pymysql
-from datetime import datetime
-
-import bcrypt
-
-def connect_to_db():
-    try:
-        conn = pymysql.connect(
-            host="localhost",
-            user="root",
-            port=3306,
-            password="Maurya",  # Update this with your actual MySQL root password
-            database="ehr"
-        )
-        return conn
-    except pymysql.MySQLError as e:
-        st.error(f"Error connecting to MySQL: {e}")  # Using st.error for better visibility
-        return None
-
-
-# Hash Password
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt)
-
-
-# Verify Password
-def verify_password(password, hashed):
-    # Check if hashed password is valid
-    if not hashed:
-        print("No hashed password provided.")
-        return False
-    
-    # Ensure the hash is in bytes format
-    hashed = hashed.encode('utf-8') if isinstance(hashed, str) else hashed
-
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed)
-    except ValueError as e:
-        print(f"Error verifying password: {e}")
-        return False
-
-
-
-
-
-def sign_up_patient(first_name, last_name, dob, address, phone, email, password):
-    conn = connect_to_db()
-    if conn is None:
-        print("Failed to connect to database")
-        return False
-    
-    cursor = conn.cursor()
-    hashed_pw = hash_password(password)  # Hash the password for security
-
-    query = """
-        INSERT INTO Patient (FirstName, LastName, DOB, Address, PhoneNumber, Email, Password)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (first_name, last_name, dob, address, phone, email, hashed_pw))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
-
-def sign_up_doctor(first_name, last_name, specialization,phone, email, password):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    hashed_pw = hash_password(password)  # Hash the password for security
-
-    query = """
-        INSERT INTO Doctor (FirstName, LastName, Specialization,PhoneNumber, Email, Password)
-        VALUES (%s, %s,  %s,%s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (first_name, last_name, specialization,phone, email, hashed_pw ))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error: {e}")
-        return False
-    finally:
-        conn.close()
-
-
-def fetch_patient_id(email):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "SELECT PatientID FROM Patient WHERE Email = %s"
-    try:
-        cursor.execute(query, (email,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]  # Return the PatientID
-        else:
-            print("No patient found with this email.")
-            return None
-    except Exception as e:
-        print(f"Error fetching PatientID: {e}")
-        return None
-    finally:
-        conn.close()
-
-
-
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from availability import DEFAULT_HOURS, WEEKDAYS, Shift, free_slots, working_hours
+from exports import EXPORTS, FORMATS, run_export
+from filters import filter_inputs
+from frames import full_name, rows_frame
+from instrumentation import PAGES, SLOW_QUERY_MS, PageTotal, QueryTotal, SlowQuery, get_query_stats, track_page
+from metrics import start_metrics_server
+from pagination import page_cursor, render_pager, reset_pager
+from passwords import hash_password, needs_rehash, rehash_in_background, verify_password
+import profiler
+from profiler import PROFILE_DIR, PROFILE_INTERVAL_MS
+from query_cache import get_query_cache
+import repositories as repo
+from scheduling import MAX_SERIES_OCCURRENCES, plan_series
+from sessions import authorized_session, bind_session, current_session, end_session, get_session_store
+
+
+@track_page
 def sign_up_patient_ui():
     st.subheader("Patient Sign-Up")
     first_name = st.text_input("First Name")
@@ -127,18 +40,19 @@ def sign_up_patient_ui():
         elif not all([first_name, last_name, dob, address, phone, email, password]):
             st.error("All fields are required!")
         else:
-            success = sign_up_patient(first_name, last_name, dob, address, phone, email, password)
+            hashed_pw = hash_password(password)  # Hash the password for security
+            success = repo.patients.create(first_name, last_name, dob, address, phone, email, hashed_pw)
             if success:
                 st.success("Patient account created successfully!")
-                st.session_state["logged_in"] = True
-                st.session_state["user_id"] = fetch_patient_id(email)  # Fetch the new patient ID
-                st.session_state["role"] = "Patient"
+                profile = {"first_name": first_name, "last_name": last_name, "email": email}
+                patient_id = repo.patients.id_for_email(email)  # Fetch the new patient ID
+                bind_session(get_session_store().create(patient_id, "Patient", profile))
                 st.session_state["redirect_to_create"] = True  # Set redirection
             else:
                 st.error("Failed to create account. Please try again.")
 
 
-
+@track_page
 def sign_up_doctor_ui():
     st.subheader("Doctor Sign-Up")
 
@@ -156,33 +70,34 @@ def sign_up_doctor_ui():
         elif not all([first_name, last_name, specialization,phone,  email, password]):
             st.error("All fields are required!")
         else:
-            success = sign_up_doctor(first_name, last_name, specialization,phone, email, password)
+            hashed_pw = hash_password(password)  # Hash the password for security
+            success = repo.doctors.create(first_name, last_name, specialization, phone, email, hashed_pw)
             if success:
                 st.success("Doctor account created successfully!")
             else:
                 st.error("Failed to create account. Please try again.")
 
 def login_user(email, password, role):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    if role == "Patient":
-        query = "SELECT PatientID, Password FROM Patient WHERE Email=%s"
-    elif role == "Doctor":
-        query = "SELECT DoctorID, Password FROM Doctor WHERE Email=%s"
-    elif role == "Admin" :
-        query = "SELECT id, password FROM admin WHERE Email=%s"
-    else:
+    accounts = repo.ACCOUNTS.get(role)
+    if accounts is None:
         return None, False
 
-    cursor.execute(query, (email,))
-    result = cursor.fetchone()
-    conn.close()
-
-    if result and verify_password(password, result[1]):  # Compare hashed password
-        return result[0], True  # Return user ID and login success
+    # Load the profile and wallet with the credentials so the session can
+    # answer identity questions without going back to the database
+    user = accounts.credentials(email)
+    if user and verify_password(password, user.password_hash):  # Compare hashed password
+        if needs_rehash(user.password_hash):
+            # Upgrade hashes made at an older cost without delaying the login;
+            # the write runs on a bcrypt worker, which has no page to show errors on
+            rehash_in_background(
+                password, lambda hashed_pw: accounts.update_password(user.user_id, hashed_pw, background=True))
+        profile = {"first_name": user.first_name, "last_name": user.last_name, "email": user.email}
+        session = get_session_store().create(user.user_id, role, profile, user.wallet_id)
+        return session, True  # Return the signed session and login success
     return None, False
 
+
+@track_page
 def login_ui():
     st.subheader("Login")
     role = st.radio("Role", ["Patient", "Doctor", "Admin"])
@@ -190,83 +105,39 @@ def login_ui():
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        user_id, success = login_user(email, password, role)
+        with st.spinner("Signing in..."):
+            session, success = login_user(email, password, role)
         if success:
             st.success(f"Welcome back, {role}!")
-            st.session_state["logged_in"] = True
-            st.session_state["user_id"] = user_id
-            st.session_state["role"] = role
+            bind_session(session)
             st.session_state["redirect_to_create"] = True  # Set redirection
         else:
             st.error("Invalid email or password.")
 
 
+@track_page
 def logout_ui():
     if st.button("Logout"):
-        st.session_state["logged_in"] = False
-        st.session_state["user_id"] = None
-        st.session_state["role"] = None
+        end_session()  # Revokes the session token server-side
         st.success("You have been logged out.")
 
 
-def fetch_doctors():
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    query = "SELECT DoctorID, FirstName, LastName, Specialization FROM Doctor"
-    try:
-        cursor.execute(query)
-        doctors = cursor.fetchall()
-        return doctors
-    except Exception as e:
-        print(f"Error fetching doctors: {e}")
-        return []
-    finally:
-        conn.close()
-
-
-def create_appointment(patient_id, doctor_id, date, time):
-    conn = connect_to_db()
-    if conn is None:
-        return False
-        
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO Appointment (PatientID, DoctorID, AppointmentDate, AppointmentTime)
-        VALUES (%s, %s, %s, %s)
-    """
-    try:
-        # Convert date and time to strings if they aren't already
-        date_str = date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else date
-        time_str = time.strftime('%H:%M:%S') if hasattr(time, 'strftime') else time
-        
-        cursor.execute(query, (patient_id, doctor_id, date_str, time_str))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error creating appointment: {e}")
-        return False
-    finally:
-        cursor.close()
-        conn.close()
-
-
-
-
-
+@track_page
 def create_appointment_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Patient":
+    session = authorized_session("appointments:own")
+    if session is None:
         st.warning("You must log in as a patient to create an appointment.")
         return
 
     st.subheader("Create an Appointment")
 
     # Fetch and display doctors
-    doctors = fetch_doctors()
+    doctors = repo.doctors.all()
     if not doctors:
         st.warning("No doctors available.")
         return
 
-    doctor_options = {f"{doc[1]} {doc[2]} ({doc[3]})": doc[0] for doc in doctors}  # Format: "FirstName LastName (Specialization)"
+    doctor_options = {f"{doc.first_name} {doc.last_name} ({doc.specialization})": doc.doctor_id for doc in doctors}
     selected_doctor = st.selectbox("Select a Doctor", options=list(doctor_options.keys()))
     doctor_id = doctor_options[selected_doctor]
 
@@ -275,67 +146,32 @@ def create_appointment_ui():
     date = st.date_input("Select Appointment Date", 
                         min_value=current_date,
                         value=current_date)
-    
-    time = st.time_input("Select Appointment Time", 
-                        value=datetime.now().time())
+
+    # Only the doctor's free slots are offered
+    slots = free_slots(doctor_id, date)
+    if not slots:
+        st.info("No free slots on this day. Please pick another date.")
+        return
+    time = st.selectbox("Select Appointment Time", slots, format_func=lambda slot: slot.strftime("%H:%M"))
 
     if st.button("Create Appointment"): 
-        # Validate date and time
-        if date < current_date:
-            st.error("Please select a future date.")
-            return
-            
-        try:
-            patient_id = st.session_state["user_id"]
-            success = create_appointment(patient_id, doctor_id, date, time)
-            if success:
-                st.success("Appointment created successfully!")
-            else:
-                st.error("Failed to create appointment. Please try again.")
-        except Exception as e:
-            st.error(f"Error creating appointment: {str(e)}")
-            print(f"Detailed error: {e}")
-
-# Fetch patient appointments
-def fetch_patient_appointments(patient_id):
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            a.AppointmentID, 
-            a.AppointmentDate, 
-            a.AppointmentTime, 
-            d.FirstName AS DoctorFirstName, 
-            d.LastName AS DoctorLastName, 
-            d.Specialization
-        FROM 
-            Appointment a
-        JOIN 
-            Doctor d ON a.DoctorID = d.DoctorID
-        WHERE 
-            a.PatientID = %s
-        ORDER BY 
-            a.AppointmentDate DESC, a.AppointmentTime DESC
-    """
-    try:
-        cursor.execute(query, (patient_id,))
-        appointments = cursor.fetchall()
-        return appointments
-    except Exception as e:
-        st.error(f"Error fetching appointments: {e}")
-        return []
-    finally:
-        conn.close()
+        result = repo.appointments.book(session.user_id, doctor_id, date, time)
+        if result.status == "booked":
+            st.success("Appointment created successfully!")
+        else:
+            st.error(result.message)
 
+@track_page
 def view_patient_appointments_ui():
     st.subheader("Your Appointments")
 
+    session = authorized_session("appointments:own")
+    if session is None:
+        st.warning("You must log in as a patient to view your appointments.")
+        return
+
     # Fetch appointments for the logged-in patient
-    patient_id = st.session_state["user_id"]
-    appointments = fetch_patient_appointments(patient_id)
+    appointments = repo.appointments.for_patient(session.user_id)
 
     if not appointments:
         st.info("You have no appointments.")
@@ -345,60 +181,27 @@ def view_patient_appointments_ui():
     st.write("### Your Appointments (Latest at the Top)")
     appointment_data = [
         {
-            "Appointment ID": appt[0],
-            "Date": appt[1],
-            "Time": appt[2],
-            "Doctor": f"{appt[3]} {appt[4]}",
-            "Specialization": appt[5],
+            "Appointment ID": appt.appointment_id,
+            "Date": appt.date,
+            "Time": appt.time,
+            "Doctor": f"{appt.doctor_first_name} {appt.doctor_last_name}",
+            "Specialization": appt.specialization,
         }
         for appt in appointments
     ]
     st.dataframe(appointment_data)
 
-def fetch_doctor_appointments(doctor_id):
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            a.AppointmentID, 
-            a.AppointmentDate, 
-            a.AppointmentTime, 
-            p.FirstName AS PatientFirstName, 
-            p.LastName AS PatientLastName, 
-            p.Email AS PatientEmail
-        FROM 
-            Appointment a
-        JOIN 
-            Patient p ON a.PatientID = p.PatientID
-        WHERE 
-            a.DoctorID = %s
-        ORDER BY 
-            a.AppointmentDate DESC, a.AppointmentTime DESC
-    """
-    try:
-        cursor.execute(query, (doctor_id,))
-        appointments = cursor.fetchall()
-        return appointments
-    except Exception as e:
-        st.error(f"Error fetching appointments: {e}")
-        return []
-    finally:
-        conn.close()
-
-
+@track_page
 def view_doctor_appointments_ui():
     st.subheader("Your Appointments")
 
     # Fetch appointments for the logged-in doctor
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Doctor":
+    session = authorized_session("appointments:assigned")
+    if session is None:
         st.warning("You must log in as a doctor to view your appointments.")
         return
 
-    doctor_id = st.session_state["user_id"]
-    appointments = fetch_doctor_appointments(doctor_id)
+    appointments = repo.appointments.for_doctor(session.user_id)
 
     if not appointments:
         st.info("You have no appointments scheduled.")
@@ -408,49 +211,28 @@ def view_doctor_appointments_ui():
     st.write("### Your Appointments (Latest at the Top)")
     appointment_data = [
         {
-            "Appointment ID": appt[0],
-            "Date": appt[1],
-            "Time": appt[2],
-            "Patient": f"{appt[3]} {appt[4]}",
-            "Patient Email": appt[5],
+            "Appointment ID": appt.appointment_id,
+            "Date": appt.date,
+            "Time": appt.time,
+            "Patient": f"{appt.patient_first_name} {appt.patient_last_name}",
+            "Patient Email": appt.patient_email,
         }
         for appt in appointments
     ]
     st.dataframe(appointment_data)
 
 
-# Update Appointment
-def update_appointment(appointment_id, new_date, new_time):
-    conn = connect_to_db()
-    if conn is None:
-        return False
-
-    cursor = conn.cursor()
-    query = """
-        UPDATE Appointment
-        SET AppointmentDate = %s, AppointmentTime = %s
-        WHERE AppointmentID = %s
-    """
-    try:
-        cursor.execute(query, (new_date, new_time, appointment_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error updating appointment: {e}")
-        return False
-    finally:
-        conn.close()
-
+@track_page
 def update_appointment_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Patient":
+    session = authorized_session("appointments:own")
+    if session is None:
         st.warning("You must log in as a patient to manage appointments.")
         return
 
     st.subheader("Update an Appointment")
 
     # Fetch appointments for the logged-in patient
-    patient_id = st.session_state["user_id"]
-    appointments = fetch_patient_appointments(patient_id)
+    appointments = repo.appointments.for_patient(session.user_id)
 
     if not appointments:
         st.info("You have no appointments to update.")
@@ -458,56 +240,40 @@ def update_appointment_ui():
 
     # Create options for the appointment select box
     appointment_options = {
-        f"Appointment {appt[0]}: {appt[1]} {appt[2]} with Dr. {appt[3]} {appt[4]} ({appt[5]})": appt[0]
+        f"Appointment {appt.appointment_id}: {appt.date} {appt.time} with Dr. "
+        f"{appt.doctor_first_name} {appt.doctor_last_name} ({appt.specialization})": appt
         for appt in appointments
     }
     selected_appointment = st.selectbox("Select an Appointment", list(appointment_options.keys()))
-    appointment_id = appointment_options[selected_appointment]
+    appointment = appointment_options[selected_appointment]
 
-    # Update details
+    # Update details; only the same doctor's free slots are offered
     current_date = datetime.now().date()
     new_date = st.date_input("New Appointment Date", min_value=current_date)
-    new_time = st.time_input("New Appointment Time")
+    slots = free_slots(appointment.doctor_id, new_date)
+    if not slots:
+        st.info("No free slots on this day. Please pick another date.")
+        return
+    new_time = st.selectbox("New Appointment Time", slots, format_func=lambda slot: slot.strftime("%H:%M"))
 
     if st.button("Update Appointment"):
-        if new_date < current_date:
-            st.error("Please select a future date.")
-            return
-
-        success = update_appointment(appointment_id, new_date, new_time)
-        if success:
+        result = repo.appointments.reschedule(appointment.appointment_id, appointment.doctor_id, new_date, new_time)
+        if result.status == "booked":
             st.success("Appointment updated successfully!")
         else:
-            st.error("Failed to update appointment. Please try again.")
-
-# Delete Appointment
-def delete_appointment(appointment_id):
-    conn = connect_to_db()
-    if conn is None:
-        return False
-
-    cursor = conn.cursor()
-    query = "DELETE FROM Appointment WHERE AppointmentID = %s"
-    try:
-        cursor.execute(query, (appointment_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error deleting appointment: {e}")
-        return False
-    finally:
-        conn.close()
+            st.error(result.message)
 
+@track_page
 def delete_appointment_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Patient":
+    session = authorized_session("appointments:own")
+    if session is None:
         st.warning("You must log in as a patient to manage appointments.")
         return
 
     st.subheader("Delete an Appointment")
 
     # Fetch appointments for the logged-in patient
-    patient_id = st.session_state["user_id"]
-    appointments = fetch_patient_appointments(patient_id)
+    appointments = repo.appointments.for_patient(session.user_id)
 
     if not appointments:
         st.info("You have no appointments to delete.")
@@ -515,14 +281,15 @@ def delete_appointment_ui():
 
     # Create options for the appointment select box
     appointment_options = {
-        f"Appointment {appt[0]}: {appt[1]} {appt[2]} with Dr. {appt[3]} {appt[4]} ({appt[5]})": appt[0]
+        f"Appointment {appt.appointment_id}: {appt.date} {appt.time} with Dr. "
+        f"{appt.doctor_first_name} {appt.doctor_last_name} ({appt.specialization})": appt.appointment_id
         for appt in appointments
     }
     selected_appointment = st.selectbox("Select an Appointment to Delete", list(appointment_options.keys()))
     appointment_id = appointment_options[selected_appointment]
 
     if st.button("Delete Appointment"):
-        success = delete_appointment(appointment_id)
+        success = repo.appointments.delete(appointment_id)
         if success:
             st.success("Appointment deleted successfully!")
         else:
@@ -531,110 +298,114 @@ def delete_appointment_ui():
             st.warning("You must log in as a patient to delete an appointment.")
 
 
-
-def fetch_all_appointments():
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            a.AppointmentID, 
-            a.AppointmentDate, 
-            a.AppointmentTime, 
-            p.FirstName AS PatientFirstName, 
-            p.LastName AS PatientLastName, 
-            p.Email AS PatientEmail, 
-            d.FirstName AS DoctorFirstName, 
-            d.LastName AS DoctorLastName, 
-            d.Specialization
-        FROM 
-            Appointment a
-        JOIN 
-            Patient p ON a.PatientID = p.PatientID
-        JOIN 
-            Doctor d ON a.DoctorID = d.DoctorID
-        ORDER BY 
-            a.AppointmentDate DESC, a.AppointmentTime DESC
-    """
-    try:
-        cursor.execute(query)
-        appointments = cursor.fetchall()
-        return appointments
-    except Exception as e:
-        st.error(f"Error fetching appointments: {e}")
-        return []
-    finally:
-        conn.close()
-
-
+@track_page
 def admin_view_patient_appointments_ui():
     st.subheader("Admin - All Appointments")
-    
-    # Fetch all appointments
-    appointments = fetch_all_appointments()
+
+    if authorized_session("appointments:all") is None:
+        st.warning("You must log in as an admin to view all appointments.")
+        return
+
+    # Filters and paging are applied in SQL
+    filters = filter_inputs("admin_appointments")
+    page_size, after, before = page_cursor("admin_appointments")
+    page = repo.appointments.page(page_size, after=after, before=before, **filters)
+    appointments = page.rows
 
     if not appointments:
         st.info("No appointments found.")
+        render_pager("admin_appointments", page)
         return
 
     # Format and display appointments
     st.write("### All Appointments (Latest at the Top)")
-    appointment_data = [
-        {
-            "Appointment ID": appt[0],
-            "Date": appt[1],
-            "Time": appt[2],
-            "Patient": f"{appt[3]} {appt[4]}",
-            "Patient Email": appt[5],
-            "Doctor": f"{appt[6]} {appt[7]}",
-            "Specialization": appt[8],
-        }
-        for appt in appointments
-    ]
-    st.dataframe(appointment_data)
+    frame = rows_frame(appointments, repo.AdminAppointment, {"date": "date", "time": "time"})
+    frame["scheduled"] = frame["date"] + frame["time"]
+    frame["patient"] = full_name(frame, "patient_first_name", "patient_last_name")
+    frame["doctor"] = full_name(frame, "doctor_first_name", "doctor_last_name")
+    st.dataframe(
+        frame,
+        hide_index=True,
+        column_order=["appointment_id", "scheduled", "patient", "patient_email", "doctor", "specialization"],
+        column_config={
+            "appointment_id": st.column_config.NumberColumn("Appointment ID", format="%d"),
+            "scheduled": st.column_config.DatetimeColumn("Date & Time", format="YYYY-MM-DD HH:mm"),
+            "patient": "Patient",
+            "patient_email": "Patient Email",
+            "doctor": "Doctor",
+            "specialization": "Specialization",
+        },
+    )
+    render_pager("admin_appointments", page)
+
+
+@track_page
+def schedule_series_ui():
+    st.subheader("Schedule Follow-up Series")
+
+    session = authorized_session("appointments:assigned")
+    if session is None:
+        st.warning("You must log in as a doctor to schedule follow-ups.")
+        return
+    doctor_id = session.user_id
 
-    # Optional: Add filters for searching by patient, doctor, or date
-    with st.expander("Filter Appointments"):
-        filter_type = st.selectbox("Filter by", ["None", "Patient Name", "Doctor Name", "Date"])
-        if filter_type == "Patient Name":
-            patient_name = st.text_input("Enter Patient Name")
-            if patient_name:
-                filtered_data = [
-                    appt for appt in appointment_data
-                    if patient_name.lower() in appt["Patient"].lower()
-                ]
-                st.dataframe(filtered_data)
-        elif filter_type == "Doctor Name":
-            doctor_name = st.text_input("Enter Doctor Name")
-            if doctor_name:
-                filtered_data = [
-                    appt for appt in appointment_data
-                    if doctor_name.lower() in appt["Doctor"].lower()
-                ]
-                st.dataframe(filtered_data)
-        elif filter_type == "Date":
-            date = st.date_input("Select Date")
-            if date:
-                filtered_data = [
-                    appt for appt in appointment_data
-                    if appt["Date"] == str(date)
-                ]
-                st.dataframe(filtered_data)
+    records = repo.medical_records.follow_up_options(doctor_id)
+    if not records:
+        st.info("No medical records to follow up on.")
+        return
+    record_options = {
+        f"Record {record.record_id}: {record.patient_name}, {record.appointment_date} ({record.diagnosis})": record
+        for record in records
+    }
+    record = record_options[st.selectbox("Follow up on", list(record_options.keys()))]
 
+    current_date = datetime.now().date()
+    first_date = st.date_input("First visit", min_value=current_date, value=current_date + timedelta(days=7))
+    slots = free_slots(doctor_id, first_date)
+    if not slots:
+        st.info("No free slots on the first visit's day. Please pick another date.")
+        return
+    slot = st.selectbox("Time", slots, format_func=lambda value: value.strftime("%H:%M"))
+    col1, col2 = st.columns(2)
+    interval_weeks = col1.number_input("Every (weeks)", min_value=1, max_value=12, value=1)
+    occurrences = col2.number_input("Visits", min_value=1, max_value=MAX_SERIES_OCCURRENCES, value=6)
+    skip_conflicts = st.checkbox("Skip visits that can't be booked")
+
+    # Validate every visit before anything is written
+    plan = plan_series(doctor_id, first_date, slot, occurrences, interval_weeks * 7)
+    st.dataframe(
+        [{"Date": visit.date, "Time": visit.time.strftime("%H:%M"), "Status": visit.conflict or "free"}
+         for visit in plan],
+        hide_index=True,
+    )
+
+    if st.button("Schedule Series"):
+        result = repo.appointments.schedule_series(
+            record.patient_id, doctor_id, first_date, slot, occurrences, interval_weeks * 7,
+            record_id=record.record_id, skip_conflicts=skip_conflicts,
+        )
+        if result.error:
+            st.error(result.error)
+        else:
+            st.success(f"Scheduled {len(result.appointment_ids)} visits for {record.patient_name}.")
+            if result.skipped:
+                st.warning(f"Skipped {len(result.skipped)} visits: "
+                           + ", ".join(f"{visit.date} ({visit.conflict})" for visit in result.skipped))
 
 
+@track_page
 def appointment_operations_ui():
     st.subheader("Manage Your Appointments")
 
     # Define operations based on user role
-    if st.session_state["role"] == "Patient":
+    session = current_session()
+    role = session.role if session is not None else None
+    if role == "Patient":
         operations = ["Create", "View", "Update"]
-    elif st.session_state["role"] == "Admin":
-        operations = ["View"]
-    elif st.session_state["role"] == "Doctor":
+    elif role == "Admin":
         operations = ["View"]
+    elif role == "Doctor":
+        operations = ["View", "Schedule Series"]
     else:
         st.warning("Invalid role. Please log in again.")
         return
@@ -645,79 +416,32 @@ def appointment_operations_ui():
     # Perform actions based on the selected operation
     if operation == "Create":
         create_appointment_ui()
-    elif operation == "View" and st.session_state["role"] == "Patient" :
+    elif operation == "View" and role == "Patient" :
         view_patient_appointments_ui()
-    elif operation == "View" and st.session_state["role"] == "Admin" :
+    elif operation == "View" and role == "Admin" :
         admin_view_patient_appointments_ui()   
-    elif operation == "View" and st.session_state["role"] == "Doctor" :
+    elif operation == "View" and role == "Doctor" :
         view_doctor_appointments_ui()
+    elif operation == "Schedule Series":
+        schedule_series_ui()
     elif operation == "Update":
         update_appointment_ui()
     elif operation == "Delete":
         delete_appointment_ui()
 
 
-
-
-# Function to fetch appointments with patient names for a specific doctor
-def get_doctor_appointments(doctor_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            Appointment.AppointmentID, 
-            Patient.FirstName, 
-            Appointment.AppointmentDate
-        FROM 
-            Appointment
-        JOIN 
-            Patient ON Appointment.PatientID = Patient.PatientID
-        WHERE 
-            Appointment.DoctorID = %s
-    """
-    try:
-        cursor.execute(query, (doctor_id,))
-        appointments = cursor.fetchall()
-        return appointments
-    except Exception as e:
-        print(f"Error fetching doctor appointments: {e}")
-        return []
-    finally:
-        conn.close()
-
-    
-def add_medical_record(appointment_id, prescription, diagnosis, test_taken):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        INSERT INTO MedicalRecord (AppointmentID, Prescription, Diagnosis, TestTaken)
-        VALUES (%s, %s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (appointment_id, prescription, diagnosis, test_taken))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error adding medical record: {e}")
-        return False
-    finally:
-        conn.close()
-
 # UI to add a medical record
+@track_page
 def add_medical_record_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] == "Patient":
+    session = authorized_session("records:write")
+    if session is None:
         st.warning("You must log in as a doctor to create medical records.")
         return
 
     st.subheader("Create Medical Record")
 
-    # Get doctor ID from session state
-    doctor_id = st.session_state.get("user_id")  # Assuming doctor ID is stored in session_state
-
     # Fetch appointments for the doctor
-    appointments = get_doctor_appointments(doctor_id)
+    appointments = repo.appointments.options_for_doctor(session.user_id)
 
     if not appointments:
         st.warning("No appointments found for this doctor.")
@@ -725,7 +449,7 @@ def add_medical_record_ui():
 
     # Display appointments in a dropdown with patient names
     appointment_options = {
-        f"Appointment ID: {app[0]}, Patient: {app[1]}, Date: {app[2]}": app[0]
+        f"Appointment ID: {app.appointment_id}, Patient: {app.patient_first_name}, Date: {app.date}": app.appointment_id
         for app in appointments
     }
     selected_appointment = st.selectbox("Select an Appointment", options=appointment_options.keys())
@@ -739,161 +463,58 @@ def add_medical_record_ui():
     test_taken = st.checkbox("Test Taken")
 
     if st.button("Create Medical Record"):
-        success = add_medical_record(appointment_id, prescription, diagnosis, test_taken)
+        success = repo.medical_records.create(appointment_id, prescription, diagnosis, test_taken)
         if success:
             st.success("Medical record created successfully!")
         else:
             st.error("Failed to create medical record.")
 
 
-# Function to view medical records
-def view_medical_records(appointment_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT RecordID, Prescription, Diagnosis, TestTaken
-        FROM MedicalRecord
-        WHERE AppointmentID = %s
-    """
-    try:
-        cursor.execute(query, (appointment_id,))
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        print(f"Error fetching medical records: {e}")
-        return []
-    finally:
-        conn.close()
-
-def view_medical_records_for_doctor(doctor_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            MedicalRecord.RecordID, 
-            CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName, 
-            Appointment.AppointmentDate, 
-            MedicalRecord.Prescription, 
-            MedicalRecord.Diagnosis, 
-            MedicalRecord.TestTaken
-        FROM 
-            MedicalRecord
-        JOIN 
-            Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
-        JOIN 
-            Patient ON Appointment.PatientID = Patient.PatientID
-        WHERE 
-            Appointment.DoctorID = %s;
-    """
-    try:
-        cursor.execute(query, (doctor_id,))
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        print(f"Error fetching medical records: {e}")
-        return []
-    finally:
-        conn.close()
-
-
 # UI to view medical records
+@track_page
 def view_medical_records_ui():
-    if not st.session_state.get("logged_in") :
+    session = current_session()
+    if session is None:
         st.warning("You must log in to view medical records.")
         return
 
     st.subheader("View Medical Records")
 
-    # Get the doctor ID from the session state
-    doctor_id = st.session_state.get("user_id")  # Assuming doctor ID is stored in session state
-
-    # Fetch medical records for the doctor
-    records = view_medical_records_for_doctor(doctor_id)
+    # Doctors see the records they wrote, patients their own
+    if session.has_permission("records:write"):
+        records = repo.medical_records.for_doctor(session.user_id)
+    elif session.has_permission("records:own"):
+        records = repo.medical_records.for_patient(session.user_id)
+    else:
+        st.warning("You must log in as a doctor or patient to view these medical records.")
+        return
 
     if records:
         st.write("### Medical Records")
         for record in records:
-            st.write(f"**Record ID:** {record[0]}")
-            st.write(f"**Patient Name:** {record[1]}")
-            st.write(f"**Appointment Date:** {record[2]}")
-            st.write(f"**Prescription:** {record[3]}")
-            st.write(f"**Diagnosis:** {record[4]}")
-            st.write(f"**Test Taken:** {'Yes' if record[5] else 'No'}")
+            st.write(f"**Record ID:** {record.record_id}")
+            st.write(f"**Patient Name:** {record.patient_name}")
+            st.write(f"**Appointment Date:** {record.appointment_date}")
+            st.write(f"**Prescription:** {record.prescription}")
+            st.write(f"**Diagnosis:** {record.diagnosis}")
+            st.write(f"**Test Taken:** {'Yes' if record.test_taken else 'No'}")
             st.write("---")
     else:
-        st.warning("No medical records found for this doctor.")
-
-
-# Function to update a medical record
-def update_medical_record(record_id, prescription, diagnosis, test_taken):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        UPDATE MedicalRecord
-        SET Prescription = %s, Diagnosis = %s, TestTaken = %s
-        WHERE RecordID = %s
-    """
-    try:
-        cursor.execute(query, (record_id, prescription, diagnosis, test_taken))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error updating medical record: {e}")
-        return False
-    finally:
-        conn.close()
-
-
-# Function to fetch medical records for a specific doctor
-def get_doctor_medical_records(doctor_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            MedicalRecord.RecordID, 
-            CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName, 
-            Appointment.AppointmentDate, 
-            MedicalRecord.Prescription, 
-            MedicalRecord.Diagnosis, 
-            MedicalRecord.TestTaken
-        FROM 
-            MedicalRecord
-        JOIN 
-            Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
-        JOIN 
-            Patient ON Appointment.PatientID = Patient.PatientID
-        WHERE 
-            Appointment.DoctorID = %s;
-    """
-    try:
-        cursor.execute(query, (doctor_id,))
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        print(f"Error fetching medical records: {e}")
-        return []
-    finally:
-        conn.close()
-
+        st.warning("No medical records found.")
 
 
 # UI to update a medical record
+@track_page
 def update_medical_record_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] == "Patient":
+    session = authorized_session("records:write")
+    if session is None:
         st.warning("You must log in as a doctor to update medical records.")
         return
 
     st.subheader("Update Medical Record")
 
-    # Get doctor ID from session state
-    doctor_id = st.session_state.get("user_id")  # Assuming doctor ID is stored in session_state
-
     # Fetch medical records for the doctor
-    medical_records = get_doctor_medical_records(doctor_id)
+    medical_records = repo.medical_records.for_doctor(session.user_id)
 
     if not medical_records:
         st.warning("No medical records found for this doctor.")
@@ -901,50 +522,32 @@ def update_medical_record_ui():
 
     # Display medical records in a dropdown
     record_options = {
-        f"Record ID: {rec[0]}, Patient: {rec[1]}, Date: {rec[2]}": rec
+        f"Record ID: {rec.record_id}, Patient: {rec.patient_name}, Date: {rec.appointment_date}": rec
         for rec in medical_records
     }
     selected_record = st.selectbox("Select a Medical Record", options=record_options.keys())
 
     # Get details of the selected record
-    record_id, patient_name, appointment_date, existing_prescription, existing_diagnosis, existing_test_taken = record_options[selected_record]
+    record = record_options[selected_record]
 
     # Display current details and allow editing
-    st.write(f"**Patient Name:** {patient_name}")
-    st.write(f"**Appointment Date:** {appointment_date}")
-    prescription = st.text_area("Prescription", value=existing_prescription)
-    diagnosis = st.text_area("Diagnosis", value=existing_diagnosis)
-    test_taken = st.checkbox("Test Taken", value=existing_test_taken)
+    st.write(f"**Patient Name:** {record.patient_name}")
+    st.write(f"**Appointment Date:** {record.appointment_date}")
+    prescription = st.text_area("Prescription", value=record.prescription)
+    diagnosis = st.text_area("Diagnosis", value=record.diagnosis)
+    test_taken = st.checkbox("Test Taken", value=bool(record.test_taken))
 
     if st.button("Update Medical Record"):
-        success = update_medical_record(record_id, prescription, diagnosis, test_taken)
+        success = repo.medical_records.update(record.record_id, prescription, diagnosis, test_taken)
         if success:
             st.success("Medical record updated successfully!")
         else:
             st.error("Failed to update medical record.")
 
-# Function to delete a medical record
-def delete_medical_record(record_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        DELETE FROM MedicalRecord
-        WHERE RecordID = %s
-    """
-    try:
-        cursor.execute(query, (record_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error deleting medical record: {e}")
-        return False
-    finally:
-        conn.close()
-
 # UI to delete a medical record
+@track_page
 def delete_medical_record_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Admin":
+    if authorized_session("records:all") is None:
         st.warning("You must log in as a admin to delete medical records.")
         return
 
@@ -953,117 +556,63 @@ def delete_medical_record_ui():
     record_id = st.number_input("Record ID", min_value=1, step=1)
 
     if st.button("Delete Medical Record"):
-        success = delete_medical_record(record_id)
+        success = repo.medical_records.delete(record_id)
         if success:
             st.success("Medical record deleted successfully!")
         else:
             st.error("Failed to delete medical record.")
 
 
-def view_medical_records_for_admin():
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            MedicalRecord.RecordID, 
-            CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName, 
-            Appointment.AppointmentDate, 
-            CONCAT(Doctor.FirstName, ' ', Doctor.LastName) AS DoctorName, 
-            MedicalRecord.Prescription, 
-            MedicalRecord.Diagnosis, 
-            MedicalRecord.TestTaken
-        FROM 
-            MedicalRecord
-        JOIN 
-            Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
-        JOIN 
-            Patient ON Appointment.PatientID = Patient.PatientID
-        JOIN 
-            Doctor ON Appointment.DoctorID = Doctor.DoctorID
-        ORDER BY 
-            Appointment.AppointmentDate DESC;
-    """
-    try:
-        cursor.execute(query)
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        print(f"Error fetching medical records: {e}")
-        return []
-    finally:
-        conn.close()
-
-
+@track_page
 def view_medical_records_admin_ui():
-    if not st.session_state.get("logged_in") or st.session_state.get("role") != "Admin":
+    if authorized_session("records:all") is None:
         st.warning("You must log in as an admin to view medical records.")
         return
 
     st.subheader("Admin - View All Medical Records")
 
-    # Fetch all medical records
-    records = view_medical_records_for_admin()
+    # Filters and paging are applied in SQL
+    filters = filter_inputs("admin_medical_records", date_label="Appointment Date")
+    page_size, after, before = page_cursor("admin_medical_records")
+    page = repo.medical_records.page(page_size, after=after, before=before, **filters)
+    records = page.rows
 
     if records:
         st.write("### Medical Records")
-        medical_data = [
-            {
-                "Record ID": record[0],
-                "Patient Name": record[1],
-                "Appointment Date": record[2],
-                "Assigned Doctor": record[3],
-                "Prescription": record[4],
-                "Diagnosis": record[5],
-                "Test Taken": "Yes" if record[6] else "No",
-            }
-            for record in records
-        ]
-        st.dataframe(medical_data)
-
-        # Optional: Add filters for search functionality
-        with st.expander("Filter Records"):
-            filter_type = st.selectbox("Filter by", ["None", "Patient Name", "Doctor Name", "Appointment Date"])
-            if filter_type == "Patient Name":
-                patient_name = st.text_input("Enter Patient Name")
-                if patient_name:
-                    filtered_data = [
-                        record for record in medical_data
-                        if patient_name.lower() in record["Patient Name"].lower()
-                    ]
-                    st.dataframe(filtered_data)
-            elif filter_type == "Doctor Name":
-                doctor_name = st.text_input("Enter Doctor Name")
-                if doctor_name:
-                    filtered_data = [
-                        record for record in medical_data
-                        if doctor_name.lower() in record["Assigned Doctor"].lower()
-                    ]
-                    st.dataframe(filtered_data)
-            elif filter_type == "Appointment Date":
-                date = st.date_input("Select Appointment Date")
-                if date:
-                    filtered_data = [
-                        record for record in medical_data
-                        if record["Appointment Date"] == str(date)
-                    ]
-                    st.dataframe(filtered_data)
+        frame = rows_frame(records, repo.AdminMedicalRecord, {"appointment_date": "date", "test_taken": "flag"})
+        st.dataframe(
+            frame,
+            hide_index=True,
+            column_order=["record_id", "patient_name", "appointment_date", "doctor_name",
+                          "prescription", "diagnosis", "test_taken"],
+            column_config={
+                "record_id": st.column_config.NumberColumn("Record ID", format="%d"),
+                "patient_name": "Patient Name",
+                "appointment_date": st.column_config.DateColumn("Appointment Date", format="YYYY-MM-DD"),
+                "doctor_name": "Assigned Doctor",
+                "prescription": "Prescription",
+                "diagnosis": "Diagnosis",
+                "test_taken": st.column_config.CheckboxColumn("Test Taken"),
+            },
+        )
+        render_pager("admin_medical_records", page)
     else:
         st.warning("No medical records found.")
+        render_pager("admin_medical_records", page)
 
 
+@track_page
 def medical_record_operations_ui():
     st.subheader("Manage Medical Records")
 
     # Define operations based on user role
-    if st.session_state["role"] == "Patient":
+    session = current_session()
+    role = session.role if session is not None else None
+    if role == "Patient":
         operations = ["View"]
-    elif st.session_state["role"] == "Doctor":
+    elif role == "Doctor":
         operations = ["Create", "View", "Update"]
-    elif st.session_state["role"] == "Admin":
+    elif role == "Admin":
         operations = ["View"]
     else:
         st.warning("Invalid role. Please log in again.")
@@ -1075,9 +624,9 @@ def medical_record_operations_ui():
     # Perform actions based on the selected operation
     if operation == "Create":
         add_medical_record_ui()
-    elif operation == "View"and st.session_state["role"] != "Admin" :
+    elif operation == "View"and role != "Admin" :
         view_medical_records_ui()
-    elif operation == "View" and st.session_state["role"] == "Admin" :
+    elif operation == "View" and role == "Admin" :
         view_medical_records_admin_ui()
     elif operation == "Update":
         update_medical_record_ui()
@@ -1085,27 +634,8 @@ def medical_record_operations_ui():
         delete_medical_record_ui()
 
 
-
-# Function to add a lab test
-def add_lab_test(test_name, description, cost):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        INSERT INTO LabTests (TestName, Description, Cost)
-        VALUES (%s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (test_name, description, cost))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error adding lab test: {e}")
-        return False
-    finally:
-        conn.close()
-
 # UI for adding a lab test
+@track_page
 def add_lab_test_ui():
     st.subheader("Add Lab Test")
 
@@ -1114,128 +644,80 @@ def add_lab_test_ui():
     cost = st.number_input("Cost", min_value=0.0, step=0.01)
 
     if st.button("Add Lab Test"):
-        success = add_lab_test(test_name, description, cost)
+        success = repo.lab_tests.create(test_name, description, cost)
         if success:
             st.success("Lab test added successfully!")
         else:
             st.error("Failed to add lab test.")
 
-# Function to view all lab tests
-def view_lab_tests():
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "SELECT LabTestID, TestName, Description, Cost, CreatedAt, UpdatedAt FROM LabTests"
-    try:
-        cursor.execute(query)
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        print(f"Error fetching lab tests: {e}")
-        return []
-    finally:
-        conn.close()
-
 # UI for viewing lab tests
+@track_page
 def view_lab_tests_ui():
     st.subheader("View Lab Tests")
 
-    records = view_lab_tests()
+    records = repo.lab_tests.all()
     if records:
         for record in records:
-            st.write(f"**Lab Test ID:** {record[0]}")
-            st.write(f"**Test Name:** {record[1]}")
-            st.write(f"**Description:** {record[2]}")
-            st.write(f"**Cost:** {record[3]}")
-            st.write(f"**Created At:** {record[4]}")
-            st.write(f"**Updated At:** {record[5]}")
+            st.write(f"**Lab Test ID:** {record.lab_test_id}")
+            st.write(f"**Test Name:** {record.test_name}")
+            st.write(f"**Description:** {record.description}")
+            st.write(f"**Cost:** {record.cost}")
+            st.write(f"**Created At:** {record.created_at}")
+            st.write(f"**Updated At:** {record.updated_at}")
             st.write("---")
     else:
         st.warning("No lab tests found.")
 
-# Function to update a lab test
-def update_lab_test(lab_test_id, test_name, description, cost):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        UPDATE LabTests
-        SET TestName = %s, Description = %s, Cost = %s, UpdatedAt = %s
-        WHERE LabTestID = %s
-    """
-    try:
-        cursor.execute(query, (test_name, description, cost, datetime.now(), lab_test_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error updating lab test: {e}")
-        return False
-    finally:
-        conn.close()
-
 # UI for updating a lab test
+@track_page
 def update_lab_test_ui():
     st.subheader("Update Lab Test")
 
-    records = view_lab_tests()
+    records = repo.lab_tests.all()
     if not records:
         st.warning("No lab tests found to update.")
         return
 
-    lab_test_options = {f"Lab Test ID: {rec[0]}, Name: {rec[1]}": rec for rec in records}
+    lab_test_options = {f"Lab Test ID: {rec.lab_test_id}, Name: {rec.test_name}": rec for rec in records}
     selected_lab_test = st.selectbox("Select a Lab Test", options=lab_test_options.keys())
 
-    lab_test_id, test_name, description, cost, _, _ = lab_test_options[selected_lab_test]
+    lab_test = lab_test_options[selected_lab_test]
 
-    test_name = st.text_input("Test Name", value=test_name)
-    description = st.text_area("Description", value=description)
-    cost = st.number_input("Cost", value=float(cost), min_value=0.0, step=0.01)
+    test_name = st.text_input("Test Name", value=lab_test.test_name)
+    description = st.text_area("Description", value=lab_test.description)
+    cost = st.number_input("Cost", value=float(lab_test.cost), min_value=0.0, step=0.01)
 
     if st.button("Update Lab Test"):
-        success = update_lab_test(lab_test_id, test_name, description, cost)
+        success = repo.lab_tests.update(lab_test.lab_test_id, test_name, description, cost)
         if success:
             st.success("Lab test updated successfully!")
         else:
             st.error("Failed to update lab test.")
 
-# Function to delete a lab test
-def delete_lab_test(lab_test_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "DELETE FROM LabTests WHERE LabTestID = %s"
-    try:
-        cursor.execute(query, (lab_test_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error deleting lab test: {e}")
-        return False
-    finally:
-        conn.close()
-
 # UI for deleting a lab test
+@track_page
 def delete_lab_test_ui():
     st.subheader("Delete Lab Test")
 
-    records = view_lab_tests()
+    records = repo.lab_tests.all()
     if not records:
         st.warning("No lab tests found to delete.")
         return
 
-    lab_test_options = {f"Lab Test ID: {rec[0]}, Name: {rec[1]}": rec[0] for rec in records}
+    lab_test_options = {f"Lab Test ID: {rec.lab_test_id}, Name: {rec.test_name}": rec.lab_test_id for rec in records}
     selected_lab_test = st.selectbox("Select a Lab Test", options=lab_test_options.keys())
 
     lab_test_id = lab_test_options[selected_lab_test]
 
     if st.button("Delete Lab Test"):
-        success = delete_lab_test(lab_test_id)
+        success = repo.lab_tests.delete(lab_test_id)
         if success:
             st.success("Lab test deleted successfully!")
         else:
             st.error("Failed to delete lab test.")
 
 # Main UI for Lab Test operations
+@track_page
 def lab_test_operations_ui():
     st.subheader("Manage Lab Tests")
 
@@ -1252,58 +734,66 @@ def lab_test_operations_ui():
         delete_lab_test_ui()
 
 
-def add_test_results(record_id, test_name, test_result):
-    conn = connect_to_db()
-    cursor = conn.cursor()
+def patient_picker(state_key, doctor_id=None):
+    """Typeahead patient search; returns the chosen PatientMatch or None.
 
-    query = """
-        INSERT INTO TestResults (RecordID, TestName, Result)
-        VALUES (%s, %s, %s)
+    With ``doctor_id``, only that doctor's own patients are offered.
     """
-    try:
-        cursor.execute(query, (record_id, test_name, test_result))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error adding test results: {e}")
-        return False
-    finally:
-        conn.close()
+    term = st.text_input("Find Patient", key=f"{state_key}_patient_term",
+                         placeholder="Name, email or patient ID")
+    if not term.strip():
+        return None
+    matches = repo.patients.search(term, doctor_id=doctor_id)
+    if not matches:
+        st.info("No patients match.")
+        return None
+    options = {
+        f"{match.first_name} {match.last_name} <{match.email}> (Patient ID: {match.patient_id})": match
+        for match in matches
+    }
+    if len(matches) == repo.TYPEAHEAD_LIMIT:
+        st.caption(f"Showing the first {repo.TYPEAHEAD_LIMIT} matches; type more to narrow down.")
+    return options[st.selectbox("Select a Patient", list(options.keys()), key=f"{state_key}_patient")]
+
+
+def record_picker(patient_id):
+    """Selectbox of one patient's medical records; returns the RecordID or None."""
+    records = repo.medical_records.options_for_patient(patient_id)
+    if not records:
+        st.info("This patient has no medical records.")
+        return None
+    options = {
+        f"{record.appointment_date}: {record.diagnosis} (Record ID: {record.record_id})": record.record_id
+        for record in records
+    }
+    return options[st.selectbox("Select a Medical Record", list(options.keys()))]
+
 
+@track_page
 def add_test_results_ui():
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Doctor":
+    if authorized_session("tests:write") is None:
         st.warning("You must log in as a doctor to add test results.")
         return
 
     st.subheader("Add Test Results")
 
-    # Fetch and display medical records
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT MedicalRecord.RecordID, Patient.FirstName, Patient.LastName
-            FROM MedicalRecord
-            INNER JOIN Patient ON MedicalRecord.PatientID = Patient.PatientID
-        """)
-        records = cursor.fetchall()
-    except Exception as e:
-        st.error(f"Error fetching medical records: {e}")
-        conn.close()
+    # Find the patient, then pick one of their records
+    patient = patient_picker("test_results")
+    if patient is None:
+        return
+    record_id = record_picker(patient.patient_id)
+    if record_id is None:
         return
-    finally:
-        conn.close()
-
-    # Selection inputs
-    record_options = {f"Record {r[0]} - {r[1]} {r[2]}": r[0] for r in records}
-    selected_record = st.selectbox("Select Medical Record", options=list(record_options.keys()))
 
-    test_name = st.text_input("Enter Test Name")
+    lab_tests = {test.test_name: test.lab_test_id for test in repo.lab_tests.options()}
+    if not lab_tests:
+        st.warning("No lab tests defined yet.")
+        return
+    test_name = st.selectbox("Select Test", list(lab_tests.keys()))
     test_result = st.text_area("Enter Test Result")
 
     if st.button("Add Test Results"):
-        record_id = record_options[selected_record]
-        success = add_test_results(record_id, test_name, test_result)
+        success = repo.test_results.add(record_id, lab_tests[test_name], test_result)
 
         if success:
             st.success("Test results added successfully!")
@@ -1311,39 +801,7 @@ def add_test_results_ui():
             st.error("Failed to add test results. Please try again.")
 
 
-
-
-
-
-
-
-
-def sign_up_admin(email, password):
-    conn = connect_to_db()
-    if conn is None:
-        print("Failed to connect to database")
-        return False
-    
-    cursor = conn.cursor()
-    hashed_pw = hash_password(password)  # Hash the password for security
-
-    # Insert query for admin account
-    query = """
-        INSERT INTO admin (Email, Password)
-        VALUES ( %s, %s)
-    """
-    try:
-        cursor.execute(query, (email, hashed_pw))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
-
-
+@track_page
 def sign_up_admin_ui():
     st.subheader("Admin Sign-Up")
     
@@ -1363,79 +821,72 @@ def sign_up_admin_ui():
         elif len(password) < 6:
             st.error("Password must be at least 6 characters long!")
         else:
-            # Call sign_up_admin function to create admin account
-            success = sign_up_admin( email, password)
+            # Create the admin account
+            hashed_pw = hash_password(password)  # Hash the password for security
+            success = repo.admins.create(email, hashed_pw)
             
             if success:
                 st.success("Admin account created successfully!")
-                st.session_state["logged_in"] = True
-                st.session_state["role"] = "Admin"
+                bind_session(get_session_store().create(repo.admins.id_for_email(email), "Admin", {"email": email}))
                 st.session_state["admin_email"] = email  # Store admin email or ID
                 st.session_state["redirect_to_home"] = True  # Set redirection flag
             else:
                 st.error("Failed to create account. Please try again.")
 
 
-
-# Function to view all appointments with `TestTaken = True`
-def get_appointments_with_tests():
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT AppointmentID, RecordID, TestTaken 
-        FROM MedicalRecord WHERE TestTaken = TRUE
-    """
-    cursor.execute(query)
-    records = cursor.fetchall()
-    conn.close()
-    return records
-
 # Function to add lab tests for an appointment
 def add_lab_tests_for_appointment(record_id, lab_tests):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    try:
-        for test_id in lab_tests:
-            query = """
-                INSERT INTO TestResults (LabTestID, RecordID)
-                VALUES (%s, %s)
-            """
-            cursor.execute(query, (test_id, record_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error adding lab tests: {e}")
+    result = repo.test_results.assign([(record_id, test_id) for test_id in lab_tests])
+    if result.error:
+        st.error(result.error)
         return False
-    finally:
-        conn.close()
+    show_assignment_conflicts(result)
+    return True
+
+def show_assignment_conflicts(result):
+    if result.conflicts:
+        st.warning(f"{len(result.conflicts)} test(s) were not assigned:")
+        st.table([
+            {"Record ID": c.record_id, "Lab Test ID": c.lab_test_id, "Reason": c.reason}
+            for c in result.conflicts
+        ])
 
 # UI for Doctor to assign tests
+@track_page
 def doctor_assign_tests_ui():
     st.subheader("Assign Lab Tests to Patient")
 
-    appointments = get_appointments_with_tests()
-    if not appointments:
-        st.warning("No appointments with pending tests.")
+    session = authorized_session("tests:write")
+    if session is None:
+        st.warning("You must log in as a doctor to assign lab tests.")
         return
 
-    appointment_options = {f"Appointment ID: {app[0]}, Record ID: {app[1]}": app[1] for app in appointments}
-    selected_record = st.selectbox("Select an Appointment", options=appointment_options.keys())
-    record_id = appointment_options[selected_record]
-
     # Fetch available lab tests
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT LabTestID, TestName FROM LabTests")
-    lab_tests = cursor.fetchall()
-    conn.close()
+    lab_tests = repo.lab_tests.options()
 
     if not lab_tests:
         st.warning("No lab tests available.")
         return
 
-    test_options = {f"{test[1]} (ID: {test[0]})": test[0] for test in lab_tests}
+    test_options = {f"{test.test_name} (ID: {test.lab_test_id})": test.lab_test_id for test in lab_tests}
+
+    mode = st.radio("Assign to", ["One appointment", "All appointments on a day"], horizontal=True)
+    if mode == "All appointments on a day":
+        doctor_assign_panel_ui(test_options)
+        return
+
+    # Only records from this doctor's own appointments
+    appointments = repo.medical_records.with_tests_for_doctor(session.user_id)
+    if not appointments:
+        st.warning("No appointments with pending tests.")
+        return
+
+    appointment_options = {
+        f"Appointment ID: {app.appointment_id}, Record ID: {app.record_id}": app.record_id for app in appointments
+    }
+    selected_record = st.selectbox("Select an Appointment", options=appointment_options.keys())
+    record_id = appointment_options[selected_record]
+
     selected_tests = st.multiselect("Select Lab Tests", options=test_options.keys())
 
     if st.button("Assign Tests"):
@@ -1447,90 +898,71 @@ def doctor_assign_tests_ui():
         else:
             st.error("No tests selected.")
 
-# Function to add test results
-def add_test_result(test_id, result):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "UPDATE TestResults SET Result = %s WHERE TestID = %s"
-    try:
-        cursor.execute(query, (result, test_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error updating test result: {e}")
-        return False
-    finally:
-        conn.close()
+# Assign one panel of tests to every record of the doctor's appointments on a day
+@track_page
+def doctor_assign_panel_ui(test_options):
+    session = authorized_session("tests:write")
+    if session is None:
+        st.warning("You must log in as a doctor to assign a panel.")
+        return
+
+    day = st.date_input("Appointment date", value=datetime.today())
+    records = repo.medical_records.for_doctor_on_day(session.user_id, day)
+    if not records:
+        st.info("No medical records for your appointments on this day.")
+        return
+
+    record_options = {f"{r.patient_name} (Appointment ID: {r.appointment_id}, Record ID: {r.record_id})": r.record_id
+                      for r in records}
+    selected_records = st.multiselect("Records", options=record_options.keys(), default=list(record_options.keys()))
+    selected_tests = st.multiselect("Panel", options=test_options.keys())
+
+    if st.button("Assign Panel"):
+        if not selected_records or not selected_tests:
+            st.error("Select at least one record and one test.")
+            return
+        pairs = [(record_options[r], test_options[t]) for r in selected_records for t in selected_tests]
+        result = repo.test_results.assign(pairs)
+        if result.error:
+            st.error(result.error)
+            return
+        st.success(f"Assigned {result.assigned} of {len(pairs)} tests.")
+        show_assignment_conflicts(result)
 
 # UI for Doctor to add test results
+@track_page
 def doctor_add_results_ui():
     st.subheader("Add Lab Test Results")
 
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT TestResults.TestID, LabTests.TestName, TestResults.RecordID, TestResults.Result
-        FROM TestResults
-        JOIN LabTests ON TestResults.LabTestID = LabTests.LabTestID
-        WHERE TestResults.Result IS NULL
-    """)
-    pending_tests = cursor.fetchall()
-    conn.close()
+    session = authorized_session("tests:write")
+    if session is None:
+        st.warning("You must log in as a doctor to add test results.")
+        return
+
+    pending_tests = repo.test_results.pending_for_doctor(session.user_id)
 
     if not pending_tests:
         st.warning("No pending lab tests.")
         return
 
-    test_options = {f"{test[1]} (Record ID: {test[2]})": test for test in pending_tests}
+    test_options = {f"{test.test_name} (Record ID: {test.record_id})": test for test in pending_tests}
     selected_test = st.selectbox("Select a Test", options=test_options.keys())
-    test_id, test_name, record_id, _ = test_options[selected_test]
+    test = test_options[selected_test]
 
-    result = st.text_area(f"Enter Result for {test_name}")
+    result = st.text_area(f"Enter Result for {test.test_name}")
     if st.button("Submit Result"):
         if result.strip():
-            success = add_test_result(test_id, result)
+            success = repo.test_results.set_result(test.test_id, result)
             if success:
                 st.success("Result added successfully!")
+            else:
+                st.error("Failed to save the result.")
         else:
             st.error("Result cannot be empty.")
 
 
-
-def view_patient_tests(patient_id):
-    """
-    Fetches lab test results for a given patient, including appointment ID, appointment date,
-    doctor's name, test name, and test results.
-    
-    Args:
-    patient_id (int): The ID of the patient.
-    
-    Returns:
-    list: A list of tuples containing appointment ID, date, doctor's name, test name, and test result.
-    """
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            a.AppointmentID,
-            a.AppointmentDate,
-            CONCAT(d.FirstName, ' ', d.LastName) AS DoctorName,
-            lt.TestName,
-            tr.Result
-        FROM TestResults tr
-        JOIN MedicalRecord mr ON tr.RecordID = mr.RecordID
-        JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
-        JOIN Appointment a ON mr.AppointmentID = a.AppointmentID
-        JOIN Doctor d ON a.DoctorID = d.DoctorID
-        WHERE a.PatientID = %s
-    """
-    cursor.execute(query, (patient_id,))
-    records = cursor.fetchall()
-    conn.close()
-    return records
-
 # UI for patients to view test results
+@track_page
 def patient_view_tests_ui():
     """
     Displays the patient's lab test results in the Streamlit UI.
@@ -1539,27 +971,27 @@ def patient_view_tests_ui():
     st.subheader("View Lab Test Results")
 
     # Check if the user is logged in as a patient
-    if not st.session_state.get("logged_in") or st.session_state["role"] != "Patient":
+    session = authorized_session("tests:own")
+    if session is None:
         st.warning("You must log in as a patient to view lab test results.")
         return
 
-    patient_id = st.session_state["user_id"]
-
     if st.button("View Tests"):
-        results = view_patient_tests(patient_id)
+        results = repo.test_results.for_patient(session.user_id)
         if results:
             for record in results:
-                st.write(f"**Appointment ID:** {record[0]}")
-                st.write(f"**Appointment Date:** {record[1]}")
-                st.write(f"**Doctor's Name:** {record[2]}")
-                st.write(f"**Test Name:** {record[3]}")
-                st.write(f"**Result:** {record[4]}")
+                st.write(f"**Appointment ID:** {record.appointment_id}")
+                st.write(f"**Appointment Date:** {record.appointment_date}")
+                st.write(f"**Doctor's Name:** {record.doctor_name}")
+                st.write(f"**Test Name:** {record.test_name}")
+                st.write(f"**Result:** {record.result}")
                 st.write("---")
         else:
             st.warning("No test results found.")
 
 
 # Admin CRUD operations for LabTests
+@track_page
 def admin_lab_tests_ui():
     st.subheader("Manage Lab Tests (Admin)")
 
@@ -1580,122 +1012,30 @@ def admin_lab_tests_ui():
         delete_lab_test_ui()
 
 
-
-# Check if wallet exists for a patient
-def check_wallet_exists(patient_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "SELECT WalletID FROM Wallets WHERE PatientID = %s"
-    cursor.execute(query, (patient_id,))
-    result = cursor.fetchone()
-    conn.close()
-
-    return result is not None
-
-# Create wallet for the patient
-def create_wallet(patient_id, initial_balance=0.0):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "INSERT INTO Wallets (PatientID, Balance) VALUES (%s, %s)"
-    cursor.execute(query, (patient_id, initial_balance))
-    conn.commit()
-    conn.close()
-
-# Fetch wallet balance
-def fetch_wallet_balance(patient_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "SELECT Balance FROM Wallets WHERE PatientID = %s"
-    cursor.execute(query, (patient_id,))
-    result = cursor.fetchone()
-    conn.close()
-
-    return result[0] if result else None
-
-# Add money to wallet
-def add_money_to_wallet(patient_id, amount):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "UPDATE Wallets SET Balance = Balance + %s WHERE PatientID = %s"
-    cursor.execute(query, (amount, patient_id))
-    conn.commit()
-    conn.close()
-
-# Fetch unpaid bills
-def fetch_unpaid_bills(patient_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT BillingID, TotalAmount, PaymentStatus 
-        FROM Billing 
-        WHERE PatientID = %s AND PaymentStatus = 'Pending'
-    """
-    cursor.execute(query, (patient_id,))
-    bills = cursor.fetchall()
-    conn.close()
-
-    return bills
-
-def pay_bill_with_wallet(patient_id, billing_id, amount):
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    try:
-        # Start a transaction explicitly
-        conn.begin()
-
-        # Deduct from wallet balance
-        deduct_query = "UPDATE Wallets SET Balance = Balance - %s WHERE PatientID = %s"
-        cursor.execute(deduct_query, (amount, patient_id))
-
-        # Generate a unique transaction ID
-        transaction_id = int(datetime.now().timestamp())
-
-        # Update billing status
-        update_query = "UPDATE Billing SET PaymentStatus = 'Completed', TransactionID = %s WHERE BillingID = %s"
-        cursor.execute(update_query, (transaction_id, billing_id))
-
-        # Update admin wallet balance
-        update_admin_query = "UPDATE AdminWallets SET Balance = Balance + %s WHERE WalletID = 1"
-        cursor.execute(update_admin_query, (amount,))
-
-        # Commit the transaction if all queries succeed
-        conn.commit()
-
-    except pymysql.MySQLError as err:
-        # Rollback the transaction in case of an error
-        print(f"Error: {err}")
-        conn.rollback()
-
-    finally:
-        # Ensure the connection is closed
-        cursor.close()
-        conn.close()
-    
-
 # Wallet UI
+@track_page
 def wallet_ui():
     st.title("Manage Your Wallet")
 
-    # Assume patient is logged in and their ID is in session
-    patient_id = st.session_state.get("user_id", 1)  # Replace with actual session handling
-    
-    # Check if the wallet exists
-    wallet_exists = check_wallet_exists(patient_id)
-    if not wallet_exists:
+    session = authorized_session("wallet:own")
+    if session is None:
+        st.warning("You must log in as a patient to manage your wallet.")
+        return
+    patient_id = session.user_id
+
+    # Wallet existence comes from the session, not a query
+    if session.wallet_id is None:
         st.warning("No wallet found for your account.")
         if st.button("Create Wallet"):
-            create_wallet(patient_id)
-            st.success("Wallet created successfully!")
+            session.wallet_id = repo.wallets.create(patient_id)
+            if session.wallet_id is not None:
+                st.success("Wallet created successfully!")
+            else:
+                st.error("Failed to create wallet. Please try again.")
         return
 
     # Display current wallet balance
-    balance = fetch_wallet_balance(patient_id)
+    balance = repo.wallets.balance(patient_id)
     if balance is not None:
         st.write(f"### Current Wallet Balance: ₹{balance:.2f}")
     else:
@@ -1707,26 +1047,35 @@ def wallet_ui():
     add_amount = st.number_input("Enter amount to add:", min_value=0.0, step=100.0)
     if st.button("Add Money"):
         if add_amount > 0:
-            add_money_to_wallet(patient_id, add_amount)
-            st.success(f"₹{add_amount:.2f} added to your wallet.")
+            if repo.wallets.top_up(session.wallet_id, add_amount):
+                st.success(f"₹{add_amount:.2f} added to your wallet.")
+            else:
+                st.error("Failed to add money to your wallet. Please try again.")
         else:
             st.warning("Please enter a valid amount.")
 
     # Section to pay bills
     st.subheader("Pay Bills")
-    unpaid_bills = fetch_unpaid_bills(patient_id)
+    unpaid_bills = repo.billing.unpaid_for_patient(patient_id)
 
     if unpaid_bills:
         for bill in unpaid_bills:
-            billing_id, total_amount, payment_status = bill
+            billing_id, total_amount = bill.billing_id, bill.total_amount
             st.write(f"**Billing ID:** {billing_id}")
             st.write(f"**Total Amount:** ₹{total_amount:.2f}")
-            st.write(f"**Payment Status:** {payment_status}")
+            st.write(f"**Payment Status:** {bill.payment_status}")
             
             if total_amount <= balance:
+                # One idempotency key per bill, so a double-click can't pay twice
+                key_name = f"payment_key_{billing_id}"
+                if key_name not in st.session_state:
+                    st.session_state[key_name] = uuid.uuid4().hex
                 if st.button(f"Pay ₹{total_amount:.2f} for Billing ID {billing_id}", key=billing_id):
-                    pay_bill_with_wallet(patient_id, billing_id, total_amount)
-                    st.success(f"Bill {billing_id} paid successfully!")
+                    result = repo.wallets.pay_bill(patient_id, billing_id, st.session_state[key_name])
+                    if result.status == "paid":
+                        st.success(result.message)
+                    else:
+                        st.error(result.message)
             else:
                 st.warning(f"Not enough balance to pay Bill {billing_id}. Please add money.")
             st.write("---")
@@ -1734,52 +1083,57 @@ def wallet_ui():
         st.info("No unpaid bills found.")
 
 
+@track_page
+def doctor_availability_ui():
+    st.subheader("Working Hours")
 
-# Function to add billing
-def add_billing(patient_id, record_id, total_amount, payment_status, transaction_id):
-    conn = connect_to_db()
-    cursor = conn.cursor()
+    session = authorized_session("availability:own")
+    if session is None:
+        st.warning("You must log in as a doctor to set working hours.")
+        return
+    doctor_id = session.user_id
+
+    # One shift per weekday here; patients only see slots inside these hours
+    shifts = {shift.weekday: shift for shift in working_hours(doctor_id)}
+    slot_lengths = [10, 15, 20, 30, 45, 60]
+    current = shifts[min(shifts)].slot_minutes if shifts else DEFAULT_HOURS[0].slot_minutes
+    slot_minutes = st.selectbox("Slot length (minutes)", slot_lengths,
+                                index=slot_lengths.index(current) if current in slot_lengths else 3)
+    new_shifts = []
+    for weekday, name in enumerate(WEEKDAYS):
+        shift = shifts.get(weekday)
+        col1, col2, col3 = st.columns([2, 2, 2])
+        working = col1.checkbox(name, value=shift is not None, key=f"works_{weekday}")
+        default = shift or DEFAULT_HOURS[0]
+        start = col2.time_input("From", value=default.start, key=f"start_{weekday}",
+                                disabled=not working, step=timedelta(minutes=15))
+        end = col3.time_input("To", value=default.end, key=f"end_{weekday}",
+                              disabled=not working, step=timedelta(minutes=15))
+        if working:
+            new_shifts.append(Shift(weekday, start, end, slot_minutes))
+
+    if st.button("Save Working Hours"):
+        if any(shift.end <= shift.start for shift in new_shifts):
+            st.error("Each working day must end after it starts.")
+        elif repo.availability.set_hours(doctor_id, new_shifts):
+            st.success("Working hours saved.")
+        else:
+            st.error("Failed to save working hours.")
 
-    query = """
-        INSERT INTO Billing (PatientID, RecordID, TotalAmount, PaymentStatus, TransactionID)
-        VALUES (%s, %s, %s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (patient_id, record_id, total_amount, payment_status, transaction_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error creating billing record: {e}")
-        return False
-    finally:
-        conn.close()
 
 # UI for adding billing
+@track_page
 def doctor_add_billing_ui():
     st.subheader("Create Billing Record")
 
-    # Get patient and record details for the UI
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    
-    # Fetch patient details (you can modify the query as needed)
-    cursor.execute("SELECT PatientID, FirstName FROM Patient")
-    patients = cursor.fetchall()
-
-    # Fetch medical record details (you can modify the query as needed)
-    cursor.execute("SELECT RecordID, Diagnosis FROM MedicalRecord")
-    records = cursor.fetchall()
-
-    conn.close()
-
-    # Dropdowns for selecting patient and medical record
-    patient_options = {f"{patient[1]} (Patient ID: {patient[0]})": patient for patient in patients}
-    selected_patient = st.selectbox("Select a Patient", options=patient_options.keys())
-    patient_id, _ = patient_options[selected_patient]
-
-    record_options = {f"{record[1]} (Record ID: {record[0]})": record for record in records}
-    selected_record = st.selectbox("Select a Medical Record", options=record_options.keys())
-    record_id, _ = record_options[selected_record]
+    # Find the patient, then pick one of their records
+    patient = patient_picker("billing")
+    if patient is None:
+        return
+    patient_id = patient.patient_id
+    record_id = record_picker(patient_id)
+    if record_id is None:
+        return
 
     # Input fields for billing
     total_amount = st.number_input("Total Amount", min_value=0.0, format="%.2f")
@@ -1788,39 +1142,301 @@ def doctor_add_billing_ui():
 
     if st.button("Create Billing Record"):
         if total_amount > 0:
-            success = add_billing(patient_id, record_id, total_amount, payment_status, transaction_id)
+            success = repo.billing.create(patient_id, record_id, total_amount, payment_status, transaction_id)
             if success:
                 st.success("Billing record created successfully!")
+            else:
+                st.error("Error creating billing record.")
         else:
             st.error("Total amount must be greater than zero.")
 
+@track_page
+def timeline_ui():
+    st.subheader("Patient Timeline")
+
+    session = current_session()
+    if session is None:
+        st.warning("You must log in to view a timeline.")
+        return
+    # Doctors see their own patients only, as in search
+    doctor_id = session.user_id if session.role == "Doctor" else None
+    if session.role == "Patient":
+        patient_id = session.user_id
+    else:
+        match = patient_picker("timeline", doctor_id)
+        if match is None:
+            return
+        patient_id = match.patient_id
+
+    # Pager state per patient, so switching patients starts at the newest events
+    state_key = f"timeline_{patient_id}"
+    page_size, after, before = page_cursor(state_key)
+    page = repo.timeline.page(patient_id, page_size, after, before, doctor_id=doctor_id)
+    if not page.rows:
+        st.info("Nothing on record yet.")
+    else:
+        columns = {
+            "date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+            "time": "Time", "kind": "Type", "title": "Title", "detail": "Details",
+            "amount": st.column_config.NumberColumn("Amount", format="dollar"),
+            "status": "Status",
+        }
+        frame = rows_frame(page.rows, repo.TimelineEvent, {"date": "date", "time": "time", "amount": "money"})
+        frame["kind"] = frame["kind"].str.capitalize()
+        st.dataframe(frame, hide_index=True, column_order=list(columns), column_config=columns)
+    render_pager(state_key, page)
+
+
+@track_page
+def search_ui():
+    st.subheader("Search Records")
+
+    session = authorized_session("records:search")
+    if session is None:
+        st.warning("You must log in as a doctor or admin to search records.")
+        return
+
+    kind = st.radio("Search in", ["Diagnoses & Prescriptions", "Test Results"], horizontal=True,
+                    on_change=reset_pager, args=("search",))
+    text = st.text_input("Search for", key="search_text", on_change=reset_pager, args=("search",),
+                         placeholder="e.g. type 2 diabetes")
+    date_from = date_to = None
+    if st.checkbox("Limit to appointment dates", key="search_by_date", on_change=reset_pager, args=("search",)):
+        today = datetime.today().date()
+        col1, col2 = st.columns(2)
+        date_from = col1.date_input("From", value=today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1),
+                                    key="search_from", on_change=reset_pager, args=("search",))
+        date_to = col2.date_input("To", value=today, key="search_to", on_change=reset_pager, args=("search",))
+    if not text.strip():
+        return
+
+    page_size, after, before = page_cursor("search")
+    if kind == "Test Results":
+        page = repo.search.test_results(text, session.role, session.user_id, page_size, after, before,
+                                        date_from, date_to)
+        row_type, columns = repo.TestResultHit, {
+            "test_id": st.column_config.NumberColumn("Test ID", format="%d"),
+            "record_id": st.column_config.NumberColumn("Record ID", format="%d"),
+            "appointment_date": st.column_config.DateColumn("Appointment Date", format="YYYY-MM-DD"),
+            "patient_name": "Patient", "doctor_name": "Doctor", "test_name": "Test", "result": "Result",
+        }
+    else:
+        page = repo.search.medical_records(text, session.role, session.user_id, page_size, after, before,
+                                           date_from, date_to)
+        row_type, columns = repo.RecordHit, {
+            "record_id": st.column_config.NumberColumn("Record ID", format="%d"),
+            "appointment_date": st.column_config.DateColumn("Appointment Date", format="YYYY-MM-DD"),
+            "patient_name": "Patient", "doctor_name": "Doctor",
+            "diagnosis": "Diagnosis", "prescription": "Prescription",
+        }
+
+    if not page.rows:
+        st.info("No matching records. Words shorter than three letters are ignored.")
+    else:
+        # Rows arrive best match first; the score itself is not shown
+        frame = rows_frame(page.rows, row_type, {"appointment_date": "date"})
+        st.dataframe(frame, hide_index=True, column_order=list(columns), column_config=columns)
+    render_pager("search", page)
+
+
+@track_page
+def doctor_worklist_ui():
+    """Today's appointments and open paperwork, read from DoctorWorklist (worklist.py)."""
+    session = authorized_session("appointments:assigned")
+    if session is None:
+        return
+    today = datetime.today().date()
+    items = rows_frame(repo.worklist.for_doctor(session.user_id, today), repo.WorklistItem,
+                       {"date": "date", "time": "time"})
+    sections = [
+        ("Today's Appointments", items["date"] == pd.Timestamp(today), "No appointments today."),
+        ("Records Missing", (items["records"] == 0) & (items["date"] <= pd.Timestamp(today)),
+         "Every visit so far has a medical record."),
+        ("Tests Pending Result", items["tests_pending"] > 0, "No lab tests are waiting for a result."),
+        ("Bills Not Yet Raised", (items["records"] > 0) & (items["bills"] == 0), "Every record has been billed."),
+    ]
+    columns = {
+        "date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+        "time": "Time", "patient_name": "Patient",
+        "appointment_id": st.column_config.NumberColumn("Appointment ID", format="%d"),
+        "tests_pending": "Tests Pending",
+    }
+    for title, selected, empty in sections:
+        st.write(f"### {title}")
+        if selected.any():
+            st.dataframe(items[selected], hide_index=True, column_order=list(columns), column_config=columns)
+        else:
+            st.info(empty)
+
+
+@track_page
+def admin_dashboard_ui():
+    """Operational overview read from the summary tables (summaries.py)."""
+    today = datetime.today().date()
+    col1, col2 = st.columns(2)
+    date_from = col1.date_input("Dashboard from", value=today - timedelta(days=6))
+    date_to = col2.date_input("Dashboard to", value=today + timedelta(days=7))
+
+    # Outstanding and collected bills
+    totals = {row.payment_status: row for row in repo.dashboard.billing()}
+    pending, completed = totals.get("Pending"), totals.get("Completed")
+    col1, col2 = st.columns(2)
+    col1.metric("Pending bills", f"${(pending.amount if pending else 0):,.2f}",
+                f"{pending.bills if pending else 0} bills", delta_color="off")
+    col2.metric("Collected", f"${(completed.amount if completed else 0):,.2f}",
+                f"{completed.bills if completed else 0} bills", delta_color="off")
+
+    st.write("### Appointments per Doctor per Day")
+    days = rows_frame(repo.dashboard.appointments_by_doctor(date_from, date_to + timedelta(days=1)),
+                      repo.DoctorDay, {"date": "date"})
+    if days.empty:
+        st.info("No appointments in this period.")
+    else:
+        grid = days.pivot_table(index="doctor_name", columns="date", values="appointments",
+                                aggfunc="sum", fill_value=0)
+        grid.columns = grid.columns.strftime("%a %d %b")
+        grid.index.name, grid.columns.name = "Doctor", None
+        st.dataframe(grid)
+
+    st.write("### Lab Test Volume")
+    volume = rows_frame(repo.dashboard.lab_test_volume(), repo.LabTestCount)
+    if volume.empty:
+        st.info("No lab tests assigned yet.")
+    else:
+        st.bar_chart(volume, x="test_name", y="assigned", x_label="Lab test", y_label="Assigned")
+
+    st.write("### Bill Payments into Admin Wallets")
+    revenue = rows_frame(repo.dashboard.revenue(date_from, date_to + timedelta(days=1)),
+                         repo.RevenueDay, {"day": "date", "amount": "money"})
+    if revenue.empty:
+        st.info("No revenue in this period.")
+    else:
+        st.bar_chart(revenue, x="day", y="amount", x_label="Day", y_label="Amount")
+    refreshed_at = repo.dashboard.revenue_refreshed_at()
+    st.caption(f"Revenue as of {refreshed_at:%Y-%m-%d %H:%M}." if refreshed_at else "Revenue has not been refreshed yet.")
+
+
+@track_page
+def diagnostics_ui():
+    """Where reruns spend their time, per page and per query (instrumentation.py)."""
+    if authorized_session("diagnostics") is None:
+        st.error("Diagnostics are only available to admins.")
+        return
+
+    stats = get_query_stats()
+    st.subheader("Diagnostics")
+    st.caption(f"Since {stats.since:%Y-%m-%d %H:%M:%S}, this server process only.")
+    if st.button("Reset statistics"):
+        stats.reset()
+
+    st.write("### Reruns per Page")
+    pages = rows_frame(stats.pages(), PageTotal)
+    if pages.empty:
+        st.info("No reruns recorded yet.")
+    else:
+        st.dataframe(pages.round(1), hide_index=True, column_config={
+            "page": "Page", "reruns": "Reruns", "mean_ms": "Mean ms", "max_ms": "Max ms",
+            "sql_ms": "SQL ms", "acquire_ms": "Connection wait ms", "other_ms": "Python ms",
+            "queries": "Queries per rerun",
+        })
+
+    st.write("### Top Queries by Total Time")
+    queries = rows_frame(stats.top_queries(), QueryTotal)
+    if queries.empty:
+        st.info("No queries recorded yet.")
+    else:
+        st.dataframe(queries.round(2), hide_index=True, column_config={
+            "fingerprint": st.column_config.TextColumn("Query", width="large"), "calls": "Calls",
+            "total_ms": "Total ms", "mean_ms": "Mean ms", "max_ms": "Max ms", "rows": "Rows",
+            "top_page": "Mostly from",
+        })
+
+    st.write(f"### Slow Queries (over {SLOW_QUERY_MS:.0f} ms)")
+    slow = rows_frame(stats.slow_queries(), SlowQuery)
+    if slow.empty:
+        st.info("No slow queries.")
+    else:
+        st.dataframe(slow, hide_index=True, column_config={
+            "at": "At", "page": "Page", "fingerprint": st.column_config.TextColumn("Query", width="large"),
+            "ms": "ms", "params": "Parameters", "rows": "Rows",
+        })
+
+    st.write("### Profiler")
+    st.caption(f"Samples the stack every {PROFILE_INTERVAL_MS:g} ms while a profiled page renders and writes "
+               f"a collapsed-stack file to `{PROFILE_DIR}/` (render with flamegraph.pl or speedscope).")
+    pages = st.multiselect("Profile these pages for every session", sorted(PAGES),
+                           default=[page for page in profiler.profiled_pages() if page in PAGES])
+    if set(pages) != set(profiler.profiled_pages()):
+        profiler.set_profiled_pages(pages)
+    profiler.set_session_enabled(st.checkbox("Profile my reruns", value=profiler.session_enabled()))
+
+    profiles = profiler.recent_profiles()
+    if not profiles:
+        st.info("No profiles written yet.")
+        return
+    path = st.selectbox("Profile", profiles, format_func=os.path.basename)
+    rows, samples = profiler.top_functions([path])
+    st.caption(f"{samples} samples")
+    st.dataframe(pd.DataFrame(rows, columns=["Function", "Self samples", "Total samples"]), hide_index=True)
+    st.download_button("Download collapsed stacks", data=lambda: profiler.read_profile(path),
+                       file_name=os.path.basename(path), mime="text/plain", on_click="ignore")
+
+
+def export_file(name, fmt, date_from, date_to):
+    """Stream an export into a temporary file; called only when the download is clicked."""
+    spool = tempfile.TemporaryFile()
+    if fmt == "csv":
+        out = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        run_export(name, fmt, out, date_from, date_to)
+        out.detach()  # keep the underlying file open
+    else:
+        run_export(name, fmt, spool, date_from, date_to)
+    spool.seek(0)
+    return spool
+
+
+@track_page
+def admin_exports_ui():
+    st.subheader("Admin - Export Records")
+    name = st.selectbox("Dataset", list(EXPORTS), format_func=lambda key: EXPORTS[key].label)
+    fmt = st.radio("Format", list(FORMATS), horizontal=True, format_func=str.upper)
+    date_from = st.date_input("Appointments from", value=datetime.today().date() - timedelta(days=365))
+    date_to = st.date_input("Appointments up to", value=datetime.today().date())
+    st.caption("Rows are streamed from the database when you click download. "
+               "Use `python exports.py` for multi-million-row exports.")
+    st.download_button(
+        "Download",
+        data=lambda: export_file(name, fmt, date_from, date_to + timedelta(days=1)),
+        file_name=f"{name}_{date_from}_{date_to}.{fmt}",
+        mime=FORMATS[fmt],
+        on_click="ignore",
+    )
+
+
 # Streamlit UI to process payment
+@track_page
 def admin_wallet_ui():
     st.subheader("Admin - Process Payment")
 
-    # Ensure admin ID is correctly set, assuming the admin ID is in session state
-    admin_id = st.session_state.get("user_id")  # Replace with actual session handling
+    session = authorized_session("admin_wallet")
+    admin_id = session.user_id if session is not None else None
 
     if admin_id is None:
         st.error("Admin ID not found! Please log in first.")
         return
 
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    # Fetch the admin's wallet balance
-    query = "SELECT Balance FROM AdminWallets WHERE id = %s"
-    cursor.execute(query, (admin_id,))
-    result = cursor.fetchone()
-
     # If wallet does not exist, prompt to create it
-    if result is None:
+    if session.wallet_id is None:
         st.warning("No wallet found for the admin.")
         if st.button("Create Admin Wallet"):
-            create_admin_wallet(admin_id)  # Create the wallet for the admin
-            st.success("Admin wallet created successfully!")
+            session.wallet_id = repo.wallets.create_admin(admin_id)  # Create the wallet for the admin
+            if session.wallet_id is not None:
+                st.success("Admin wallet created successfully!")
+            else:
+                st.error("Failed to create the admin wallet. Please try again.")
     else:
-        admin_wallet_balance = result[0]  # Fetch the balance from the result
+        # Snapshot plus ledger entries since the last checkpoint
+        admin_wallet_balance = repo.wallets.admin_balance(session.wallet_id) or 0
         st.write(f"### Current Admin Wallet Balance: ₹{admin_wallet_balance:.2f}")
 
         # Section to add money to the admin's wallet
@@ -1828,166 +1444,67 @@ def admin_wallet_ui():
         add_amount = st.number_input("Enter amount to add:", min_value=0.0, step=100.0)
         if st.button("Add Money"):
             if add_amount > 0:
-                add_money_to_admin_wallet(admin_id, add_amount)  # Add money to the wallet
-                st.success(f"₹{add_amount:.2f} added to the admin wallet.")
+                if repo.wallets.top_up_admin(session.wallet_id, add_amount):  # Add money to the wallet
+                    st.success(f"₹{add_amount:.2f} added to the admin wallet.")
+                else:
+                    st.error("Failed to add money to the admin wallet. Please try again.")
             else:
                 st.warning("Please enter a valid amount.")
 
-    conn.close()
-
-# Function to create admin wallet (if not already created)
-def create_admin_wallet(admin_id):
-    if admin_id is None:
-        st.error("Admin ID is not available to create the wallet.")
-        return
-
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    # Make sure admin_id is valid
-    query = "INSERT INTO AdminWallets (id, Balance) VALUES (%s, %s)"
-    cursor.execute(query, (admin_id, 0.0))  # Initial balance is 0.0
-    conn.commit()
-    conn.close()
-
-# Function to add money to admin wallet
-def add_money_to_admin_wallet(admin_id, amount):
-    if admin_id is None:
-        st.error("Admin ID is not available to add money to the wallet.")
-        return
-
-    conn = connect_to_db()
-    cursor = conn.cursor()
-
-    query = "UPDATE AdminWallets SET Balance = Balance + %s WHERE id = %s"
-    cursor.execute(query, (amount, admin_id))
-    conn.commit()
-    conn.close()
-
-
-def fetch_billing_records_for_admin():
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            b.BillingID,
-            CONCAT(p.FirstName, ' ', p.LastName) AS PatientName,
-            b.TotalAmount,
-            b.PaymentStatus,
-            b.TransactionID,
-            m.Diagnosis
-        FROM 
-            Billing b
-        JOIN 
-            Patient p ON b.PatientID = p.PatientID
-        JOIN 
-            MedicalRecord m ON b.RecordID = m.RecordID
-        ORDER BY 
-            b.BillingID DESC
-    """
-    try:
-        cursor.execute(query)
-        records = cursor.fetchall()
-        return records
-    except Exception as e:
-        st.error(f"Error fetching billing records: {e}")
-        return []
-    finally:
-        conn.close()
-
-
+@track_page
 def view_billing_record_ui():
     st.subheader("Admin - View All Billing Records")
 
-    # Fetch billing records
-    records = fetch_billing_records_for_admin()
+    # Fetch one page of billing records
+    page_size, after, before = page_cursor("admin_billing")
+    page = repo.billing.page(page_size, after=after, before=before)
+    records = page.rows
 
     if records:
         st.write("### Billing Records")
-        billing_data = [
-            {
-                "Billing ID": record[0],
-                "Patient Name": record[1],
-                "Total Amount": f"${record[2]:,.2f}",
-                "Payment Status": record[3],
-                "Transaction ID": record[4],
-                "Diagnosis": record[5],
-            }
-            for record in records
-        ]
+        frame = rows_frame(records, repo.AdminBill, {"total_amount": "money", "transaction_id": "text"})
 
         # Display billing data in a table
-        st.dataframe(billing_data)
+        st.dataframe(
+            frame,
+            hide_index=True,
+            column_config={
+                "billing_id": st.column_config.NumberColumn("Billing ID", format="%d"),
+                "patient_name": "Patient Name",
+                "total_amount": st.column_config.NumberColumn("Total Amount", format="dollar"),
+                "payment_status": "Payment Status",
+                "transaction_id": "Transaction ID",
+                "diagnosis": "Diagnosis",
+            },
+        )
     else:
         st.info("No billing records found.")
+    render_pager("admin_billing", page)
 
 
-def fetch_lab_tests():
-    conn = connect_to_db()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor()
-    query = """
-        SELECT LabTestID, TestName, Description, Cost, CreatedAt, UpdatedAt
-        FROM LabTests
-        ORDER BY CreatedAt DESC
-    """
-    try:
-        cursor.execute(query)
-        lab_tests = cursor.fetchall()
-        return lab_tests
-    except Exception as e:
-        st.error(f"Error fetching lab tests: {e}")
-        return []
-    finally:
-        conn.close()
-
-# Function to add a new lab test
-def add_lab_test(test_name, description, cost):
-    conn = connect_to_db()
-    if conn is None:
-        return False
-
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO LabTests (TestName, Description, Cost)
-        VALUES (%s, %s, %s)
-    """
-    try:
-        cursor.execute(query, (test_name, description, cost))
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error adding lab test: {e}")
-        return False
-    finally:
-        conn.close()
-
 # Lab Test UI for Admin
+@track_page
 def lab_test_ui():
     st.subheader("Admin - Lab Test Management")
 
     # Fetch lab tests and display them
-    lab_tests = fetch_lab_tests()
+    lab_tests = repo.lab_tests.all()
 
     if lab_tests:
         st.write("### Lab Test List")
-        lab_test_data = [
-            {
-                "Lab Test ID": test[0],
-                "Test Name": test[1],
-                "Description": test[2],
-                "Cost": f"${test[3]:,.2f}",
-                "Created At": test[4],
-                "Updated At": test[5],
-            }
-            for test in lab_tests
-        ]
-        st.dataframe(lab_test_data)
+        frame = rows_frame(lab_tests, repo.LabTest, {"cost": "money", "created_at": "date", "updated_at": "date"})
+        st.dataframe(
+            frame,
+            hide_index=True,
+            column_config={
+                "lab_test_id": st.column_config.NumberColumn("Lab Test ID", format="%d"),
+                "test_name": "Test Name",
+                "description": "Description",
+                "cost": st.column_config.NumberColumn("Cost", format="dollar"),
+                "created_at": st.column_config.DatetimeColumn("Created At", format="YYYY-MM-DD HH:mm"),
+                "updated_at": st.column_config.DatetimeColumn("Updated At", format="YYYY-MM-DD HH:mm"),
+            },
+        )
     else:
         st.info("No lab tests found.")
 
@@ -2000,18 +1517,27 @@ def lab_test_ui():
 
     if st.button("Add Lab Test"):
         if test_name and description and cost > 0:
-            success = add_lab_test(test_name, description, cost)
+            success = repo.lab_tests.create(test_name, description, cost)
             if success:
                 st.success("Lab test added successfully!")
+            else:
+                st.error("Failed to add lab test.")
         else:
             st.error("Please fill in all fields and ensure cost is greater than zero.")
 
 #     main()
+@track_page
 def main():
     st.title("Health Records Management System")
 
+    # Drop logins whose session expired or was revoked server-side
+    session = current_session()
+    if st.session_state.get("logged_in") and session is None:
+        end_session()
+        st.warning("Your session has expired. Please log in again.")
+
     # Check for redirection after login or sign-up
-    if not st.session_state.get("logged_in"):
+    if session is None:
         # If not logged in, show login and signup options
         menu = ["Home", "Login", "Sign Up"]
         choice = st.sidebar.selectbox("Menu", menu)
@@ -2033,12 +1559,12 @@ def main():
 
     else:
         # If the user is logged in, show appropriate menu based on their role
-        if st.session_state["role"] == "Patient":
-            menu = ["Home", "Appointment", "Medical Record","LabResults","Wallet", "Logout"]
+        if session.role == "Patient":
+            menu = ["Home", "Appointment", "Medical Record","LabResults","Timeline","Wallet", "Logout"]
             choice = st.sidebar.selectbox("Menu", menu)
 
             if choice == "Home":
-                st.subheader(f"Welcome back, {st.session_state['role']}!")
+                st.subheader(f"Welcome back, {session.display_name}!")
             elif choice == "Appointment":
                 appointment_operations_ui()
             elif choice == "Medical Record":
@@ -2047,18 +1573,21 @@ def main():
             #     prescription_operations_ui()
             elif choice == "LabResults": 
                 patient_view_tests_ui()
+            elif choice == "Timeline":
+                timeline_ui()
             elif choice == "Wallet":
                 wallet_ui()
                     
             elif choice == "Logout":
                 logout_ui()
 
-        elif st.session_state["role"] == "Doctor":
-            menu = ["Home","Medical Record","LabResults","Appointment","Billing", "Logout"]
+        elif session.role == "Doctor":
+            menu = ["Home","Medical Record","LabResults","Appointment","Billing","Availability","Timeline","Search", "Logout"]
             choice = st.sidebar.selectbox("Menu", menu)
 
             if choice == "Home":
-                st.subheader(f"Welcome back, Dr. {st.session_state['role']}!")
+                st.subheader(f"Welcome back, Dr. {session.display_name}!")
+                doctor_worklist_ui()
             elif choice == "Appointment":
                 appointment_operations_ui()
             elif choice == "Medical Record":
@@ -2071,15 +1600,24 @@ def main():
                     doctor_add_results_ui()
             elif choice == "Billing":
                 doctor_add_billing_ui()
+            elif choice == "Availability":
+                doctor_availability_ui()
+            elif choice == "Timeline":
+                timeline_ui()
+            elif choice == "Search":
+                search_ui()
             elif choice == "Logout":
                 logout_ui()
 
-        elif st.session_state["role"] == "Admin":
-            menu = ["Home", "Appointment", "Medical Record", "View Billing Record","LabTests","LabResults","AdminWallet","Logout"]
+        elif session.role == "Admin":
+            menu = ["Home", "Appointment", "Medical Record", "View Billing Record","LabTests","LabResults","AdminWallet","Exports","Search","Diagnostics","Logout"]
             choice = st.sidebar.selectbox("Menu", menu)
 
             if choice == "Home":
-                st.subheader(f"Welcome back, Admin!")
+                st.subheader(f"Welcome back, {session.display_name}!")
+                admin_dashboard_ui()
+                with st.expander("Query Cache Statistics"):
+                    st.json(get_query_cache().stats())
             elif choice == "Appointment":
                 appointment_operations_ui()
             elif choice == "Medical Record":
@@ -2092,7 +1630,12 @@ def main():
                 admin_lab_tests_ui()
             elif choice == "AdminWallet":
                 admin_wallet_ui()
-            
+            elif choice == "Exports":
+                admin_exports_ui()
+            elif choice == "Search":
+                search_ui()
+            elif choice == "Diagnostics":
+                diagnostics_ui()
             elif choice == "Logout":
                 logout_ui()
 
@@ -2107,4 +1650,5 @@ if __name__ == "__main__":
         st.session_state["role"] = None
         st.session_state["admin_email"] = None  # Initialize admin session state
 
+    start_metrics_server()  # no-op after the first rerun in this process
     main()
\ No newline at end of file
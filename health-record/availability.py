@@ -0,0 +1,149 @@
+"""Doctor working hours and the in-memory index of booked slots.
+
+A doctor's bookable slots are the ``SlotMinutes`` steps of each
+DoctorAvailability shift for that weekday (DEFAULT_HOURS when the doctor
+has none). Booked slots come from a per-process SlotIndex, loaded with one
+index range read per doctor and then kept current by the bookings made in
+this process; it is reloaded after SLOT_INDEX_TTL to pick up bookings made
+elsewhere. The index only decides what the UI offers. The unique key on
+Appointment (DoctorID, AppointmentDate, AppointmentTime) is what stops two
+concurrent bookings of the same slot.
+"""
+import os
+import threading
+import time as clock
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+import streamlit as st
+
+from database import db_connection
+from query_cache import cached_fetchall
+
+
+SLOT_INDEX_TTL = float(os.environ.get("EHR_SLOT_INDEX_TTL", "60"))  # seconds before a doctor's bookings are reloaded
+
+Shift = namedtuple("Shift", ["weekday", "start", "end", "slot_minutes"])
+BookingResult = namedtuple("BookingResult", ["status", "appointment_id", "message"])
+
+# Monday to Friday, 09:00-17:00 in 30 minute slots
+DEFAULT_HOURS = [Shift(weekday, time(9), time(17), 30) for weekday in range(5)]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def as_time(value):
+    """pymysql returns TIME columns as timedelta; slots are compared as time."""
+    if isinstance(value, timedelta):
+        return (datetime.min + value).time()
+    return value.replace(microsecond=0) if isinstance(value, time) else value
+
+
+def working_hours(doctor_id):
+    """The doctor's shifts, or DEFAULT_HOURS when none are set."""
+    rows = cached_fetchall(
+        "SELECT Weekday, StartTime, EndTime, SlotMinutes FROM DoctorAvailability WHERE DoctorID = %s "
+        "ORDER BY Weekday, StartTime",
+        (doctor_id,), tables=("DoctorAvailability",),
+    )
+    shifts = [Shift(weekday, as_time(start), as_time(end), minutes) for weekday, start, end, minutes in rows]
+    return shifts or DEFAULT_HOURS
+
+
+def slot_times(doctor_id, day):
+    """Every slot start time the doctor works on ``day``."""
+    slots = []
+    for shift in working_hours(doctor_id):
+        if shift.weekday != day.weekday():
+            continue
+        start = datetime.combine(day, shift.start)
+        end = datetime.combine(day, shift.end)
+        step = timedelta(minutes=shift.slot_minutes)
+        while start + step <= end:
+            slots.append(start.time())
+            start += step
+    return sorted(set(slots))
+
+
+class SlotIndex:
+    """Booked (date, time) slots per doctor from today onwards."""
+
+    def __init__(self, ttl=SLOT_INDEX_TTL):
+        self.ttl = ttl
+        self._doctors = {}  # doctor_id -> (loaded_at, {date: set(time)})
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _load(self, doctor_id):
+        with db_connection() as conn:
+            if conn is None:
+                return {}
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT AppointmentDate, AppointmentTime FROM Appointment "
+                "WHERE DoctorID = %s AND AppointmentDate >= %s",
+                (doctor_id, date.today()),
+            )
+            rows = cursor.fetchall()
+        booked = {}
+        for day, slot in rows:
+            booked.setdefault(day, set()).add(as_time(slot))
+        return booked
+
+    def booked(self, doctor_id, day):
+        with self._lock:
+            entry = self._doctors.get(doctor_id)
+            if entry is not None and entry[0] > clock.monotonic() - self.ttl:
+                self._stats["hits"] += 1
+                return frozenset(entry[1].get(day, ()))
+            self._stats["misses"] += 1
+        # Load outside the lock; a concurrent load of the same doctor is harmless
+        booked = self._load(doctor_id)
+        with self._lock:
+            self._doctors[doctor_id] = (clock.monotonic(), booked)
+            return frozenset(booked.get(day, ()))
+
+    def add(self, doctor_id, day, slot):
+        with self._lock:
+            entry = self._doctors.get(doctor_id)
+            if entry is not None:
+                entry[1].setdefault(day, set()).add(as_time(slot))
+
+    def remove(self, doctor_id, day, slot):
+        with self._lock:
+            entry = self._doctors.get(doctor_id)
+            if entry is not None:
+                entry[1].get(day, set()).discard(as_time(slot))
+
+    def invalidate(self, doctor_id=None):
+        with self._lock:
+            if doctor_id is None:
+                self._doctors.clear()
+            else:
+                self._doctors.pop(doctor_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                doctors=len(self._doctors),
+                hit_ratio=self._stats["hits"] / lookups if lookups else 0.0,
+            )
+
+
+# One index per server process, shared across Streamlit sessions
+@st.cache_resource
+def get_slot_index():
+    return SlotIndex()
+
+
+def free_slots(doctor_id, day, now=None):
+    """Slot times on ``day`` that are within working hours, unbooked and not yet past."""
+    now = now or datetime.now()
+    if day < now.date():
+        return []
+    booked = get_slot_index().booked(doctor_id, day)
+    return [
+        slot for slot in slot_times(doctor_id, day)
+        if slot not in booked and (day > now.date() or slot > now.time())
+    ]
@@ -0,0 +1,266 @@
+"""Drive the app's data functions from many concurrent simulated users.
+
+Each simulated user logs in as a seeded patient, doctor or admin (see
+seed.py) through login_user and then loops over a weighted mix of the
+operations that role's pages run: booking and listing appointments, paying
+bills from the wallet, timelines, worklists, admin listings and search.
+Every call is timed; the report gives throughput and p50/p95/p99 latency
+per operation, plus errors (exceptions and failed results). Rejections
+that are part of normal use, such as a slot taken by another user or a
+wallet without funds, are counted as successful calls.
+
+    python benchmarks/seed.py --patients 100000
+    python benchmarks/load_test.py --users 50 --duration 120
+    python benchmarks/load_test.py --users 200 --duration 300 --pool-size 20 --json load.json
+
+Run it against a local database only: it books appointments and pays bills.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# seed and the app modules import database, which reads EHR_POOL_MAX_SIZE at
+# import time; they are imported inside functions, after main() has set it
+from login_throughput import percentile
+
+
+# share of simulated users per role
+ROLE_MIX = {"Patient": 0.80, "Doctor": 0.15, "Admin": 0.05}
+SAMPLE_ACCOUNTS = 5000  # seeded accounts per role the users are drawn from
+
+
+def _ok(result):
+    # Booking and payment results carry a status; only "error" is a failure
+    status = getattr(result, "status", None)
+    return status != "error"
+
+
+def patient_operations(repo, user, rng):
+    from availability import free_slots
+
+    def fetch_patient_appointments():
+        repo.appointments.for_patient(user["id"])
+        return True
+
+    def create_appointment():
+        doctor_id = rng.choice(user["doctor_ids"])
+        day = date.today() + timedelta(days=rng.randint(1, 30))
+        slots = free_slots(doctor_id, day)
+        if not slots:
+            return True  # nothing to book that day; the lookup itself was timed
+        return _ok(repo.appointments.book(user["id"], doctor_id, day, rng.choice(slots)))
+
+    def pay_bill_with_wallet():
+        bills = repo.billing.unpaid_for_patient(user["id"])
+        if not bills:
+            return True
+        bill = rng.choice(bills)
+        if rng.random() < 0.5:
+            repo.wallets.top_up(user["wallet_id"], bill.total_amount)
+        return _ok(repo.wallets.pay_bill(user["id"], bill.billing_id))
+
+    def patient_timeline():
+        repo.timeline.page(user["id"])
+        return True
+
+    def view_patient_tests():
+        repo.test_results.for_patient(user["id"])
+        return True
+
+    def wallet_balance():
+        return repo.wallets.balance(user["id"]) is not None
+
+    return [
+        (fetch_patient_appointments, 30), (patient_timeline, 20), (view_patient_tests, 15),
+        (wallet_balance, 15), (create_appointment, 10), (pay_bill_with_wallet, 10),
+    ]
+
+
+def doctor_operations(repo, user, rng):
+    def doctor_worklist():
+        repo.worklist.for_doctor(user["id"])
+        return True
+
+    def fetch_doctor_appointments():
+        repo.appointments.for_doctor(user["id"])
+        return True
+
+    def get_doctor_medical_records():
+        repo.medical_records.for_doctor(user["id"])
+        return True
+
+    def pending_tests():
+        repo.test_results.pending_for_doctor(user["id"])
+        return True
+
+    def search_records():
+        repo.search.medical_records(rng.choice(["diabetes", "hypertension", "anemia"]), "Doctor", user["id"])
+        return True
+
+    return [
+        (doctor_worklist, 35), (fetch_doctor_appointments, 25), (pending_tests, 15),
+        (get_doctor_medical_records, 15), (search_records, 10),
+    ]
+
+
+def admin_operations(repo, user, rng):
+    def admin_view_patient_appointments():
+        repo.appointments.page()
+        return True
+
+    def view_medical_records_admin():
+        repo.medical_records.page()
+        return True
+
+    def fetch_billing_records_for_admin():
+        repo.billing.page()
+        return True
+
+    def admin_dashboard():
+        today = date.today()
+        repo.dashboard.billing()
+        repo.dashboard.appointments_by_doctor(today - timedelta(days=6), today + timedelta(days=8))
+        return True
+
+    return [
+        (admin_view_patient_appointments, 30), (view_medical_records_admin, 25),
+        (fetch_billing_records_for_admin, 25), (admin_dashboard, 20),
+    ]
+
+
+OPERATIONS = {"Patient": patient_operations, "Doctor": doctor_operations, "Admin": admin_operations}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def time(self, name, operation):
+        started = time.perf_counter()
+        try:
+            ok = operation()
+        except Exception as e:
+            print(f"{name}: {e}")
+            ok = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+
+def sample_accounts(limit=SAMPLE_ACCOUNTS):
+    """A sample of seeded (id, email, wallet id) accounts per role."""
+    from database import db_connection
+    from seed import SEED_DOMAIN
+
+    with db_connection() as conn:
+        if conn is None:
+            raise SystemExit("Could not connect to the database.")
+        cursor = conn.cursor()
+        pattern = f"%@{SEED_DOMAIN}"
+        cursor.execute("SELECT p.PatientID, p.Email, w.WalletID FROM Patient p "
+                       "JOIN Wallets w ON w.PatientID = p.PatientID WHERE p.Email LIKE %s LIMIT %s", (pattern, limit))
+        patients = cursor.fetchall()
+        cursor.execute("SELECT DoctorID, Email, NULL FROM Doctor WHERE Email LIKE %s LIMIT %s", (pattern, limit))
+        doctors = cursor.fetchall()
+        cursor.execute("SELECT id, email, NULL FROM admin WHERE email LIKE %s LIMIT %s", (pattern, limit))
+        admins = cursor.fetchall()
+    if not (patients and doctors and admins):
+        raise SystemExit("No seeded accounts found; run benchmarks/seed.py first.")
+    return {"Patient": patients, "Doctor": doctors, "Admin": admins}
+
+
+def simulated_user(role, account, doctor_ids, deadline, recorder, think_time, seed):
+    from Electronic_Health_Record import login_user
+    import repositories as repo
+    from seed import SEED_PASSWORD
+
+    rng = random.Random(seed)
+    user_id, email, wallet_id = account
+    recorder.time("login_user", lambda: login_user(email, SEED_PASSWORD, role)[1])
+    user = {"id": user_id, "wallet_id": wallet_id, "doctor_ids": doctor_ids}
+    operations = OPERATIONS[role](repo, user, rng)
+    functions = [function for function, _ in operations]
+    weights = [weight for _, weight in operations]
+    while time.monotonic() < deadline:
+        function = rng.choices(functions, weights)[0]
+        recorder.time(function.__name__, function)
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+def run(users, duration, think_time, seed):
+    accounts = sample_accounts()
+    doctor_ids = [doctor[0] for doctor in accounts["Doctor"]]
+    rng = random.Random(seed)
+    recorder = Recorder()
+    roles = rng.choices(list(ROLE_MIX), list(ROLE_MIX.values()), k=users)
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=simulated_user, name=f"user-{n}", args=(
+            role, rng.choice(accounts[role]), doctor_ids, deadline, recorder, think_time, rng.random()))
+        for n, role in enumerate(roles)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def report(recorder, wall):
+    rows = []
+    for name in sorted(recorder.latencies, key=lambda name: -len(recorder.latencies[name])):
+        samples = recorder.latencies[name]
+        rows.append({
+            "operation": name, "calls": len(samples), "errors": recorder.errors[name],
+            "per_second": len(samples) / wall,
+            "p50_ms": percentile(samples, 50) * 1000, "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        })
+    return rows
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's calls, seconds")
+    parser.add_argument("--pool-size", type=int, default=None, help="connection pool size (EHR_POOL_MAX_SIZE)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv[1:])
+
+    if args.pool_size:
+        if "database" in sys.modules:
+            raise SystemExit("--pool-size must be set before database.py is imported")
+        os.environ["EHR_POOL_MAX_SIZE"] = str(args.pool_size)
+    recorder, wall = run(args.users, args.duration, args.think_time, args.seed)
+    rows = report(recorder, wall)
+
+    total = sum(row["calls"] for row in rows)
+    print(f"{args.users} users, {wall:.0f}s, {total / wall:.1f} calls/s")
+    print(f"{'operation':<34} {'calls':>8} {'errors':>7} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(f"{row['operation']:<34} {row['calls']:>8} {row['errors']:>7} {row['per_second']:>9.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "duration": wall, "operations": rows}, f, indent=2)
+    return 1 if any(row["errors"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
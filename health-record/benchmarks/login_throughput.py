@@ -0,0 +1,71 @@
+"""Measure password verification throughput at different bcrypt costs.
+
+Simulates a morning sign-in wave: ``--users`` concurrent sessions each log
+in ``--logins`` times through passwords.verify_password, which runs on the
+bounded bcrypt worker pool. Use the output to pick EHR_BCRYPT_ROUNDS and
+EHR_BCRYPT_WORKERS for the expected peak.
+
+    python benchmarks/login_throughput.py --costs 10 11 12 13 --users 32 --workers 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(cost, users, logins):
+    import passwords
+
+    hashed = passwords.hash_password("correct horse battery staple", rounds=cost)
+    latencies = []
+    lock = threading.Lock()
+
+    def session():
+        for _ in range(logins):
+            started = time.perf_counter()
+            passwords.verify_password("correct horse battery staple", hashed)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=session) for _ in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return len(latencies) / wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--users", type=int, default=16, help="concurrent sessions logging in")
+    parser.add_argument("--logins", type=int, default=5, help="logins per session")
+    parser.add_argument("--workers", type=int, default=None, help="bcrypt worker pool size")
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ["EHR_BCRYPT_WORKERS"] = str(args.workers)
+    import passwords
+
+    print(f"bcrypt workers: {passwords.BCRYPT_WORKERS}, users: {args.users}, logins/user: {args.logins}")
+    print(f"{'cost':>4}  {'logins/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}")
+    for cost in args.costs:
+        throughput, latencies = run(cost, args.users, args.logins)
+        print(f"{cost:>4}  {throughput:>9.1f}  {percentile(latencies, 50) * 1000:>8.1f}  "
+              f"{percentile(latencies, 95) * 1000:>8.1f}  {percentile(latencies, 99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
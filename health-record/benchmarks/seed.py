@@ -0,0 +1,413 @@
+"""Fill the EHR schema with synthetic, referentially consistent data.
+
+Generates doctors, patients with wallets, and for every patient a history
+of appointments, medical records, lab test results, bills and the wallet
+ledger rows that paid them, then bulk loads it all with LOAD DATA LOCAL
+INFILE (or multi-row INSERTs with ``--insert``). Row counts scale with
+``--patients``; with the defaults each patient adds about 20 rows, so
+``--patients 1000000`` loads around twenty million.
+
+Run it against a fully migrated database (``python migrate.py``). New rows
+get IDs above the current maximum of each table, and the dashboard
+summaries and doctor worklists are brought up to date for them afterwards.
+Every seeded account logs in with SEED_PASSWORD.
+
+    python benchmarks/seed.py --patients 100000
+    python benchmarks/seed.py --patients 2000000 --doctors 5000 --seed 7
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as clock_time, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql
+
+from database import DB_CONFIG
+from summaries import BILLING_SLOTS
+
+
+SEED_PASSWORD = "seed-password"
+SEED_DOMAIN = "seed.ehr.test"
+LOAD_CHUNK_ROWS = 200000  # rows per LOAD DATA file / INSERT batch group
+INSERT_BATCH = 2000
+
+# Weekday slots the generator books: 09:00 to 16:30 every 30 minutes
+DAY_SLOTS = [clock_time(9 + minutes // 60, minutes % 60) for minutes in range(0, 8 * 60, 30)]
+
+FIRST_NAMES = [
+    "Aarav", "Abigail", "Aisha", "Alejandro", "Amelia", "Ananya", "Arjun", "Ava", "Benjamin", "Carlos",
+    "Charlotte", "Chen", "Chloe", "Daniel", "Diego", "Elena", "Emily", "Emma", "Ethan", "Fatima",
+    "Gabriel", "Grace", "Hannah", "Harper", "Hiro", "Ibrahim", "Isabella", "Ivan", "Jack", "James",
+    "Kavya", "Liam", "Lucas", "Maria", "Mateo", "Mia", "Mohammed", "Noah", "Olivia", "Omar",
+    "Priya", "Rahul", "Sakura", "Samuel", "Sofia", "Sophia", "Wei", "William", "Yusuf", "Zara",
+]
+LAST_NAMES = [
+    "Ahmed", "Anderson", "Brown", "Chen", "Clark", "Davis", "Fernandez", "Garcia", "Gupta", "Hall",
+    "Hernandez", "Ito", "Jackson", "Johnson", "Khan", "Kim", "Kumar", "Lee", "Lewis", "Lopez",
+    "Martin", "Martinez", "Miller", "Moore", "Nguyen", "Okafor", "Patel", "Perez", "Petrov", "Reddy",
+    "Robinson", "Rodriguez", "Sanchez", "Sato", "Sharma", "Singh", "Smith", "Tanaka", "Taylor", "Thomas",
+    "Thompson", "Walker", "Wang", "White", "Williams", "Wilson", "Wright", "Yadav", "Young", "Zhang",
+]
+STREETS = ["Oak", "Maple", "Cedar", "Pine", "Elm", "Lake", "Hill", "Park", "River", "Station"]
+CITIES = ["Springfield", "Riverside", "Fairview", "Franklin", "Greenville", "Madison", "Georgetown", "Salem"]
+SPECIALIZATIONS = [
+    "General Practice", "Cardiology", "Dermatology", "Endocrinology", "Gastroenterology", "Neurology",
+    "Obstetrics", "Oncology", "Ophthalmology", "Orthopedics", "Pediatrics", "Psychiatry", "Pulmonology",
+]
+# diagnosis, prescription, lab tests usually ordered for it
+DIAGNOSES = [
+    ("Type 2 diabetes mellitus", "Metformin 500 mg twice daily", ["HbA1c", "Fasting Blood Glucose", "Lipid Panel"]),
+    ("Essential hypertension", "Amlodipine 5 mg once daily", ["Basic Metabolic Panel", "Lipid Panel"]),
+    ("Acute upper respiratory infection", "Rest, fluids, paracetamol 500 mg as needed", ["Complete Blood Count"]),
+    ("Iron deficiency anemia", "Ferrous sulfate 325 mg daily", ["Complete Blood Count", "Ferritin"]),
+    ("Hypothyroidism", "Levothyroxine 50 mcg daily", ["TSH", "Free T4"]),
+    ("Hyperlipidemia", "Atorvastatin 20 mg nightly", ["Lipid Panel", "Liver Function Test"]),
+    ("Urinary tract infection", "Nitrofurantoin 100 mg twice daily for 5 days", ["Urinalysis", "Urine Culture"]),
+    ("Vitamin D deficiency", "Cholecalciferol 1000 IU daily", ["Vitamin D"]),
+    ("Asthma, mild persistent", "Budesonide inhaler 200 mcg twice daily", ["Spirometry"]),
+    ("Gastroesophageal reflux disease", "Omeprazole 20 mg before breakfast", []),
+    ("Low back pain", "Ibuprofen 400 mg as needed, physiotherapy", []),
+    ("Migraine without aura", "Sumatriptan 50 mg at onset", []),
+    ("Atopic dermatitis", "Hydrocortisone 1% cream twice daily", []),
+    ("Chronic kidney disease, stage 2", "Lisinopril 10 mg daily", ["Basic Metabolic Panel", "Urinalysis"]),
+    ("Annual health check", "No medication", ["Complete Blood Count", "Lipid Panel", "Fasting Blood Glucose"]),
+]
+# test name, description, cost, typical result
+LAB_TESTS = [
+    ("Complete Blood Count", "Red and white cells, hemoglobin, platelets", "25.00", "Within normal limits"),
+    ("Basic Metabolic Panel", "Electrolytes, kidney function and glucose", "30.00", "Creatinine 0.9 mg/dL, normal"),
+    ("Lipid Panel", "Total, LDL and HDL cholesterol, triglycerides", "35.00", "LDL 128 mg/dL, borderline high"),
+    ("HbA1c", "Average blood glucose over three months", "40.00", "HbA1c 7.2%"),
+    ("Fasting Blood Glucose", "Plasma glucose after an overnight fast", "15.00", "112 mg/dL, impaired fasting glucose"),
+    ("Liver Function Test", "ALT, AST, ALP and bilirubin", "35.00", "ALT 32 U/L, normal"),
+    ("TSH", "Thyroid stimulating hormone", "30.00", "TSH 5.8 mIU/L, elevated"),
+    ("Free T4", "Free thyroxine", "30.00", "Free T4 0.9 ng/dL, normal"),
+    ("Ferritin", "Iron stores", "28.00", "Ferritin 9 ng/mL, low"),
+    ("Vitamin D", "25-hydroxy vitamin D", "45.00", "18 ng/mL, insufficient"),
+    ("Urinalysis", "Urine chemistry and microscopy", "12.00", "Leukocyte esterase positive"),
+    ("Urine Culture", "Bacterial culture and sensitivity", "40.00", "E. coli > 100,000 CFU/mL"),
+    ("Spirometry", "Lung function", "60.00", "FEV1/FVC 0.68, obstructive pattern"),
+]
+
+
+def _id_range_start(cursor, table, key):
+    cursor.execute(f"SELECT COALESCE(MAX({key}), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+class TableLoader:
+    """Buffers one table's rows in a CSV file and bulk loads it in chunks."""
+
+    def __init__(self, conn, table, columns, use_insert=False, chunk_rows=LOAD_CHUNK_ROWS):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.use_insert = use_insert
+        self.chunk_rows = chunk_rows
+        self.loaded = 0
+        self._rows = []
+        self._file = None
+        self._writer = None
+        self._pending = 0
+
+    def add(self, row):
+        if self.use_insert:
+            self._rows.append(row)
+        else:
+            if self._file is None:
+                self._file = tempfile.NamedTemporaryFile("w", newline="", suffix=".csv", delete=False)
+                self._writer = csv.writer(self._file, lineterminator="\n")
+            self._writer.writerow([r"\N" if value is None else value for value in row])
+        self._pending += 1
+        if self._pending >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        cursor = self.conn.cursor()
+        if self.use_insert:
+            statement = (f"INSERT INTO {self.table} ({', '.join(self.columns)}) "
+                         f"VALUES ({', '.join(['%s'] * len(self.columns))})")
+            for start in range(0, len(self._rows), INSERT_BATCH):
+                cursor.executemany(statement, self._rows[start:start + INSERT_BATCH])
+            self._rows = []
+        else:
+            self._file.close()
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                    "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(self.columns)})",
+                    (self._file.name,),
+                )
+            finally:
+                os.unlink(self._file.name)
+                self._file = self._writer = None
+        self.conn.commit()
+        self.loaded += self._pending
+        self._pending = 0
+
+
+class SlotBook:
+    """Hands out distinct weekday slots per doctor between two dates.
+
+    Slot indexes are visited in a fixed-stride permutation, so bookings are
+    spread over the whole period and never collide, without remembering
+    which slots were taken.
+    """
+
+    def __init__(self, first_day, last_day, rng):
+        days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+        self.days = [day for day in days if day.weekday() < 5]
+        self.size = len(self.days) * len(DAY_SLOTS)
+        self.rng = rng
+        self._booked = {}  # doctor_id -> (next counter, stride)
+
+    def _stride(self):
+        if self.size < 2:
+            return 1
+        while True:
+            stride = self.rng.randrange(1, self.size)
+            if _gcd(stride, self.size) == 1:
+                return stride
+
+    def book(self, doctor_id):
+        """Next (date, time) for the doctor, or None when the doctor is fully booked."""
+        counter, stride = self._booked.get(doctor_id) or (0, None)
+        if counter >= self.size:
+            return None
+        stride = stride or self._stride()
+        self._booked[doctor_id] = (counter + 1, stride)
+        index = (counter * stride + doctor_id) % self.size
+        return self.days[index // len(DAY_SLOTS)], DAY_SLOTS[index % len(DAY_SLOTS)]
+
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def _phone(rng):
+    return f"{rng.randrange(200, 999)}{rng.randrange(1000000, 9999999)}"
+
+
+def _lab_tests(conn):
+    """Insert the lab test catalog where missing; returns {name: (id, cost, result)}."""
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT IGNORE INTO LabTests (TestName, Description, Cost) VALUES (%s, %s, %s)",
+        [(name, description, cost) for name, description, cost, _ in LAB_TESTS],
+    )
+    conn.commit()
+    cursor.execute("SELECT TestName, LabTestID, Cost FROM LabTests")
+    results = {name: result for name, _, _, result in LAB_TESTS}
+    return {name: (lab_test_id, cost, results.get(name, "Reviewed"))
+            for name, lab_test_id, cost in cursor.fetchall()}
+
+
+def seed(conn, patients, doctors, visits, history_days, future_days, rng, use_insert=False, today=None):
+    today = today or date.today()
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+    password = _hash_seed_password()
+    lab_tests = _lab_tests(conn)
+
+    first = {table: _id_range_start(cursor, table, key) for table, key in [
+        ("Doctor", "DoctorID"), ("Patient", "PatientID"), ("Wallets", "WalletID"), ("Appointment", "AppointmentID"),
+        ("MedicalRecord", "RecordID"), ("TestResults", "TestID"), ("Billing", "BillingID"),
+        ("WalletTransactions", "TransactionID"), ("admin", "id"), ("AdminWallets", "WalletID"),
+    ]}
+
+    def loader(table, columns):
+        return TableLoader(conn, table, columns, use_insert)
+
+    loaders = {
+        "Doctor": loader("Doctor", ["DoctorID", "FirstName", "LastName", "Specialization", "PhoneNumber", "Email", "Password"]),
+        "Patient": loader("Patient", ["PatientID", "FirstName", "LastName", "DOB", "Address", "PhoneNumber", "Email", "Password"]),
+        "Wallets": loader("Wallets", ["WalletID", "PatientID", "Balance"]),
+        "Appointment": loader("Appointment", ["AppointmentID", "PatientID", "DoctorID", "AppointmentDate", "AppointmentTime"]),
+        "MedicalRecord": loader("MedicalRecord", ["RecordID", "AppointmentID", "Prescription", "Diagnosis", "TestTaken"]),
+        "TestResults": loader("TestResults", ["TestID", "LabTestID", "RecordID", "Result"]),
+        "Billing": loader("Billing", ["BillingID", "PatientID", "RecordID", "TotalAmount", "PaymentStatus", "TransactionID"]),
+        "WalletTransactions": loader("WalletTransactions", ["TransactionID", "WalletID", "Amount", "Description", "TransactionDate"]),
+        "AdminWalletCredits": loader("AdminWalletCredits", ["WalletID", "Amount", "BillingID", "Description", "CreatedAt"]),
+    }
+
+    # One admin and admin wallet receive every seeded payment
+    admin_id, admin_wallet_id = first["admin"], first["AdminWallets"]
+    cursor.execute("INSERT INTO admin (id, email, password) VALUES (%s, %s, %s)",
+                   (admin_id, f"admin{admin_id}@{SEED_DOMAIN}", password))
+    cursor.execute("INSERT INTO AdminWallets (WalletID, id, Balance) VALUES (%s, %s, 0)", (admin_wallet_id, admin_id))
+    conn.commit()
+
+    doctor_ids = list(range(first["Doctor"], first["Doctor"] + doctors))
+    for doctor_id in doctor_ids:
+        loaders["Doctor"].add((doctor_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                               rng.choice(SPECIALIZATIONS), _phone(rng), f"doctor{doctor_id}@{SEED_DOMAIN}", password))
+
+    slots = SlotBook(today - timedelta(days=history_days), today + timedelta(days=future_days), rng)
+    ids = {table: first[table] for table in ("Appointment", "MedicalRecord", "TestResults", "Billing", "WalletTransactions")}
+
+    def next_id(table):
+        ids[table] += 1
+        return ids[table] - 1
+
+    for patient_id in range(first["Patient"], first["Patient"] + patients):
+        wallet_id = first["Wallets"] + patient_id - first["Patient"]
+        dob = today - timedelta(days=rng.randrange(365 * 2, 365 * 90))
+        address = f"{rng.randrange(1, 9999)} {rng.choice(STREETS)} St, {rng.choice(CITIES)}"
+        loaders["Patient"].add((patient_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), dob, address,
+                                _phone(rng), f"patient{patient_id}@{SEED_DOMAIN}", password))
+        loaders["Wallets"].add((wallet_id, patient_id, "0.00"))
+
+        history = []
+        for _ in range(rng.randint(0, 2 * visits)):
+            doctor_id = rng.choice(doctor_ids)
+            slot = slots.book(doctor_id)
+            if slot is None:
+                continue  # doctor fully booked over the period
+            appointment_id = next_id("Appointment")
+            loaders["Appointment"].add((appointment_id, patient_id, doctor_id, slot[0], slot[1]))
+            history.append((slot, appointment_id))
+        history.sort()
+
+        paid = []
+        for (day, _), appointment_id in history:
+            if day >= today or rng.random() > 0.85:
+                continue  # upcoming, or the record was never written
+            diagnosis, prescription, suggested = rng.choice(DIAGNOSES)
+            ordered = rng.sample(suggested, rng.randint(1, len(suggested))) if suggested and rng.random() < 0.6 else []
+            record_id = next_id("MedicalRecord")
+            loaders["MedicalRecord"].add((record_id, appointment_id, prescription, diagnosis, int(bool(ordered))))
+
+            amount = Decimal(rng.randrange(50, 300))
+            recent = (today - day).days < 14
+            for name in ordered:
+                lab_test_id, cost, result = lab_tests[name]
+                pending = recent and rng.random() < 0.5
+                loaders["TestResults"].add((next_id("TestResults"), lab_test_id, record_id, None if pending else result))
+                amount += cost
+
+            if rng.random() < 0.9:
+                billing_id = next_id("Billing")
+                if rng.random() < (0.4 if recent else 0.8):
+                    paid.append((billing_id, record_id, amount, day))
+                else:
+                    loaders["Billing"].add((billing_id, patient_id, record_id, amount, "Pending", None))
+
+        # Wallet ledger: a top-up covering the paid bills, then one debit per payment
+        first_day = history[0][0][0] if history else today
+        top_up = sum(amount for _, _, amount, _ in paid) + rng.randrange(0, 500)
+        if top_up:
+            loaders["WalletTransactions"].add((next_id("WalletTransactions"), wallet_id, top_up, "Wallet top-up",
+                                               datetime.combine(min(first_day, today), clock_time(8))))
+        for billing_id, record_id, amount, day in paid:
+            paid_at = datetime.combine(day, clock_time(18))
+            transaction_id = next_id("WalletTransactions")
+            loaders["WalletTransactions"].add((transaction_id, wallet_id, -amount,
+                                               f"Payment for bill {billing_id}", paid_at))
+            loaders["Billing"].add((billing_id, patient_id, record_id, amount, "Completed", transaction_id))
+            loaders["AdminWalletCredits"].add((admin_wallet_id, amount, billing_id,
+                                               f"Payment for bill {billing_id}", paid_at))
+
+    for table_loader in loaders.values():
+        table_loader.flush()
+    cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+    return first, {table: table_loader.loaded for table, table_loader in loaders.items()}
+
+
+def _hash_seed_password():
+    import passwords
+    return passwords.hash_password(SEED_PASSWORD).decode("utf-8")
+
+
+def refresh_read_models(conn, first):
+    """Add the seeded rows to the summary tables and doctor worklists."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO DailyDoctorAppointments (DoctorID, AppointmentDate, Appointments)
+        SELECT DoctorID, AppointmentDate, COUNT(*) FROM Appointment WHERE AppointmentID >= %s
+        GROUP BY DoctorID, AppointmentDate
+        ON DUPLICATE KEY UPDATE Appointments = Appointments + VALUES(Appointments)
+    """, (first["Appointment"],))
+    cursor.execute(f"""
+        INSERT INTO BillingSummary (PaymentStatus, Slot, Bills, Amount)
+        SELECT PaymentStatus, BillingID % {BILLING_SLOTS}, COUNT(*), COALESCE(SUM(TotalAmount), 0)
+        FROM Billing WHERE BillingID >= %s GROUP BY PaymentStatus, BillingID % {BILLING_SLOTS}
+        ON DUPLICATE KEY UPDATE Bills = Bills + VALUES(Bills), Amount = Amount + VALUES(Amount)
+    """, (first["Billing"],))
+    cursor.execute("""
+        INSERT INTO LabTestVolume (LabTestID, Assigned)
+        SELECT LabTestID, COUNT(*) FROM TestResults WHERE TestID >= %s GROUP BY LabTestID
+        ON DUPLICATE KEY UPDATE Assigned = Assigned + VALUES(Assigned)
+    """, (first["TestResults"],))
+    # Same aggregate as the 0009 backfill, for the new appointments only
+    cursor.execute("""
+        INSERT INTO DoctorWorklist
+            (AppointmentID, DoctorID, AppointmentDate, AppointmentTime, PatientID, PatientName,
+             Records, TestsPending, Bills)
+        SELECT a.AppointmentID, a.DoctorID, a.AppointmentDate, a.AppointmentTime, a.PatientID,
+               CONCAT(p.FirstName, ' ', p.LastName),
+               COUNT(DISTINCT m.RecordID), COUNT(DISTINCT IF(tr.Result IS NULL, tr.TestID, NULL)),
+               COUNT(DISTINCT b.BillingID)
+        FROM Appointment a
+        JOIN Patient p ON a.PatientID = p.PatientID
+        LEFT JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+        LEFT JOIN TestResults tr ON tr.RecordID = m.RecordID
+        LEFT JOIN Billing b ON b.RecordID = m.RecordID
+        WHERE a.AppointmentID >= %s
+        GROUP BY a.AppointmentID, p.PatientID
+    """, (first["Appointment"],))
+    cursor.execute("DELETE FROM DoctorWorklist WHERE Done AND AppointmentDate < CURDATE() AND AppointmentID >= %s",
+                   (first["Appointment"],))
+    conn.commit()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=None, help="default: one per 250 patients, at least 5")
+    parser.add_argument("--visits", type=int, default=4, help="mean appointments per patient")
+    parser.add_argument("--history-days", type=int, default=730, help="how far back appointments go")
+    parser.add_argument("--future-days", type=int, default=30, help="how far ahead appointments are booked")
+    parser.add_argument("--seed", type=int, default=1, help="random seed; the same seed gives the same data")
+    parser.add_argument("--insert", action="store_true",
+                        help="load with multi-row INSERTs instead of LOAD DATA LOCAL INFILE")
+    args = parser.parse_args(argv[1:])
+
+    doctors = args.doctors or max(5, args.patients // 250)
+    conn = pymysql.connect(**DB_CONFIG, local_infile=not args.insert)
+    try:
+        started = time.perf_counter()
+        first, loaded = seed(conn, args.patients, doctors, args.visits, args.history_days, args.future_days,
+                             random.Random(args.seed), use_insert=args.insert)
+        print("Refreshing summaries and doctor worklists")
+        refresh_read_models(conn, first)
+    finally:
+        conn.close()
+
+    import summaries
+    folded = summaries.refresh_revenue()
+    elapsed = time.perf_counter() - started
+    for table, rows in loaded.items():
+        print(f"{table:<20} {rows:>12,}")
+    total = sum(loaded.values())
+    print(f"Loaded {total:,} rows in {elapsed:.0f}s ({total / elapsed:,.0f} rows/s); "
+          f"folded {folded} admin credits into AdminRevenueDaily.")
+    print(f"Payments were credited to admin wallet {first['AdminWallets']}; "
+          "point EHR_ADMIN_WALLET_ID at it if it is not the app's.")
+    print(f"Seeded accounts use the email <role><id>@{SEED_DOMAIN} and the password '{SEED_PASSWORD}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
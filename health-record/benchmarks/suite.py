@@ -0,0 +1,255 @@
+"""Micro-benchmarks for every data-access function, with regression baselines.
+
+Each benchmark calls one repository read (the functions behind every page,
+from doctors.all to billing.page and test_results.for_patient) against
+a seeded database and records its median and p95 latency, the Python
+memory it allocates at peak and the rows it returns. Query cache and slot
+index are cleared before each call, so the database work is measured.
+
+Datasets are made with seed.py at fixed sizes (about 20 rows per patient):
+
+    python benchmarks/suite.py seed 100k                  seed an empty, migrated database to ~100k rows
+    python benchmarks/suite.py run 100k -o base-100k.json  run every benchmark, write the results
+    python benchmarks/suite.py compare base-100k.json new-100k.json
+                                                           list regressions; exit 1 if there are any
+
+Keep one baseline per dataset size and compare like with like: a change
+to a join or an ORDER BY that only bites at 10m rows shows up there first.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from login_throughput import percentile
+
+
+# dataset label -> seed.py --patients
+DATASETS = {"1k": 50, "100k": 5000, "10m": 500000}
+REPEATS = 20
+LATENCY_THRESHOLD = 0.25  # flag a median more than 25% slower ...
+LATENCY_FLOOR_MS = 1.0  # ... and at least this much slower, to ignore jitter on fast calls
+MEMORY_THRESHOLD = 0.25
+MEMORY_FLOOR_KIB = 64
+
+
+def benchmarks(repo, ctx):
+    """(name, call) for every data-access function, with representative arguments."""
+    from availability import free_slots
+
+    today = date.today()
+    return [
+        ("doctors.all", lambda: repo.doctors.all()),
+        ("patients.credentials", lambda: repo.patients.credentials(ctx["patient_email"])),
+        ("patients.search", lambda: repo.patients.search(ctx["patient_last_name"][:3])),
+        ("appointments.for_patient", lambda: repo.appointments.for_patient(ctx["patient_id"])),
+        ("appointments.for_doctor", lambda: repo.appointments.for_doctor(ctx["doctor_id"])),
+        ("appointments.options_for_doctor", lambda: repo.appointments.options_for_doctor(ctx["doctor_id"])),
+        ("appointments.page", lambda: repo.appointments.page()),
+        ("appointments.page (filtered)", lambda: repo.appointments.page(
+            patient_name=ctx["patient_last_name"], date_from=today - timedelta(days=90), date_to=today)),
+        ("availability.free_slots", lambda: free_slots(ctx["doctor_id"], today + timedelta(days=7))),
+        ("medical_records.for_appointment", lambda: repo.medical_records.for_appointment(ctx["appointment_id"])),
+        ("medical_records.for_doctor", lambda: repo.medical_records.for_doctor(ctx["doctor_id"])),
+        ("medical_records.follow_up_options", lambda: repo.medical_records.follow_up_options(ctx["doctor_id"])),
+        ("medical_records.for_doctor_on_day", lambda: repo.medical_records.for_doctor_on_day(
+            ctx["doctor_id"], ctx["appointment_date"])),
+        ("medical_records.page", lambda: repo.medical_records.page()),
+        ("medical_records.with_tests_for_doctor", lambda: repo.medical_records.with_tests_for_doctor(
+            ctx["doctor_id"])),
+        ("medical_records.options_for_patient", lambda: repo.medical_records.options_for_patient(ctx["patient_id"])),
+        ("lab_tests.all", lambda: repo.lab_tests.all()),
+        ("lab_tests.options", lambda: repo.lab_tests.options()),
+        ("test_results.pending_for_doctor", lambda: repo.test_results.pending_for_doctor(ctx["doctor_id"])),
+        ("test_results.for_patient", lambda: repo.test_results.for_patient(ctx["patient_id"])),
+        ("billing.unpaid_for_patient", lambda: repo.billing.unpaid_for_patient(ctx["patient_id"])),
+        ("billing.page", lambda: repo.billing.page()),
+        ("wallets.balance", lambda: repo.wallets.balance(ctx["patient_id"])),
+        ("wallets.admin_balance", lambda: repo.wallets.admin_balance(ctx["admin_wallet_id"])),
+        ("timeline.page", lambda: repo.timeline.page(ctx["patient_id"])),
+        ("worklist.for_doctor", lambda: repo.worklist.for_doctor(ctx["doctor_id"])),
+        ("search.medical_records", lambda: repo.search.medical_records("diabetes", "Admin", None)),
+        ("search.test_results", lambda: repo.search.test_results("normal", "Doctor", ctx["doctor_id"])),
+        ("dashboard.appointments_by_doctor", lambda: repo.dashboard.appointments_by_doctor(
+            today - timedelta(days=6), today + timedelta(days=8))),
+        ("dashboard.billing", lambda: repo.dashboard.billing()),
+        ("dashboard.lab_test_volume", lambda: repo.dashboard.lab_test_volume()),
+        ("dashboard.revenue", lambda: repo.dashboard.revenue(today - timedelta(days=30), today + timedelta(days=1))),
+    ]
+
+
+def context():
+    """The busiest patient and doctor, so every benchmark has rows to return."""
+    from database import db_connection
+
+    with db_connection() as conn:
+        if conn is None:
+            raise SystemExit("Could not connect to the database.")
+        cursor = conn.cursor()
+        cursor.execute("SELECT PatientID FROM Appointment GROUP BY PatientID ORDER BY COUNT(*) DESC, PatientID LIMIT 1")
+        patient = cursor.fetchone()
+        cursor.execute("SELECT DoctorID FROM DailyDoctorAppointments GROUP BY DoctorID "
+                       "ORDER BY SUM(Appointments) DESC, DoctorID LIMIT 1")
+        doctor = cursor.fetchone()
+        if patient is None or doctor is None:
+            raise SystemExit("The database has no appointments; seed it first.")
+        cursor.execute("SELECT Email, LastName FROM Patient WHERE PatientID = %s", patient)
+        email, last_name = cursor.fetchone()
+        cursor.execute("SELECT AppointmentID, AppointmentDate FROM Appointment WHERE DoctorID = %s "
+                       "AND AppointmentDate < CURDATE() ORDER BY AppointmentDate DESC LIMIT 1", doctor)
+        appointment = cursor.fetchone() or (None, date.today())
+        cursor.execute("SELECT MIN(WalletID) FROM AdminWallets")
+        admin_wallet = cursor.fetchone()
+        cursor.execute("SELECT table_name, table_rows FROM information_schema.tables WHERE table_schema = DATABASE()")
+        table_rows = {name: rows for name, rows in cursor.fetchall()}
+        conn.commit()
+    return {
+        "patient_id": patient[0], "patient_email": email, "patient_last_name": last_name,
+        "doctor_id": doctor[0], "appointment_id": appointment[0], "appointment_date": appointment[1],
+        "admin_wallet_id": admin_wallet[0],
+    }, table_rows
+
+
+def _rows(result):
+    if result is None:
+        return 0
+    if hasattr(result, "rows"):
+        return len(result.rows)
+    # Lists and the tuples cached_fetchall returns; a single namedtuple row is one row
+    if isinstance(result, Sequence) and not isinstance(result, str) and not hasattr(result, "_fields"):
+        return len(result)
+    return 1
+
+
+def _reset():
+    from availability import get_slot_index
+    from query_cache import get_query_cache
+
+    get_query_cache().clear()
+    get_slot_index().invalidate()
+
+
+def measure(call, repeats=REPEATS):
+    _reset()
+    result = call()  # warm up the pool and the server's buffer pool
+    samples = []
+    for _ in range(repeats):
+        _reset()
+        started = time.perf_counter()
+        result = call()
+        samples.append(time.perf_counter() - started)
+
+    # Memory in a separate call: tracemalloc slows allocation down
+    _reset()
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "peak_kib": peak / 1024,
+        "rows": _rows(result),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(dataset, repeats, only=None):
+    import repositories as repo
+
+    ctx, table_rows = context()
+    results = {}
+    for name, call in benchmarks(repo, ctx):
+        if only and not any(part in name for part in only):
+            continue
+        results[name] = measure(call, repeats)
+        result = results[name]
+        print(f"{name:<40} {result['median_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['peak_kib']:>10.1f} {result['rows']:>7}")
+    return {
+        "dataset": dataset, "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(), "python": platform.python_version(), "repeats": repeats,
+        "table_rows": table_rows, "results": results,
+    }
+
+
+def compare(baseline, current, latency_threshold=LATENCY_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Regressions of ``current`` against ``baseline`` as printable lines."""
+    regressions = []
+    for name, before in sorted(baseline["results"].items()):
+        after = current["results"].get(name)
+        if after is None:
+            regressions.append(f"MISSING   {name}: not in the new results")
+            continue
+        slower = after["median_ms"] - before["median_ms"]
+        if (after["median_ms"] > before["median_ms"] * (1 + latency_threshold)
+                and slower >= LATENCY_FLOOR_MS):
+            regressions.append(f"LATENCY   {name}: median {before['median_ms']:.2f} -> {after['median_ms']:.2f} ms "
+                               f"({after['median_ms'] / max(before['median_ms'], 1e-9):.1f}x)")
+        grown = after["peak_kib"] - before["peak_kib"]
+        if after["peak_kib"] > before["peak_kib"] * (1 + memory_threshold) and grown >= MEMORY_FLOOR_KIB:
+            regressions.append(f"MEMORY    {name}: peak {before['peak_kib']:.0f} -> {after['peak_kib']:.0f} KiB")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed_parser = commands.add_parser("seed", help="seed the current database to a dataset size")
+    seed_parser.add_argument("dataset", choices=sorted(DATASETS))
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("dataset", choices=sorted(DATASETS), help="size the database was seeded to")
+    run_parser.add_argument("-o", "--output", help="write the results here (JSON)")
+    run_parser.add_argument("--repeats", type=int, default=REPEATS)
+    run_parser.add_argument("--only", nargs="+", help="run benchmarks whose name contains any of these")
+    compare_parser = commands.add_parser("compare", help="compare results with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--latency-threshold", type=float, default=LATENCY_THRESHOLD)
+    compare_parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv[1:])
+
+    if args.command == "seed":
+        import seed
+        return seed.main(["seed.py", "--patients", str(DATASETS[args.dataset])])
+
+    if args.command == "run":
+        print(f"{'benchmark':<40} {'median ms':>9} {'p95 ms':>9} {'peak KiB':>10} {'rows':>7}")
+        results = run(args.dataset, args.repeats, args.only)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2, default=str)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["dataset"] != current["dataset"]:
+        print(f"Warning: comparing dataset {current['dataset']} against a {baseline['dataset']} baseline")
+    regressions = compare(baseline, current, args.latency_threshold, args.memory_threshold)
+    for line in regressions:
+        print(line)
+    if regressions:
+        return 1
+    print(f"No regressions in {len(current['results'])} benchmarks.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+import pymysql.cursors
+import streamlit as st
+
+from instrumentation import InstrumentedCursor, InstrumentedSSCursor, record_acquire
+
+
+# Connection settings (override with environment variables in deployment)
+DB_CONFIG = {
+    "host": os.environ.get("EHR_DB_HOST", "localhost"),
+    "user": os.environ.get("EHR_DB_USER", "root"),
+    "port": int(os.environ.get("EHR_DB_PORT", "3306")),
+    "password": os.environ.get("EHR_DB_PASSWORD", "Maurya"),  # Update this with your actual MySQL root password
+    "database": os.environ.get("EHR_DB_NAME", "ehr"),
+}
+
+# Pool sizing and recycling
+POOL_MIN_SIZE = int(os.environ.get("EHR_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.environ.get("EHR_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.environ.get("EHR_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+POOL_IDLE_TIMEOUT = float(os.environ.get("EHR_POOL_IDLE_TIMEOUT", "300"))  # close surplus connections idle this long
+POOL_MAX_LIFETIME = float(os.environ.get("EHR_POOL_MAX_LIFETIME", "3600"))  # recycle connections older than this
+POOL_PING_INTERVAL = float(os.environ.get("EHR_POOL_PING_INTERVAL", "5"))  # ping on checkout after this much idle time
+
+# Streaming reads (exports and reports) use their own unpooled connections
+STREAM_CHUNK_ROWS = int(os.environ.get("EHR_STREAM_CHUNK_ROWS", "5000"))
+STREAM_MAX_CONCURRENT = int(os.environ.get("EHR_STREAM_MAX_CONCURRENT", "2"))
+# Seconds MySQL waits on a slow consumer before aborting the stream
+STREAM_NET_WRITE_TIMEOUT = int(os.environ.get("EHR_STREAM_NET_WRITE_TIMEOUT", "600"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class StreamBusy(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Thread-safe pool of pymysql connections shared by all Streamlit sessions.
+
+    Keeps at least ``min_size`` connections open and never more than
+    ``max_size``. Connections that have been idle for a while are pinged on
+    checkout, surplus idle ones are closed after ``idle_timeout`` and every
+    connection is replaced once it is older than ``max_lifetime``.
+    """
+
+    def __init__(self, creator, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 idle_timeout=POOL_IDLE_TIMEOUT, max_lifetime=POOL_MAX_LIFETIME, ping_interval=POOL_PING_INTERVAL):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self._creator = creator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._idle = deque()  # most recently used connection on the right
+        self._size = 0  # idle + checked out
+        self._cond = threading.Condition()
+        self.stats = {"opened": 0, "closed": 0, "checkouts": 0, "waits": 0, "failed_health_checks": 0}
+
+        for _ in range(min_size):
+            try:
+                entry = self._open()
+            except pymysql.MySQLError as e:
+                print(f"Error pre-filling connection pool: {e}")
+                break
+            with self._cond:
+                self._size += 1
+                self._idle.append(entry)
+
+    def _open(self):
+        entry = PooledConnection(self._creator())
+        with self._cond:
+            self.stats["opened"] += 1
+        return entry
+
+    def _close(self, entry):
+        with self._cond:
+            self.stats["closed"] += 1
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.max_lifetime
+
+    def _prune_idle(self, now):
+        # Oldest idle connections sit on the left; drop them down to min_size
+        expired = []
+        while self._idle and self._size > self.min_size and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft())
+            self._size -= 1
+        return expired
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry, create, to_close = None, False, []
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    to_close.extend(self._prune_idle(now))
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._expired(candidate, now):
+                            self._size -= 1
+                            to_close.append(candidate)
+                            continue
+                        entry = candidate
+                        break
+                    if entry is not None:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available after {self.timeout:.1f}s")
+                    self.stats["waits"] += 1
+                    self._cond.wait(remaining)
+                self.stats["checkouts"] += 1
+
+            for stale in to_close:
+                self._close(stale)
+
+            if create:
+                try:
+                    return self._open()
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            # Health check connections that have been sitting idle
+            if time.monotonic() - entry.last_used < self.ping_interval:
+                return entry
+            try:
+                entry.conn.ping(reconnect=False)
+                return entry
+            except Exception:
+                with self._cond:
+                    self.stats["failed_health_checks"] += 1
+                self._discard(entry)
+
+    def release(self, entry):
+        # Never hand out a connection with an open transaction or snapshot
+        try:
+            entry.conn.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+        now = time.monotonic()
+        if self._expired(entry, now):
+            self._discard(entry)
+            return
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def _discard(self, entry):
+        self._close(entry)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        entry = self.acquire()
+        try:
+            yield entry.conn
+        finally:
+            self.release(entry)
+
+    def status(self):
+        with self._cond:
+            idle = len(self._idle)
+            return dict(self.stats, size=self._size, idle=idle, in_use=self._size - idle)
+
+    def close(self):
+        with self._cond:
+            entries = list(self._idle)
+            self._idle.clear()
+            self._size -= len(entries)
+        for entry in entries:
+            self._close(entry)
+
+
+# One pool per server process, shared across Streamlit sessions and reruns
+@st.cache_resource
+def get_pool():
+    # Every cursor the app opens is timed; see instrumentation.py
+    return ConnectionPool(lambda: pymysql.connect(cursorclass=InstrumentedCursor, **DB_CONFIG))
+
+
+@contextmanager
+def db_connection(background=False):
+    """Borrow a pooled connection for the duration of a ``with`` block.
+
+    Yields None when no connection can be obtained so callers can keep their
+    ``if conn is None`` guards. Uncommitted work is rolled back on return.
+    Pass ``background=True`` from threads that are not running a Streamlit
+    script; the connection error is then printed instead of shown.
+    """
+    pool = get_pool()
+    started = time.perf_counter()
+    try:
+        entry = pool.acquire()
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        record_acquire(time.perf_counter() - started)
+        if background:
+            print(f"Error connecting to MySQL: {e}")
+        else:
+            st.error(f"Error connecting to MySQL: {e}")  # Using st.error for better visibility
+        yield None
+        return
+    record_acquire(time.perf_counter() - started)
+    try:
+        yield entry.conn
+    finally:
+        pool.release(entry)
+
+
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONCURRENT)
+
+
+def stream_query(query, params=(), chunk_size=STREAM_CHUNK_ROWS):
+    """Yield the rows of ``query`` in lists of at most ``chunk_size``.
+
+    Uses an unbuffered server-side cursor (SSCursor) on a dedicated
+    connection, so only one chunk is held in memory at a time and the server
+    only sends more rows when the consumer asks for the next chunk. At most
+    STREAM_MAX_CONCURRENT streams run at once; StreamBusy is raised when no
+    slot frees up within POOL_TIMEOUT. Abandoning the generator closes the
+    connection instead of reading the rest of the result.
+    """
+    if not _stream_slots.acquire(timeout=POOL_TIMEOUT):
+        raise StreamBusy(f"More than {STREAM_MAX_CONCURRENT} streaming queries are already running")
+    conn = None
+    try:
+        started = time.perf_counter()
+        conn = pymysql.connect(**DB_CONFIG)
+        record_acquire(time.perf_counter() - started)
+        cursor = conn.cursor(InstrumentedSSCursor)
+        cursor.execute("SET SESSION net_write_timeout = %s", (STREAM_NET_WRITE_TIMEOUT,))
+        cursor.execute(query, params or None)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        _stream_slots.release()
@@ -0,0 +1,134 @@
+"""Full-history CSV / Parquet exports with bounded memory.
+
+Rows are read through database.stream_query (an unbuffered server-side
+cursor), written one chunk at a time and dropped, so an export of millions
+of rows holds no more than EHR_STREAM_CHUNK_ROWS of them in memory. The
+writer pulls the next chunk only after the previous one is on disk, which
+is what keeps a slow destination from piling rows up in the process.
+
+    python exports.py appointments --format csv --output appointments.csv
+    python exports.py billing --format parquet --output billing.parquet --from 2024-01-01 --to 2025-01-01
+
+Parquet needs pyarrow; CSV has no extra dependencies.
+"""
+import argparse
+import csv
+import sys
+from collections import namedtuple
+from datetime import date
+
+import pymysql
+
+import repositories as repo
+from database import StreamBusy
+
+
+# columns are (name, kind); kind picks the Parquet type, CSV ignores it
+Export = namedtuple("Export", ["label", "columns", "rows"])
+
+EXPORTS = {
+    "appointments": Export(
+        "Appointments",
+        [("AppointmentID", "int"), ("AppointmentDate", "date"), ("AppointmentTime", "time"),
+         ("PatientID", "int"), ("PatientName", "text"), ("DoctorID", "int"),
+         ("DoctorName", "text"), ("Specialization", "text")],
+        repo.appointments.export,
+    ),
+    "medical_records": Export(
+        "Medical records",
+        [("RecordID", "int"), ("AppointmentID", "int"), ("AppointmentDate", "date"),
+         ("PatientName", "text"), ("DoctorName", "text"), ("Prescription", "text"),
+         ("Diagnosis", "text"), ("TestTaken", "int")],
+        repo.medical_records.export,
+    ),
+    "billing": Export(
+        "Billing",
+        [("BillingID", "int"), ("PatientID", "int"), ("PatientName", "text"), ("RecordID", "int"),
+         ("AppointmentDate", "date"), ("TotalAmount", "money"), ("PaymentStatus", "text"),
+         ("TransactionID", "int")],
+        repo.billing.export,
+    ),
+    "test_results": Export(
+        "Test results",
+        [("TestID", "int"), ("RecordID", "int"), ("AppointmentID", "int"), ("AppointmentDate", "date"),
+         ("PatientName", "text"), ("TestName", "text"), ("Result", "text")],
+        repo.test_results.export,
+    ),
+}
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def write_csv(chunks, columns, out):
+    """Write row chunks to a text file object; returns the number of rows."""
+    writer = csv.writer(out)
+    writer.writerow([name for name, _ in columns])
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def _arrow_schema(pa, columns):
+    kinds = {
+        "int": pa.int64(),
+        "date": pa.date32(),
+        "time": pa.duration("us"),  # pymysql returns TIME as timedelta
+        "text": pa.string(),
+        "money": pa.decimal128(10, 2),
+    }
+    return pa.schema([(name, kinds[kind]) for name, kind in columns])
+
+
+def write_parquet(chunks, columns, out):
+    """Write row chunks to a binary file object, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, columns)
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array([row[i] for row in rows], field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+def run_export(name, fmt, out, date_from=None, date_to=None):
+    """Stream export ``name`` into ``out`` (text mode for csv, binary for parquet)."""
+    export = EXPORTS[name]
+    return WRITERS[fmt](export.rows(date_from, date_to), export.columns, out)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Stream a full-history export to a file.")
+    parser.add_argument("dataset", choices=sorted(EXPORTS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                        help="first appointment date to include (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat,
+                        help="appointment date to stop before (YYYY-MM-DD)")
+    args = parser.parse_args(argv[1:])
+
+    mode = {"mode": "w", "newline": "", "encoding": "utf-8"} if args.format == "csv" else {"mode": "wb"}
+    try:
+        with open(args.output, **mode) as out:
+            count = run_export(args.dataset, args.format, out, args.date_from, args.date_to)
+    except StreamBusy as err:
+        print(f"Export not started: {err}")
+        return 1
+    except pymysql.MySQLError as err:
+        print(f"Error exporting {args.dataset}: {err}")
+        return 1
+    print(f"Wrote {count} {args.dataset} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
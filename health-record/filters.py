@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+import streamlit as st
+
+from pagination import reset_pager
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_condition(first_column, last_column, name):
+    """Prefix match on a person's name that can use (LastName, FirstName) indexes.
+
+    "ann" matches first or last names starting with "ann"; "ann sm" matches
+    first names starting with "ann" and last names starting with "sm".
+    """
+    parts = name.split()
+    if not parts:
+        return None, []
+    if len(parts) == 1:
+        prefix = escape_like(parts[0]) + "%"
+        return f"({first_column} LIKE %s OR {last_column} LIKE %s)", [prefix, prefix]
+    first = escape_like(parts[0]) + "%"
+    last = escape_like(" ".join(parts[1:])) + "%"
+    return f"({first_column} LIKE %s AND {last_column} LIKE %s)", [first, last]
+
+
+def build_filters(patient_name=None, doctor_name=None, date_from=None, date_to=None,
+                  patient_columns=("p.FirstName", "p.LastName"),
+                  doctor_columns=("d.FirstName", "d.LastName"),
+                  date_column="a.AppointmentDate"):
+    """Translate admin filter inputs into WHERE conditions and parameters."""
+    conditions, params = [], []
+    for columns, name in ((patient_columns, patient_name), (doctor_columns, doctor_name)):
+        if name:
+            condition, values = name_condition(columns[0], columns[1], name)
+            if condition:
+                conditions.append(condition)
+                params.extend(values)
+    # Half-open range so the date column index is used as a range scan
+    if date_from is not None:
+        conditions.append(f"{date_column} >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"{date_column} < %s")
+        params.append(date_to + timedelta(days=1))
+    return conditions, params
+
+
+def filter_inputs(state_key, date_label="Date"):
+    """Render the admin filter widgets; any change sends the pager back to page one."""
+    with st.expander("Filter", expanded=True):
+        patient_col, doctor_col = st.columns(2)
+        patient_name = patient_col.text_input("Patient Name", key=f"{state_key}_patient",
+                                              on_change=reset_pager, args=(state_key,))
+        doctor_name = doctor_col.text_input("Doctor Name", key=f"{state_key}_doctor",
+                                            on_change=reset_pager, args=(state_key,))
+        date_from = date_to = None
+        if st.checkbox(f"Filter by {date_label}", key=f"{state_key}_by_date",
+                       on_change=reset_pager, args=(state_key,)):
+            dates = st.date_input(f"{date_label} range", value=(), key=f"{state_key}_dates",
+                                  on_change=reset_pager, args=(state_key,))
+            if len(dates) == 2:
+                date_from, date_to = dates
+            elif len(dates) == 1:
+                date_from = date_to = dates[0]
+    return {
+        "patient_name": patient_name.strip() or None,
+        "doctor_name": doctor_name.strip() or None,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
@@ -0,0 +1,50 @@
+"""Typed, columnar DataFrames for the admin tables.
+
+Rows from the repositories are handed to pandas in one go and every
+conversion (dates, money, flags, joined names) runs over whole columns, so
+a large table costs a few vectorized passes instead of a formatted dict per
+row. Display formatting is left to st.column_config.
+"""
+import pandas as pd
+
+
+def _date(column):
+    return pd.to_datetime(column, errors="coerce")
+
+
+def _money(column):
+    # DECIMAL arrives as Decimal objects; one cast, not a format per row
+    return pd.to_numeric(column, errors="coerce").astype("Float64")
+
+
+def _flag(column):
+    return column.astype("boolean")
+
+
+def _time(column):
+    # pymysql returns TIME as timedelta
+    return pd.to_timedelta(column, errors="coerce")
+
+
+def _text(column):
+    return column.astype("string")
+
+
+CONVERTERS = {"date": _date, "money": _money, "flag": _flag, "time": _time, "text": _text}
+
+
+def rows_frame(rows, row_type, types=None):
+    """DataFrame with one column per ``row_type`` field.
+
+    ``types`` maps a field to one of CONVERTERS; other columns keep the
+    dtype pandas infers.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=list(row_type._fields))
+    for column, kind in (types or {}).items():
+        frame[column] = CONVERTERS[kind](frame[column])
+    return frame
+
+
+def full_name(frame, first, last):
+    """Vectorized 'First Last' from two columns."""
+    return frame[first].astype("string").str.cat(frame[last].astype("string"), sep=" ")
@@ -0,0 +1,277 @@
+"""Query timing, slow-query log and per-page rerun breakdown.
+
+Every pooled and streaming connection uses InstrumentedCursor, so each
+``cursor.execute`` is timed and recorded under its SQL fingerprint (the
+statement with literals and IN lists collapsed) with its parameter count
+and rows returned. db_connection() reports how long each pool checkout
+took.
+
+A Streamlit rerun runs inside ``@track_page`` functions: main() opens the
+rerun and the innermost page function it reaches names it (wallet_ui,
+admin_view_patient_appointments_ui, ...). Queries and connection waits are
+summed per rerun and merged into the process-wide QueryStats once the
+rerun ends, so the hot path takes no lock. Work outside any rerun (CLI
+jobs, background threads) is recorded under BACKGROUND.
+
+Queries slower than SLOW_QUERY_MS are kept for the admin Diagnostics page
+and, when EHR_SLOW_QUERY_LOG is set, appended to that file as JSON lines.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from datetime import datetime
+
+import pymysql.cursors
+import streamlit as st
+
+import profiler
+
+
+SLOW_QUERY_MS = float(os.environ.get("EHR_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.environ.get("EHR_SLOW_QUERY_LOG")  # file path; unset keeps slow queries in memory only
+SLOW_QUERIES_KEPT = 200
+MAX_FINGERPRINTS = 1000  # distinct statements tracked; the rest are counted under OTHER
+BACKGROUND = "(background)"
+OTHER = "(other statements)"
+PAGES = set()  # names of every @track_page function
+# Histogram bucket upper bounds in seconds, shared with the metrics exporter
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SlowQuery = namedtuple("SlowQuery", ["at", "page", "fingerprint", "ms", "params", "rows"])
+QueryTotal = namedtuple("QueryTotal", ["fingerprint", "calls", "total_ms", "mean_ms", "max_ms", "rows", "top_page"])
+PageTotal = namedtuple("PageTotal", [
+    "page", "reruns", "mean_ms", "max_ms", "sql_ms", "acquire_ms", "other_ms", "queries"])
+
+
+_SPACE = re.compile(r"\s+")
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+
+
+@functools.lru_cache(maxsize=512)
+def _fingerprint(sql):
+    sql = _SPACE.sub(" ", sql).strip().replace("%s", "?")
+    sql = _LITERAL.sub("?", sql)
+    return _LIST.sub("(...)", sql)  # IN lists and multi-row VALUES of any length
+
+
+def fingerprint(sql):
+    """``sql`` with whitespace normalized and values replaced, for grouping."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    if len(sql) > 4096:
+        return _fingerprint.__wrapped__(sql)  # one-off bulk statements stay out of the cache
+    return _fingerprint(sql)
+
+
+class Rerun:
+    """Totals for one Streamlit rerun; only touched by the thread running it."""
+
+    __slots__ = ("page", "started", "sql_time", "acquire_time", "queries")
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.sql_time = 0.0
+        self.acquire_time = 0.0
+        self.queries = {}  # fingerprint -> [calls, seconds, max seconds, rows, bucket counts]
+
+
+_rerun = contextvars.ContextVar("ehr_rerun", default=None)
+
+
+class QueryStats:
+    """Process-wide query and page totals."""
+
+    def __init__(self, log_path=SLOW_QUERY_LOG):
+        self.log_path = log_path
+        self._queries = {}  # fingerprint -> [calls, seconds, max seconds, rows, Counter(page -> seconds), buckets]
+        self._pages = {}  # page -> [reruns, seconds, max seconds, sql seconds, acquire seconds, queries, buckets]
+        self._slow = deque(maxlen=SLOW_QUERIES_KEPT)
+        self._lock = threading.Lock()
+        self.since = datetime.now()
+
+    def _add_query(self, key, calls, seconds, longest, rows, page, buckets):
+        if key not in self._queries and len(self._queries) >= MAX_FINGERPRINTS:
+            key = OTHER
+        totals = self._queries.get(key)
+        if totals is None:
+            totals = self._queries[key] = [0, 0.0, 0.0, 0, Counter(), [0] * (len(LATENCY_BUCKETS) + 1)]
+        totals[0] += calls
+        totals[1] += seconds
+        totals[2] = max(totals[2], longest)
+        totals[3] += rows
+        totals[4][page] += seconds
+        for i, count in enumerate(buckets):
+            totals[5][i] += count
+
+    def add_rerun(self, rerun, seconds):
+        with self._lock:
+            totals = self._pages.get(rerun.page)
+            if totals is None:
+                totals = self._pages[rerun.page] = [0, 0.0, 0.0, 0.0, 0.0, 0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+            totals[3] += rerun.sql_time
+            totals[4] += rerun.acquire_time
+            totals[5] += sum(query[0] for query in rerun.queries.values())
+            totals[6][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            for key, (calls, spent, longest, rows, buckets) in rerun.queries.items():
+                self._add_query(key, calls, spent, longest, rows, rerun.page, buckets)
+
+    def add_background(self, key, seconds, rows):
+        buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] = 1
+        with self._lock:
+            self._add_query(key, 1, seconds, seconds, rows, BACKGROUND, buckets)
+
+    def add_slow(self, slow):
+        with self._lock:
+            self._slow.append(slow)
+        if self.log_path:
+            # Outside the lock: other queries never wait on disk I/O. Each line
+            # is one append-mode write, so concurrent lines don't interleave.
+            line = json.dumps(slow._asdict(), default=str) + "\n"
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"Error writing slow query log: {e}")
+
+    def top_queries(self, limit=25):
+        with self._lock:
+            items = [(key, totals[:4], totals[4].most_common(1)) for key, totals in self._queries.items()]
+        items.sort(key=lambda item: -item[1][1])
+        return [
+            QueryTotal(key, calls, spent * 1000, spent * 1000 / calls, longest * 1000, rows,
+                       top[0][0] if top else None)
+            for key, (calls, spent, longest, rows), top in items[:limit]
+        ]
+
+    def pages(self):
+        with self._lock:
+            items = [(page, totals[:6]) for page, totals in self._pages.items()]
+        items.sort(key=lambda item: -item[1][1])
+        return [
+            PageTotal(page, reruns, spent * 1000 / reruns, longest * 1000, sql * 1000 / reruns,
+                      acquire * 1000 / reruns, (spent - sql - acquire) * 1000 / reruns, queries / reruns)
+            for page, (reruns, spent, longest, sql, acquire, queries) in items
+        ]
+
+    def histograms(self):
+        """Copies of the latency histograms for the metrics exporter.
+
+        Returns ({fingerprint: (bucket counts, seconds, calls)},
+        {page: (bucket counts, seconds, reruns, sql seconds, acquire seconds)});
+        bucket counts are per bucket, not cumulative, with a last +Inf bucket.
+        """
+        with self._lock:
+            queries = {key: (list(totals[5]), totals[1], totals[0]) for key, totals in self._queries.items()}
+            pages = {page: (list(totals[6]), totals[1], totals[0], totals[3], totals[4])
+                     for page, totals in self._pages.items()}
+        return queries, pages
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._pages.clear()
+            self._slow.clear()
+            self.since = datetime.now()
+
+
+# One set of totals per server process, shared across Streamlit sessions
+@st.cache_resource
+def get_query_stats():
+    return QueryStats()
+
+
+def _param_count(args):
+    if args is None:
+        return 0
+    return len(args) if isinstance(args, (tuple, list, dict)) else 1
+
+
+def record_query(sql, args, seconds, rows):
+    key = fingerprint(sql)
+    rerun = _rerun.get()
+    if rerun is not None:
+        totals = rerun.queries.get(key)
+        if totals is None:
+            totals = rerun.queries[key] = [0, 0.0, 0.0, 0, [0] * (len(LATENCY_BUCKETS) + 1)]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        totals[3] += rows
+        totals[4][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        rerun.sql_time += seconds
+    else:
+        get_query_stats().add_background(key, seconds, rows)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        get_query_stats().add_slow(SlowQuery(datetime.now().isoformat(timespec="seconds"),
+                                             rerun.page if rerun is not None else BACKGROUND,
+                                             key, round(seconds * 1000, 1), _param_count(args), rows))
+
+
+def record_acquire(seconds):
+    rerun = _rerun.get()
+    if rerun is not None:
+        rerun.acquire_time += seconds
+
+
+class InstrumentedCursorMixin:
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            rows = self.rowcount if isinstance(self.rowcount, int) and 0 <= self.rowcount < 2 ** 63 else 0
+            record_query(query, args, time.perf_counter() - started, rows)
+
+
+class InstrumentedCursor(InstrumentedCursorMixin, pymysql.cursors.Cursor):
+    pass
+
+
+class InstrumentedSSCursor(InstrumentedCursorMixin, pymysql.cursors.SSCursor):
+    """Unbuffered cursor; rows are not known at execute time and count as 0."""
+
+
+def track_page(func):
+    """Attribute the rerun to ``func``; the outermost call opens the rerun.
+
+    Also starts the sampling profiler when it is enabled for ``func`` or
+    for this browser session (profiler.py).
+    """
+    PAGES.add(func.__name__)
+
+    @functools.wraps(func)
+    def page(*args, **kwargs):
+        sampler = profiler.start(func) if profiler.wanted(func.__name__) else None
+        rerun = _rerun.get()
+        token = None
+        if rerun is None:
+            rerun = Rerun(func.__name__)
+            token = _rerun.set(rerun)
+        else:
+            rerun.page = func.__name__  # the innermost page names the rerun
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if sampler is not None:
+                profiler.stop(sampler, rerun.page)
+            if token is not None:
+                _rerun.reset(token)
+                get_query_stats().add_rerun(rerun, time.perf_counter() - rerun.started)
+    return page
@@ -0,0 +1,116 @@
+"""Bulk lab-test assignment.
+
+assign_lab_tests() takes any number of (RecordID, LabTestID) pairs, for
+example a standard panel across every record of a day's appointments, and
+writes them in one transaction. Each batch costs four round trips: one
+lookup for unknown records, one for pairs that are already assigned, a
+single multi-row INSERT (pymysql folds executemany into one statement) and
+one upsert of the dashboard's per-test counts.
+Rejected pairs are reported back individually instead of failing the lot.
+"""
+from collections import namedtuple
+
+import pymysql
+
+from database import db_connection
+from summaries import count_lab_tests
+from worklist import refresh_records
+
+
+BULK_ASSIGN_BATCH = 500  # pairs per multi-row INSERT
+
+AssignmentResult = namedtuple("AssignmentResult", ["assigned", "conflicts", "error"])
+Conflict = namedtuple("Conflict", ["record_id", "lab_test_id", "reason"])
+
+
+def _placeholders(count, width=1):
+    group = "%s" if width == 1 else "(" + ", ".join(["%s"] * width) + ")"
+    return ", ".join([group] * count)
+
+
+def _existing_records(cursor, record_ids):
+    cursor.execute(
+        f"SELECT RecordID FROM MedicalRecord WHERE RecordID IN ({_placeholders(len(record_ids))})",
+        record_ids,
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _assigned_pairs(cursor, pairs):
+    cursor.execute(
+        f"SELECT RecordID, LabTestID FROM TestResults "
+        f"WHERE (RecordID, LabTestID) IN ({_placeholders(len(pairs), 2)})",
+        [value for pair in pairs for value in pair],
+    )
+    return set(cursor.fetchall())
+
+
+def _assign_batch(cursor, batch, lab_test_ids):
+    conflicts = []
+    records = _existing_records(cursor, sorted({record_id for record_id, _ in batch}))
+    candidates = []
+    for record_id, lab_test_id in batch:
+        if record_id not in records:
+            conflicts.append(Conflict(record_id, lab_test_id, "unknown medical record"))
+        elif lab_test_id not in lab_test_ids:
+            conflicts.append(Conflict(record_id, lab_test_id, "unknown lab test"))
+        else:
+            candidates.append((record_id, lab_test_id))
+
+    if candidates:
+        assigned = _assigned_pairs(cursor, candidates)
+        conflicts += [Conflict(r, t, "already assigned") for r, t in candidates if (r, t) in assigned]
+        rows = [(t, r) for r, t in candidates if (r, t) not in assigned]
+        if rows:
+            cursor.executemany("INSERT INTO TestResults (LabTestID, RecordID) VALUES (%s, %s)", rows)
+            count_lab_tests(cursor, [lab_test_id for lab_test_id, _ in rows])
+            refresh_records(cursor, [record_id for _, record_id in rows])
+        return len(rows), conflicts
+    return 0, conflicts
+
+
+def assign_lab_tests(pairs, batch_size=BULK_ASSIGN_BATCH):
+    """Assign many (record_id, lab_test_id) pairs in one transaction.
+
+    Returns an AssignmentResult; pairs that could not be assigned are listed
+    in ``conflicts`` with a reason and everything else is committed. On a
+    database error nothing is written and ``error`` holds the message.
+    """
+    unique_pairs = []
+    conflicts = []
+    seen = set()
+    for record_id, lab_test_id in pairs:
+        pair = (int(record_id), int(lab_test_id))
+        if pair in seen:
+            conflicts.append(Conflict(*pair, "duplicate in request"))
+            continue
+        seen.add(pair)
+        unique_pairs.append(pair)
+    if not unique_pairs:
+        return AssignmentResult(0, conflicts, None)
+
+    with db_connection() as conn:
+        if conn is None:
+            return AssignmentResult(0, conflicts, "Could not connect to the database.")
+        cursor = conn.cursor()
+        try:
+            lab_test_ids = sorted({lab_test_id for _, lab_test_id in unique_pairs})
+            cursor.execute(
+                f"SELECT LabTestID FROM LabTests WHERE LabTestID IN ({_placeholders(len(lab_test_ids))})",
+                lab_test_ids,
+            )
+            known_tests = {row[0] for row in cursor.fetchall()}
+
+            assigned = 0
+            for start in range(0, len(unique_pairs), batch_size):
+                count, batch_conflicts = _assign_batch(cursor, unique_pairs[start:start + batch_size], known_tests)
+                assigned += count
+                conflicts += batch_conflicts
+            conn.commit()
+            return AssignmentResult(assigned, conflicts, None)
+        except pymysql.MySQLError as err:
+            # A concurrent assignment of the same pair trips the unique key
+            conn.rollback()
+            print(f"Error assigning lab tests: {err}")
+            return AssignmentResult(0, conflicts, f"Error assigning lab tests: {err}")
+
@@ -0,0 +1,190 @@
+"""Append-only wallet ledgers with periodic balance snapshots.
+
+Every credit and debit is a row in WalletTransactions (patient wallets) or
+AdminWalletCredits (admin wallets); nothing updates a balance in place.
+Wallets.Balance / AdminWallets.Balance hold a snapshot as of the checkpoint
+column (SnapshotTxnID / FoldedCreditID), so
+
+    balance = snapshot + SUM(ledger rows after the checkpoint)
+
+which stays a short range read on (WalletID, ID) as long as checkpoints run
+regularly. Credits are plain inserts and never touch the wallet row; only
+debits lock it, so top-ups and revenue don't contend with each other.
+
+    python ledger.py checkpoint   roll settled ledger rows into the snapshots
+    python ledger.py reconcile    verify every snapshot against the ledger; exit 1 on drift
+"""
+import sys
+from collections import namedtuple
+
+import pymysql
+
+from database import db_connection
+
+
+# Only checkpoint rows older than this, so a row whose transaction is still in
+# flight (and holds a lower ID) is never skipped past
+SETTLE_SECONDS = 60
+CHECKPOINT_BATCH = 500
+
+# snapshot table, its checkpoint column, ledger table, ledger key, ledger timestamp
+Ledger = namedtuple("Ledger", ["wallets", "checkpoint", "entries", "entry_id", "created_at"])
+PATIENT_LEDGER = Ledger("Wallets", "SnapshotTxnID", "WalletTransactions", "TransactionID", "TransactionDate")
+ADMIN_LEDGER = Ledger("AdminWallets", "FoldedCreditID", "AdminWalletCredits", "CreditID", "CreatedAt")
+
+Drift = namedtuple("Drift", ["ledger", "wallet_id", "snapshot", "expected"])
+
+
+def append_wallet_entry(cursor, wallet_id, amount, description):
+    """Record a patient wallet credit (positive) or debit (negative); returns the TransactionID."""
+    cursor.execute(
+        "INSERT INTO WalletTransactions (WalletID, Amount, Description) VALUES (%s, %s, %s)",
+        (wallet_id, amount, description),
+    )
+    return cursor.lastrowid
+
+
+def append_admin_entry(cursor, wallet_id, amount, description, billing_id=None):
+    """Record an admin wallet credit; returns the CreditID."""
+    cursor.execute(
+        "INSERT INTO AdminWalletCredits (WalletID, Amount, BillingID, Description) VALUES (%s, %s, %s, %s)",
+        (wallet_id, amount, billing_id, description),
+    )
+    return cursor.lastrowid
+
+
+def balance_query(ledger, where):
+    return f"""
+        SELECT w.WalletID, w.Balance + COALESCE(SUM(e.Amount), 0)
+        FROM {ledger.wallets} w
+        LEFT JOIN {ledger.entries} e ON e.WalletID = w.WalletID AND e.{ledger.entry_id} > w.{ledger.checkpoint}
+        WHERE {where}
+        GROUP BY w.WalletID, w.Balance
+    """
+
+
+def wallet_balance(cursor, wallet_id, ledger=PATIENT_LEDGER):
+    """Current balance of a wallet through ``cursor``; None if it doesn't exist."""
+    cursor.execute(balance_query(ledger, "w.WalletID = %s"), (wallet_id,))
+    row = cursor.fetchone()
+    return row[1] if row else None
+
+
+def fetch_wallet_balance(patient_id):
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute(balance_query(PATIENT_LEDGER, "w.PatientID = %s"), (patient_id,))
+            row = cursor.fetchone()
+        except pymysql.MySQLError as err:
+            print(f"Error fetching wallet balance: {err}")
+            return None
+    return row[1] if row else None
+
+
+def fetch_admin_wallet_balance(wallet_id):
+    """Snapshot plus credits appended since the last checkpoint."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            return wallet_balance(conn.cursor(), wallet_id, ADMIN_LEDGER)
+        except pymysql.MySQLError as err:
+            print(f"Error fetching admin wallet balance: {err}")
+            return None
+
+
+def _checkpoint_wallet(cursor, ledger, wallet_id):
+    cursor.execute(
+        f"SELECT {ledger.checkpoint} FROM {ledger.wallets} WHERE WalletID = %s FOR UPDATE",
+        (wallet_id,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    cursor.execute(f"""
+        SELECT COALESCE(MAX({ledger.entry_id}), 0), COALESCE(SUM(Amount), 0)
+        FROM {ledger.entries}
+        WHERE WalletID = %s AND {ledger.entry_id} > %s AND {ledger.created_at} < NOW() - INTERVAL %s SECOND
+    """, (wallet_id, row[0], SETTLE_SECONDS))
+    last_id, amount = cursor.fetchone()
+    if not last_id:
+        return 0
+    cursor.execute(
+        f"UPDATE {ledger.wallets} SET Balance = Balance + %s, {ledger.checkpoint} = %s, SnapshotAt = NOW() "
+        f"WHERE WalletID = %s",
+        (amount, last_id, wallet_id),
+    )
+    return 1
+
+
+def checkpoint(ledger, batch_size=CHECKPOINT_BATCH):
+    """Advance the snapshot of every wallet with settled ledger rows past its
+    checkpoint. Each wallet is its own short transaction, so a run never holds
+    more than one wallet lock at a time. Returns the number of wallets moved."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT DISTINCT w.WalletID
+            FROM {ledger.wallets} w
+            JOIN {ledger.entries} e ON e.WalletID = w.WalletID AND e.{ledger.entry_id} > w.{ledger.checkpoint}
+            WHERE e.{ledger.created_at} < NOW() - INTERVAL %s SECOND
+            LIMIT %s
+        """, (SETTLE_SECONDS, batch_size))
+        wallet_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+
+        moved = 0
+        for wallet_id in wallet_ids:
+            try:
+                conn.begin()
+                moved += _checkpoint_wallet(cursor, ledger, wallet_id)
+                conn.commit()
+            except pymysql.MySQLError as err:
+                conn.rollback()
+                print(f"Error checkpointing {ledger.wallets} {wallet_id}: {err}")
+        return moved
+
+
+def reconcile(ledger):
+    """Wallets whose snapshot differs from OpeningBalance + SUM(ledger up to the checkpoint)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT w.WalletID, w.Balance, w.OpeningBalance + COALESCE(SUM(e.Amount), 0) AS expected
+            FROM {ledger.wallets} w
+            LEFT JOIN {ledger.entries} e ON e.WalletID = w.WalletID AND e.{ledger.entry_id} <= w.{ledger.checkpoint}
+            GROUP BY w.WalletID, w.Balance, w.OpeningBalance
+            HAVING w.Balance <> expected
+        """)
+        return [Drift(ledger.wallets, *row) for row in cursor.fetchall()]
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command == "checkpoint":
+        for ledger in (PATIENT_LEDGER, ADMIN_LEDGER):
+            print(f"{ledger.wallets}: checkpointed {checkpoint(ledger)} wallets")
+    elif command == "reconcile":
+        drifted = []
+        for ledger in (PATIENT_LEDGER, ADMIN_LEDGER):
+            drifted += reconcile(ledger) or []
+        for drift in drifted:
+            print(f"DRIFT  {drift.ledger} {drift.wallet_id}: snapshot {drift.snapshot}, ledger {drift.expected}")
+        if drifted:
+            return 1
+        print("All wallet snapshots match their ledgers.")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
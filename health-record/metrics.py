@@ -0,0 +1,196 @@
+"""Prometheus metrics for the app, served from a side thread.
+
+The Streamlit process starts a small HTTP server on a daemon thread that
+answers ``GET /metrics`` in the Prometheus text format:
+
+    curl http://127.0.0.1:9464/metrics
+
+Nothing is collected for the exporter itself. Each scrape reads the
+counters the app already keeps (connection pool status, query cache and
+slot index stats, session store, instrumentation.QueryStats, bcrypt and
+wallet payment counters), so a rerun pays nothing beyond the per-query
+bookkeeping instrumentation.py already does. Counters restart from zero
+when the server restarts or an admin resets the Diagnostics page.
+
+    EHR_METRICS_PORT: port to listen on (default 9464; empty disables the exporter)
+    EHR_METRICS_HOST: interface to bind (default 127.0.0.1)
+"""
+import functools
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from availability import get_slot_index
+from database import get_pool
+from instrumentation import LATENCY_BUCKETS, fingerprint, get_query_stats
+from passwords import bcrypt_stats
+from payments import payment_stats
+from query_cache import get_query_cache
+import repositories as repo
+from sessions import get_session_store
+
+
+METRICS_HOST = os.environ.get("EHR_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("EHR_METRICS_PORT", "9464")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _sample(lines, name, value, labels=None):
+    lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(lines, name, labels, buckets, total, count):
+    cumulative = 0
+    for bound, observed in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+        cumulative += observed
+        _sample(lines, name + "_bucket", cumulative, dict(labels, le=bound))
+    _sample(lines, name + "_sum", total, labels)
+    _sample(lines, name + "_count", count, labels)
+
+
+@functools.lru_cache(maxsize=1)
+def _statement_names():
+    # Fixed repository statements are labelled by name; anything else by its fingerprint
+    return {fingerprint(sql): name for name, sql in repo.STATEMENTS.items() if "{" not in sql}
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+
+    _header(lines, "ehr_active_sessions", "gauge", "Signed-in sessions that have not expired.")
+    _sample(lines, "ehr_active_sessions", get_session_store().active_count())
+
+    queries, pages = get_query_stats().histograms()
+    _header(lines, "ehr_rerun_duration_seconds", "histogram", "Streamlit rerun wall time by page function.")
+    for page, (buckets, total, reruns, _, _) in sorted(pages.items()):
+        _histogram(lines, "ehr_rerun_duration_seconds", {"page": page}, buckets, total, reruns)
+    _header(lines, "ehr_rerun_sql_seconds_total", "counter", "Time reruns spent executing SQL, by page function.")
+    for page, (_, _, _, sql, _) in sorted(pages.items()):
+        _sample(lines, "ehr_rerun_sql_seconds_total", sql, {"page": page})
+    _header(lines, "ehr_rerun_connection_wait_seconds_total", "counter",
+            "Time reruns spent waiting for a database connection, by page function.")
+    for page, (_, _, _, _, acquire) in sorted(pages.items()):
+        _sample(lines, "ehr_rerun_connection_wait_seconds_total", acquire, {"page": page})
+
+    names = _statement_names()
+    _header(lines, "ehr_query_duration_seconds", "histogram",
+            "cursor.execute time by repository statement (or SQL fingerprint).")
+    for key, (buckets, total, calls) in sorted(queries.items()):
+        _histogram(lines, "ehr_query_duration_seconds", {"statement": names.get(key, key)}, buckets, total, calls)
+
+    pool = get_pool()
+    status = pool.status()
+    for stat, help_text in [
+        ("opened", "Database connections opened by the pool."),
+        ("closed", "Database connections closed by the pool."),
+        ("checkouts", "Connections handed out by the pool."),
+        ("waits", "Checkouts that had to wait for a free connection."),
+        ("failed_health_checks", "Idle connections that failed their ping on checkout."),
+    ]:
+        _header(lines, f"ehr_db_pool_{stat}_total", "counter", help_text)
+        _sample(lines, f"ehr_db_pool_{stat}_total", status[stat])
+    _header(lines, "ehr_db_pool_connections", "gauge", "Open pooled connections by state.")
+    _sample(lines, "ehr_db_pool_connections", status["in_use"], {"state": "in_use"})
+    _sample(lines, "ehr_db_pool_connections", status["idle"], {"state": "idle"})
+    _header(lines, "ehr_db_pool_max_connections", "gauge", "Upper bound on pooled connections.")
+    _sample(lines, "ehr_db_pool_max_connections", pool.max_size)
+
+    caches = {"query": get_query_cache().stats(), "slots": get_slot_index().stats()}
+    for stat, kind, help_text in [
+        ("hits", "counter", "Cache lookups answered from memory."),
+        ("misses", "counter", "Cache lookups that went to the database."),
+        ("hit_ratio", "gauge", "Hits over lookups since the server started."),
+    ]:
+        name = f"ehr_cache_{stat}_total" if kind == "counter" else f"ehr_cache_{stat}"
+        _header(lines, name, kind, help_text)
+        for cache, stats in caches.items():
+            _sample(lines, name, stats[stat], {"cache": cache})
+    _header(lines, "ehr_query_cache_entries", "gauge", "Result sets held by the query cache.")
+    _sample(lines, "ehr_query_cache_entries", caches["query"]["entries"])
+    _header(lines, "ehr_query_cache_evictions_total", "counter", "Query cache entries evicted to stay under the cap.")
+    _sample(lines, "ehr_query_cache_evictions_total", caches["query"]["evictions"])
+    _header(lines, "ehr_query_cache_invalidations_total", "counter", "Query cache entries dropped by writes.")
+    _sample(lines, "ehr_query_cache_invalidations_total", caches["query"]["invalidations"])
+
+    bcrypt_now = dict(bcrypt_stats)
+    _header(lines, "ehr_bcrypt_seconds", "summary", "Time spent in bcrypt by operation.")
+    for operation in ("hash", "check"):
+        _sample(lines, "ehr_bcrypt_seconds_sum", bcrypt_now[f"{operation}_seconds"], {"operation": operation})
+        _sample(lines, "ehr_bcrypt_seconds_count", bcrypt_now[f"{operation}_calls"], {"operation": operation})
+
+    payments_now = dict(payment_stats)
+    _header(lines, "ehr_wallet_payments_total", "counter", "Wallet bill payments by outcome.")
+    for outcome in ("succeeded", "rejected", "failed", "replayed"):
+        _sample(lines, "ehr_wallet_payments_total", payments_now[outcome], {"outcome": outcome})
+    _header(lines, "ehr_wallet_payment_retries_total", "counter",
+            "Payment transactions retried after a deadlock or lock wait timeout.")
+    _sample(lines, "ehr_wallet_payment_retries_total", payments_now["retries"])
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = render().encode("utf-8")
+        except Exception as e:
+            print(f"Error rendering metrics: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the app's log
+
+
+_server = None
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics from a daemon thread, once per process.
+
+    Safe to call on every rerun: after the first call it only checks a flag.
+    Returns the server, or None when disabled or the port is taken.
+    """
+    global _server, _started
+    if _started:
+        return _server
+    with _start_lock:
+        if _started:
+            return _server
+        _started = True
+        if not port:
+            return None
+        try:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics exporter on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,196 @@
+"""Schema migrations and query plan checks for the EHR database.
+
+Usage:
+    python migrate.py            apply pending migrations in migrations/
+    python migrate.py status     list applied and pending migrations
+    python migrate.py explain    EXPLAIN every hot query; exit 1 on a full table scan
+
+Run the plan check against a database seeded with realistic volumes; on a
+near-empty schema MySQL prefers table scans regardless of indexes.
+"""
+import os
+import re
+import sys
+from datetime import date
+
+import pymysql
+import pymysql.cursors
+
+from database import DB_CONFIG
+from ledger import ADMIN_LEDGER, PATIENT_LEDGER, balance_query
+from pagination import PAGE_SIZES, keyset_query
+from repositories import STATEMENTS
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+# Queries run on every page load, with representative parameters. Each must
+# be answered through an index: EXPLAIN may not report a full scan (type ALL).
+# The SQL comes from repositories.STATEMENTS, so the check follows the app.
+HOT_QUERIES = [
+    ("appointments.for_patient", STATEMENTS["appointments.for_patient"], (1,)),
+    ("appointments.for_doctor", STATEMENTS["appointments.for_doctor"], (1,)),
+    ("medical_records.for_doctor", STATEMENTS["medical_records.for_doctor"], (1,)),
+    ("medical_records.for_patient", STATEMENTS["medical_records.for_patient"], (1,)),
+    ("medical_records.for_appointment", STATEMENTS["medical_records.for_appointment"], (1,)),
+    ("appointments.admin_page (next page)", *keyset_query(
+        STATEMENTS["appointments.admin_page"],
+        ["a.AppointmentDate", "a.AppointmentTime", "a.AppointmentID"],
+        PAGE_SIZES[0], after=(date.today(), "12:00:00", 1000),
+    )),
+    ("appointments.admin_page (date filter)", *keyset_query(
+        STATEMENTS["appointments.admin_page"],
+        ["a.AppointmentDate", "a.AppointmentTime", "a.AppointmentID"],
+        PAGE_SIZES[0], where=["a.AppointmentDate >= %s", "a.AppointmentDate < %s"],
+        params=[date(date.today().year, 1, 1), date(date.today().year, 1, 8)],
+    )),
+    ("medical_records.admin_page (next page)", *keyset_query(
+        STATEMENTS["medical_records.admin_page"],
+        ["Appointment.AppointmentDate", "Appointment.AppointmentTime", "MedicalRecord.RecordID"],
+        PAGE_SIZES[0], after=(date.today(), "12:00:00", 1000),
+    )),
+    ("billing.admin_page (next page)", *keyset_query(
+        STATEMENTS["billing.admin_page"], ["b.BillingID"], PAGE_SIZES[0], after=(1000,),
+    )),
+    ("billing.unpaid_for_patient", STATEMENTS["billing.unpaid_for_patient"], (1,)),
+    ("test_results.pending_for_doctor", STATEMENTS["test_results.pending_for_doctor"], (1,)),
+    ("worklist.for_doctor", STATEMENTS["worklist.for_doctor"], (1, date.today(), date.today())),
+    ("medical_records.with_tests_for_doctor", STATEMENTS["medical_records.with_tests_for_doctor"], (1,)),
+    ("test_results.for_patient", STATEMENTS["test_results.for_patient"], (1,)),
+    ("ledger.fetch_wallet_balance", balance_query(PATIENT_LEDGER, "w.PatientID = %s"), (1,)),
+    ("ledger.fetch_admin_wallet_balance", balance_query(ADMIN_LEDGER, "w.WalletID = %s"), (1,)),
+    ("patients.credentials", STATEMENTS["patients.credentials"], ("patient@example.com",)),
+    ("patients.search (name)", STATEMENTS["patients.search"] + "(FirstName LIKE %s OR LastName LIKE %s) "
+     "ORDER BY LastName, FirstName, PatientID LIMIT %s", ("ann%", "ann%", 20)),
+    ("patients.search (email)", STATEMENTS["patients.search"] + "Email LIKE %s "
+     "ORDER BY LastName, FirstName, PatientID LIMIT %s", ("ann%", 20)),
+    ("medical_records.options_for_patient", STATEMENTS["medical_records.options_for_patient"], (1,)),
+    ("availability.SlotIndex", "SELECT AppointmentDate, AppointmentTime FROM Appointment "
+     "WHERE DoctorID = %s AND AppointmentDate >= %s", (1, date.today())),
+    ("search.medical_records (doctor, this quarter)", *keyset_query(
+        f"SELECT * FROM ({STATEMENTS['search.medical_records'].rstrip()}"
+        f"\n  AND a.DoctorID = %s AND a.AppointmentDate >= %s) hits",
+        ["hits.Score", "hits.RecordID"], PAGE_SIZES[0],
+        params=["+diabetes*", "+diabetes*", 1, date(date.today().year, 1, 1)],
+    )),
+    ("timeline.doctor_sees_patient", STATEMENTS["timeline.doctor_sees_patient"], (1, 1)),
+    ("timeline.events", *keyset_query(
+        STATEMENTS["timeline.events"].rstrip(),
+        ["events.EventDate", "events.EventTime", "events.Kind", "events.RefID"], PAGE_SIZES[0],
+        params=[1, 1, 1, 1],
+    )),
+    ("dashboard.appointments_by_doctor", STATEMENTS["dashboard.appointments_by_doctor"],
+     (date.today(), date.fromordinal(date.today().toordinal() + 7))),
+    ("dashboard.revenue", STATEMENTS["dashboard.revenue"],
+     (date.fromordinal(date.today().toordinal() - 30), date.today())),
+]
+
+
+# Small reference tables that are cheaper to scan than to index (EXPLAIN reports
+# them by alias when the query uses one)
+SCAN_ALLOWED = {"LabTests", "lt"}
+
+
+def connect():
+    return pymysql.connect(**DB_CONFIG)
+
+
+def available_migrations():
+    migrations = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"^(\d+)_.+\.sql$", name)
+        if match:
+            migrations.append((match.group(1), name))
+    return migrations
+
+
+def split_statements(sql):
+    # Strip comment lines, then split on semicolons that end a line
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*(?:\n|$)", "\n".join(lines))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(32) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    ensure_migrations_table(cursor)
+    applied = applied_versions(cursor)
+    pending = [(version, name) for version, name in available_migrations() if version not in applied]
+    if not pending:
+        print("Database is up to date.")
+        return
+
+    for version, name in pending:
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            statements = split_statements(f.read())
+        print(f"Applying {name} ({len(statements)} statements)")
+        # MySQL commits DDL implicitly, so a failed migration must be fixed
+        # up by hand before it is re-run
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+
+
+def status(conn):
+    cursor = conn.cursor()
+    ensure_migrations_table(cursor)
+    applied = applied_versions(cursor)
+    for version, name in available_migrations():
+        print(f"{'applied' if version in applied else 'pending'}  {name}")
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Run EXPLAIN on each hot query and return the ones that scan a whole table."""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    failures = []
+    for name, query, params in queries:
+        cursor.execute("EXPLAIN " + query, params or None)
+        for step in cursor.fetchall():
+            table = str(step["table"])
+            if step["type"] == "ALL" and table not in SCAN_ALLOWED and not table.startswith("<"):
+                failures.append((name, table, step["rows"]))
+    return failures
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "migrate"
+    conn = connect()
+    try:
+        if command == "migrate":
+            migrate(conn)
+        elif command == "status":
+            status(conn)
+        elif command == "explain":
+            failures = check_query_plans(conn)
+            for name, table, rows in failures:
+                print(f"FULL SCAN  {name}: table {table} (~{rows} rows)")
+            if failures:
+                return 1
+            print(f"All {len(HOT_QUERIES)} hot queries use an index.")
+        else:
+            print(__doc__)
+            return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
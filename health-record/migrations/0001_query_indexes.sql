@@ -0,0 +1,32 @@
+-- Composite indexes matched to the predicates and sort orders used in
+-- Electronic_Health_Record.py. Each index names the queries it serves.
+
+-- fetch_patient_appointments: WHERE PatientID = ? ORDER BY AppointmentDate, AppointmentTime
+CREATE INDEX idx_appointment_patient_date ON Appointment (PatientID, AppointmentDate, AppointmentTime);
+
+-- fetch_doctor_appointments, get_doctor_appointments, view_medical_records_for_doctor
+CREATE INDEX idx_appointment_doctor_date ON Appointment (DoctorID, AppointmentDate, AppointmentTime);
+
+-- fetch_all_appointments, view_medical_records_for_admin: keyset paging and date range filters
+CREATE INDEX idx_appointment_date_time ON Appointment (AppointmentDate, AppointmentTime, AppointmentID);
+
+-- view_medical_records, record joins from Appointment
+CREATE INDEX idx_medicalrecord_appointment_test ON MedicalRecord (AppointmentID, TestTaken);
+
+-- get_appointments_with_tests: WHERE TestTaken = TRUE
+CREATE INDEX idx_medicalrecord_test_appointment ON MedicalRecord (TestTaken, AppointmentID);
+
+-- fetch_unpaid_bills: WHERE PatientID = ? AND PaymentStatus = 'Pending'
+CREATE INDEX idx_billing_patient_status ON Billing (PatientID, PaymentStatus);
+
+-- view_patient_tests join on RecordID
+CREATE INDEX idx_testresults_record_result ON TestResults (RecordID, Result(32));
+
+-- doctor_add_results_ui: WHERE Result IS NULL
+CREATE INDEX idx_testresults_result ON TestResults (Result(32));
+
+-- Admin patient / doctor name filters (prefix LIKE on either name column)
+CREATE INDEX idx_patient_last_first ON Patient (LastName, FirstName);
+CREATE INDEX idx_patient_first ON Patient (FirstName);
+CREATE INDEX idx_doctor_last_first ON Doctor (LastName, FirstName);
+CREATE INDEX idx_doctor_first ON Doctor (FirstName);
@@ -0,0 +1,28 @@
+-- Payment engine (payments.py): idempotency keys, ledger lookups and an
+-- append-only accumulator for admin revenue.
+
+-- One row per completed payment request; a replayed key returns the original result
+CREATE TABLE PaymentRequests (
+    IdempotencyKey VARCHAR(64) PRIMARY KEY,
+    BillingID INT NOT NULL,
+    TransactionID INT NOT NULL,
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (BillingID) REFERENCES Billing(BillingID)
+);
+
+-- Payments append admin credits here instead of updating the AdminWallets
+-- row, which every payment used to serialize on
+CREATE TABLE AdminWalletCredits (
+    CreditID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    WalletID INT NOT NULL,
+    Amount DECIMAL(10,2) NOT NULL,
+    BillingID INT NULL,
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_admin_credits_wallet (WalletID, CreditID),
+    FOREIGN KEY (WalletID) REFERENCES AdminWallets(WalletID) ON DELETE CASCADE
+);
+
+-- Credits up to this ID are already included in AdminWallets.Balance
+ALTER TABLE AdminWallets ADD COLUMN FoldedCreditID BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE WalletTransactions ADD INDEX idx_wallet_transactions_wallet (WalletID, TransactionID);
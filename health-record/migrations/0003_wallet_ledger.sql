@@ -0,0 +1,29 @@
+-- Append-only wallet ledgers (ledger.py). WalletTransactions and
+-- AdminWalletCredits hold every credit and debit; Balance becomes a snapshot
+-- as of the checkpoint column, and
+--   Balance = OpeningBalance + SUM(ledger rows up to the checkpoint)
+-- is what reconciliation verifies.
+
+ALTER TABLE Wallets
+    ADD COLUMN SnapshotTxnID INT NOT NULL DEFAULT 0,
+    ADD COLUMN OpeningBalance DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    ADD COLUMN SnapshotAt DATETIME NULL;
+
+-- Balances so far were updated in place and already include every ledger row
+UPDATE Wallets w
+SET w.SnapshotTxnID = COALESCE((SELECT MAX(t.TransactionID) FROM WalletTransactions t WHERE t.WalletID = w.WalletID), 0),
+    w.OpeningBalance = w.Balance - COALESCE((SELECT SUM(t.Amount) FROM WalletTransactions t WHERE t.WalletID = w.WalletID), 0),
+    w.SnapshotAt = NOW();
+
+ALTER TABLE AdminWallets
+    ADD COLUMN OpeningBalance DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    ADD COLUMN SnapshotAt DATETIME NULL;
+
+UPDATE AdminWallets aw
+SET aw.OpeningBalance = aw.Balance - COALESCE((
+        SELECT SUM(c.Amount) FROM AdminWalletCredits c
+        WHERE c.WalletID = aw.WalletID AND c.CreditID <= aw.FoldedCreditID
+    ), 0),
+    aw.SnapshotAt = NOW();
+
+ALTER TABLE AdminWalletCredits ADD COLUMN Description VARCHAR(255) NULL;
@@ -0,0 +1,11 @@
+-- A lab test can be assigned to a medical record once (lab_assignments.py).
+-- Drop duplicate assignments that never received a result first; if
+-- duplicates with results remain, resolve them by hand before re-running.
+DELETE newer FROM TestResults newer
+JOIN TestResults older
+  ON older.RecordID = newer.RecordID
+ AND older.LabTestID = newer.LabTestID
+ AND older.TestID < newer.TestID
+WHERE newer.Result IS NULL;
+
+ALTER TABLE TestResults ADD UNIQUE INDEX uq_testresults_record_test (RecordID, LabTestID);
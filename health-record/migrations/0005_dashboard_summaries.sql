@@ -0,0 +1,57 @@
+-- Summary tables behind the admin dashboard (summaries.py). Appointment,
+-- billing and lab test counts are kept current in the same transaction as
+-- the write; admin revenue is folded in from AdminWalletCredits by
+-- `python summaries.py refresh`. Each table is backfilled from history here.
+
+CREATE TABLE DailyDoctorAppointments (
+    DoctorID INT NOT NULL,
+    AppointmentDate DATE NOT NULL,
+    Appointments INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (AppointmentDate, DoctorID)
+);
+
+INSERT INTO DailyDoctorAppointments (DoctorID, AppointmentDate, Appointments)
+SELECT DoctorID, AppointmentDate, COUNT(*) FROM Appointment GROUP BY DoctorID, AppointmentDate;
+
+-- Spread over Slot (BillingID % 16, summaries.BILLING_SLOTS) so concurrent
+-- bills and payments don't all update the same row
+CREATE TABLE BillingSummary (
+    PaymentStatus ENUM('Pending', 'Completed') NOT NULL,
+    Slot TINYINT NOT NULL,
+    Bills INT NOT NULL DEFAULT 0,
+    Amount DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (PaymentStatus, Slot)
+);
+
+INSERT INTO BillingSummary (PaymentStatus, Slot, Bills, Amount)
+SELECT PaymentStatus, BillingID % 16, COUNT(*), COALESCE(SUM(TotalAmount), 0)
+FROM Billing GROUP BY PaymentStatus, BillingID % 16;
+
+CREATE TABLE LabTestVolume (
+    LabTestID INT PRIMARY KEY,
+    Assigned INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO LabTestVolume (LabTestID, Assigned)
+SELECT LabTestID, COUNT(*) FROM TestResults WHERE LabTestID IS NOT NULL GROUP BY LabTestID;
+
+CREATE TABLE AdminRevenueDaily (
+    WalletID INT NOT NULL,
+    Day DATE NOT NULL,
+    Credits INT NOT NULL DEFAULT 0,
+    Amount DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (Day, WalletID)
+);
+
+-- Highest source row already folded into a summary, per summary
+CREATE TABLE SummaryWatermarks (
+    Name VARCHAR(64) PRIMARY KEY,
+    LastID BIGINT NOT NULL DEFAULT 0,
+    RefreshedAt DATETIME NULL
+);
+
+INSERT INTO AdminRevenueDaily (WalletID, Day, Credits, Amount)
+SELECT WalletID, DATE(CreatedAt), COUNT(*), SUM(Amount) FROM AdminWalletCredits GROUP BY WalletID, DATE(CreatedAt);
+
+INSERT INTO SummaryWatermarks (Name, LastID, RefreshedAt)
+SELECT 'AdminRevenueDaily', COALESCE(MAX(CreditID), 0), NOW() FROM AdminWalletCredits;
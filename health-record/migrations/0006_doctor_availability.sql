@@ -0,0 +1,20 @@
+-- Doctor working hours and conflict-free booking (availability.py).
+-- A doctor without rows here works availability.DEFAULT_HOURS.
+
+-- Weekday follows Python's date.weekday(): 0 = Monday ... 6 = Sunday.
+-- A day may have several shifts (e.g. a morning and an afternoon block).
+CREATE TABLE DoctorAvailability (
+    DoctorID INT NOT NULL,
+    Weekday TINYINT NOT NULL,
+    StartTime TIME NOT NULL,
+    EndTime TIME NOT NULL,
+    SlotMinutes SMALLINT NOT NULL DEFAULT 30,
+    PRIMARY KEY (DoctorID, Weekday, StartTime),
+    FOREIGN KEY (DoctorID) REFERENCES Doctor(DoctorID) ON DELETE CASCADE
+);
+
+-- One appointment per doctor and slot. This replaces the plain index on the
+-- same columns; resolve any existing double bookings by hand before running.
+ALTER TABLE Appointment
+    DROP INDEX idx_appointment_doctor_date,
+    ADD UNIQUE INDEX uq_appointment_doctor_slot (DoctorID, AppointmentDate, AppointmentTime);
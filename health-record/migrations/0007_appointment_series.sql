@@ -0,0 +1,23 @@
+-- Recurring and follow-up appointment series (scheduling.py). A series may
+-- be linked to the MedicalRecord it follows up on.
+
+CREATE TABLE AppointmentSeries (
+    SeriesID INT AUTO_INCREMENT PRIMARY KEY,
+    PatientID INT NOT NULL,
+    DoctorID INT NOT NULL,
+    RecordID INT NULL,
+    IntervalDays SMALLINT NOT NULL,
+    Occurrences SMALLINT NOT NULL,
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_series_record (RecordID),
+    FOREIGN KEY (PatientID) REFERENCES Patient(PatientID),
+    FOREIGN KEY (DoctorID) REFERENCES Doctor(DoctorID),
+    FOREIGN KEY (RecordID) REFERENCES MedicalRecord(RecordID)
+);
+
+-- Replaces the FollowUp flag that was left commented out in ehr.sql:
+-- an appointment belongs to at most one series
+ALTER TABLE Appointment
+    ADD COLUMN SeriesID INT NULL,
+    ADD INDEX idx_appointment_series (SeriesID, AppointmentDate),
+    ADD FOREIGN KEY (SeriesID) REFERENCES AppointmentSeries(SeriesID);
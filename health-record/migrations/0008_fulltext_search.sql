@@ -0,0 +1,9 @@
+-- Ranked full-text search over clinical text (search.py). InnoDB keeps
+-- FULLTEXT indexes current on every insert and update, so new and edited
+-- records are searchable as soon as they commit. The first FULLTEXT index
+-- on a table rebuilds it once to add the hidden FTS_DOC_ID column.
+-- Words shorter than innodb_ft_min_token_size (default 3) are not indexed.
+
+ALTER TABLE MedicalRecord ADD FULLTEXT INDEX ft_medicalrecord_text (Diagnosis, Prescription);
+
+ALTER TABLE TestResults ADD FULLTEXT INDEX ft_testresults_result (Result);
@@ -0,0 +1,33 @@
+-- Per-doctor worklist read model (worklist.py). One row per appointment
+-- with its patient and how far its paperwork has got; rows are refreshed
+-- in the same transaction as every write that changes them. Items that are
+-- done (record written, no test pending, bill raised) and in the past are
+-- removed by `python worklist.py prune`.
+
+CREATE TABLE DoctorWorklist (
+    AppointmentID INT PRIMARY KEY,
+    DoctorID INT NOT NULL,
+    AppointmentDate DATE NOT NULL,
+    AppointmentTime TIME NOT NULL,
+    PatientID INT NOT NULL,
+    PatientName VARCHAR(101) NOT NULL,
+    Records INT NOT NULL DEFAULT 0,
+    TestsPending INT NOT NULL DEFAULT 0,
+    Bills INT NOT NULL DEFAULT 0,
+    Done BOOLEAN AS (Records > 0 AND TestsPending = 0 AND Bills > 0) STORED,
+    INDEX idx_worklist_doctor_date (DoctorID, AppointmentDate, AppointmentTime)
+);
+
+INSERT INTO DoctorWorklist
+    (AppointmentID, DoctorID, AppointmentDate, AppointmentTime, PatientID, PatientName, Records, TestsPending, Bills)
+SELECT a.AppointmentID, a.DoctorID, a.AppointmentDate, a.AppointmentTime, a.PatientID,
+       CONCAT(p.FirstName, ' ', p.LastName),
+       COUNT(DISTINCT m.RecordID), COUNT(DISTINCT IF(tr.Result IS NULL, tr.TestID, NULL)), COUNT(DISTINCT b.BillingID)
+FROM Appointment a
+JOIN Patient p ON a.PatientID = p.PatientID
+LEFT JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+LEFT JOIN TestResults tr ON tr.RecordID = m.RecordID
+LEFT JOIN Billing b ON b.RecordID = m.RecordID
+GROUP BY a.AppointmentID, p.PatientID;
+
+DELETE FROM DoctorWorklist WHERE Done AND AppointmentDate < CURDATE();
@@ -0,0 +1,12 @@
+-- AdminRevenueDaily counts bill payments only (summaries.py). Credits
+-- without a BillingID are manual admin top-ups, which 0005 and earlier
+-- refreshes folded in as revenue. Rebuild the folded days from payment
+-- credits up to the current watermark.
+DELETE FROM AdminRevenueDaily;
+
+INSERT INTO AdminRevenueDaily (WalletID, Day, Credits, Amount)
+SELECT c.WalletID, DATE(c.CreatedAt), COUNT(*), SUM(c.Amount)
+FROM AdminWalletCredits c
+JOIN SummaryWatermarks w ON w.Name = 'AdminRevenueDaily' AND c.CreditID <= w.LastID
+WHERE c.BillingID IS NOT NULL
+GROUP BY c.WalletID, DATE(c.CreatedAt);
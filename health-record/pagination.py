@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+import streamlit as st
+
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# rows: the page in display order (newest first)
+# first_key / last_key: keyset values of the first and last row, used as cursors
+Page = namedtuple("Page", ["rows", "has_next", "has_previous", "first_key", "last_key"])
+EMPTY_PAGE = Page((), False, False, None, None)
+
+
+def _row_compare(columns, op):
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"({', '.join(columns)}) {op} ({placeholders})"
+
+
+def keyset_query(select, key_columns, page_size, after=None, before=None, where=(), params=()):
+    """Build the SQL and parameters for one page of ``select``; see fetch_keyset_page."""
+    conditions = list(where)
+    values = list(params)
+    if after is not None:
+        conditions.append(_row_compare(key_columns, "<"))
+        values.extend(after)
+        direction = "DESC"
+    elif before is not None:
+        conditions.append(_row_compare(key_columns, ">"))
+        values.extend(before)
+        direction = "ASC"
+    else:
+        direction = "DESC"
+
+    query = select
+    if conditions:
+        query += "\nWHERE " + "\n  AND ".join(conditions)
+    query += "\nORDER BY " + ", ".join(f"{column} {direction}" for column in key_columns)
+    query += "\nLIMIT %s"
+    values.append(page_size + 1)
+    return query, values
+
+
+def fetch_keyset_page(cursor, select, key_columns, key_of, page_size, after=None, before=None,
+                      where=(), params=(), row_type=None):
+    """Fetch one page of ``select`` ordered by ``key_columns`` descending.
+
+    ``after`` continues past the last row of the current page (older rows),
+    ``before`` goes back to the rows preceding the first one. Only
+    ``page_size + 1`` rows are read, whatever the size of the table. Rows are
+    built with ``row_type._make`` when given.
+    """
+    query, values = keyset_query(select, key_columns, page_size, after, before, where, params)
+    cursor.execute(query, values)
+    return keyset_page(cursor.fetchall(), key_of, page_size, after, before, row_type)
+
+
+def keyset_page(rows, key_of, page_size, after=None, before=None, row_type=None):
+    """Turn the ``page_size + 1`` rows read by a keyset_query into a Page."""
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if before is not None:
+        rows = rows[::-1]
+        has_next, has_previous = True, more
+    else:
+        has_next, has_previous = more, after is not None
+
+    if not rows:
+        # Stepped past either end; the buttons lead back to the first page
+        return Page((), before is not None, after is not None, None, None)
+    if row_type is not None:
+        rows = list(map(row_type._make, rows))
+    return Page(tuple(rows), has_next, has_previous, key_of(rows[0]), key_of(rows[-1]))
+
+
+def page_cursor(state_key):
+    """Return (page_size, after, before) for a paged view from session state."""
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{state_key}_page_size",
+                             on_change=reset_pager, args=(state_key,))
+    direction, key = st.session_state.get(f"{state_key}_cursor") or (None, None)
+    return page_size, key if direction == "after" else None, key if direction == "before" else None
+
+
+def reset_pager(state_key):
+    st.session_state[f"{state_key}_cursor"] = None
+
+
+def _move(state_key, direction, key):
+    st.session_state[f"{state_key}_cursor"] = (direction, key)
+
+
+def render_pager(state_key, page):
+    previous_col, next_col = st.columns(2)
+    previous_col.button("Previous", key=f"{state_key}_previous", disabled=not page.has_previous,
+                        on_click=_move, args=(state_key, "before", page.first_key))
+    next_col.button("Next", key=f"{state_key}_next", disabled=not page.has_next,
+                    on_click=_move, args=(state_key, "after", page.last_key))
@@ -0,0 +1,98 @@
+"""bcrypt hashing on a bounded worker pool.
+
+The pool only bounds how many hashes run at once (EHR_BCRYPT_WORKERS), so a
+sign-in burst can't occupy every core. It does not take the work off the
+request: hash_password() and verify_password() wait for their result, and
+the calling script thread is blocked for the whole bcrypt run. Only the
+rehash after login (rehash_in_background) runs without a waiting caller.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+# bcrypt work factor for new hashes; existing hashes below it are upgraded on login
+BCRYPT_ROUNDS = int(os.environ.get("EHR_BCRYPT_ROUNDS", "12"))
+# Upper bound on concurrent hashes so a sign-in wave can't starve every core
+BCRYPT_WORKERS = int(os.environ.get("EHR_BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+_COST_PATTERN = re.compile(rb"^\$2[abxy]?\$(\d{2})\$")
+
+# Time spent inside bcrypt, read by the metrics exporter
+bcrypt_stats = {"hash_calls": 0, "hash_seconds": 0.0, "check_calls": 0, "check_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _timed(kind, started):
+    elapsed = time.perf_counter() - started
+    with _stats_lock:
+        bcrypt_stats[kind + "_calls"] += 1
+        bcrypt_stats[kind + "_seconds"] += elapsed
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _hash(password, rounds):
+    started = time.perf_counter()
+    try:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+    finally:
+        _timed("hash", started)
+
+
+def _check(password, hashed):
+    started = time.perf_counter()
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    except ValueError as e:
+        print(f"Error verifying password: {e}")
+        return False
+    finally:
+        _timed("check", started)
+
+
+# Hash Password
+def hash_password(password, rounds=None):
+    """Hash on the worker pool; blocks the caller until the hash is done."""
+    return _executor.submit(_hash, password, rounds or BCRYPT_ROUNDS).result()
+
+
+# Verify Password
+def verify_password(password, hashed):
+    """Check on the worker pool; blocks the caller until the check is done."""
+    # Check if hashed password is valid
+    if not hashed:
+        print("No hashed password provided.")
+        return False
+
+    # Ensure the hash is in bytes format
+    return _executor.submit(_check, password, _to_bytes(hashed)).result()
+
+
+def hash_cost(hashed):
+    match = _COST_PATTERN.match(_to_bytes(hashed) or b"")
+    return int(match.group(1)) if match else None
+
+
+def needs_rehash(hashed, rounds=None):
+    cost = hash_cost(hashed)
+    return cost is not None and cost < (rounds or BCRYPT_ROUNDS)
+
+
+def rehash_in_background(password, on_hashed, rounds=None):
+    """Hash ``password`` at the configured cost on the worker pool and pass the
+    result to ``on_hashed`` there, so a login never waits for the upgrade."""
+    def upgrade():
+        try:
+            on_hashed(_hash(password, rounds or BCRYPT_ROUNDS))
+        except Exception as e:
+            print(f"Error upgrading password hash: {e}")
+    return _executor.submit(upgrade)
@@ -0,0 +1,133 @@
+"""Wallet payment engine.
+
+A payment locks the bill and then the patient's wallet (always in that
+order, so concurrent payments cannot deadlock each other), appends a debit
+to the wallet ledger only if the balance covers the bill, uses that
+ledger row's ID as the bill's TransactionID and appends the admin credit
+to AdminWalletCredits. Replaying an idempotency key returns the original
+result instead of charging twice. Balances themselves live in ledger.py.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pymysql
+
+from database import db_connection
+from ledger import append_admin_entry, append_wallet_entry, wallet_balance
+from summaries import count_payment
+
+
+ADMIN_WALLET_ID = int(os.environ.get("EHR_ADMIN_WALLET_ID", "1"))  # wallet credited with bill payments
+PAYMENT_MAX_ATTEMPTS = 3
+
+# MySQL errors after which the whole transaction can simply be retried
+RETRYABLE_ERRORS = {1205, 1213}  # lock wait timeout, deadlock
+
+PaymentResult = namedtuple("PaymentResult", ["status", "transaction_id", "message"])
+
+payment_stats = {"succeeded": 0, "rejected": 0, "failed": 0, "retries": 0, "replayed": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        payment_stats[outcome] += 1
+
+
+def _pay(cursor, patient_id, billing_id, idempotency_key):
+    # 1. Lock the bill; this also serializes duplicate requests for it
+    cursor.execute(
+        "SELECT PatientID, TotalAmount, PaymentStatus, TransactionID FROM Billing WHERE BillingID = %s FOR UPDATE",
+        (billing_id,),
+    )
+    bill = cursor.fetchone()
+    if bill is None or bill[0] != patient_id:
+        return PaymentResult("not_found", None, f"Bill {billing_id} was not found.")
+    _, amount, payment_status, paid_transaction_id = bill
+
+    if idempotency_key:
+        # Locking read sees requests committed while we waited for the bill
+        cursor.execute(
+            "SELECT TransactionID FROM PaymentRequests WHERE IdempotencyKey = %s LOCK IN SHARE MODE",
+            (idempotency_key,),
+        )
+        replay = cursor.fetchone()
+        if replay is not None:
+            return PaymentResult("replayed", replay[0], f"Bill {billing_id} was already paid.")
+
+    if payment_status != "Pending":
+        return PaymentResult("already_paid", paid_transaction_id, f"Bill {billing_id} has already been paid.")
+
+    # 2. Lock the wallet, always after the bill. Only debits take this lock,
+    # so the balance read below can't race another debit; a credit landing
+    # concurrently can only make it an underestimate.
+    cursor.execute("SELECT WalletID FROM Wallets WHERE PatientID = %s FOR UPDATE", (patient_id,))
+    wallet = cursor.fetchone()
+    if wallet is None:
+        return PaymentResult("no_wallet", None, "No wallet found for your account.")
+    wallet_id = wallet[0]
+
+    # 3. Conditional debit: never takes the balance below zero
+    balance = wallet_balance(cursor, wallet_id)
+    if balance is None or balance < amount:
+        return PaymentResult("insufficient_funds", None, f"Not enough balance to pay Bill {billing_id}.")
+
+    # 4. Ledger row; its ID is the bill's transaction ID
+    transaction_id = append_wallet_entry(cursor, wallet_id, -amount, f"Payment for bill {billing_id}")
+
+    cursor.execute(
+        "UPDATE Billing SET PaymentStatus = 'Completed', TransactionID = %s WHERE BillingID = %s",
+        (transaction_id, billing_id),
+    )
+    count_payment(cursor, billing_id, amount)
+
+    # 5. Admin revenue is appended, not added to a single hot row
+    append_admin_entry(cursor, ADMIN_WALLET_ID, amount, f"Payment for bill {billing_id}", billing_id)
+
+    if idempotency_key:
+        cursor.execute(
+            "INSERT INTO PaymentRequests (IdempotencyKey, BillingID, TransactionID) VALUES (%s, %s, %s)",
+            (idempotency_key, billing_id, transaction_id),
+        )
+    return PaymentResult("paid", transaction_id, f"Bill {billing_id} paid successfully!")
+
+
+def pay_bill_with_wallet(patient_id, billing_id, idempotency_key=None):
+    """Pay a pending bill from the patient's wallet; returns a PaymentResult."""
+    for attempt in range(PAYMENT_MAX_ATTEMPTS):
+        with db_connection() as conn:
+            if conn is None:
+                _count("failed")
+                return PaymentResult("error", None, "Could not connect to the database.")
+            cursor = conn.cursor()
+            try:
+                # Each statement sees the latest committed ledger rows, so the
+                # balance check counts debits committed while we waited on the wallet lock
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                conn.begin()
+                result = _pay(cursor, patient_id, billing_id, idempotency_key)
+                if result.status == "paid" and result.transaction_id is not None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except pymysql.MySQLError as err:
+                conn.rollback()
+                if err.args and err.args[0] in RETRYABLE_ERRORS and attempt + 1 < PAYMENT_MAX_ATTEMPTS:
+                    _count("retries")
+                    time.sleep(0.05 * (attempt + 1))
+                    continue
+                print(f"Error: {err}")
+                _count("failed")
+                return PaymentResult("error", None, "Payment failed. Please try again.")
+            finally:
+                cursor.close()
+
+        if result.status == "replayed":
+            # Counted once, as a replay; callers see the original payment
+            _count("replayed")
+            return result._replace(status="paid")
+        _count("succeeded" if result.status == "paid" else "rejected")
+        return result
+
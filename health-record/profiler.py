@@ -0,0 +1,209 @@
+"""Opt-in sampling profiler for Streamlit pages.
+
+While a profiled page function runs, a sampler thread reads the page
+thread's stack every PROFILE_INTERVAL_MS and counts each distinct stack.
+When the page returns, the counts are written to PROFILE_DIR as a
+collapsed-stack file (one ``frame;frame;frame count`` line per stack,
+root first), the input flamegraph.pl, speedscope and inferno read:
+
+    flamegraph.pl profiles/doctor_add_billing_ui-20250101-120000-123456-840ms.collapsed > billing.svg
+    python profiler.py top profiles/doctor_add_billing_ui-*.collapsed
+
+Stacks start at the page function, so SQL (pymysql frames), Python work in
+the page and Streamlit rendering (st.* calls) show up as separate towers.
+
+Profiling is switched on per page for every session (EHR_PROFILE_PAGES or
+the admin Diagnostics page) or for all reruns of one browser session
+(Diagnostics, "Profile my reruns"). Both can be changed on a running
+server. A profiling session that stops rerunning (tab closed, session
+expired) is forgotten after SESSION_IDLE_SECONDS. When nothing is enabled,
+track_page pays one set lookup per page.
+
+    EHR_PROFILE_PAGES: comma-separated page functions to profile from startup
+    EHR_PROFILE_DIR: where profiles are written (default profiles/)
+    EHR_PROFILE_INTERVAL_MS: sampling interval (default 5)
+"""
+import contextvars
+import glob
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import streamlit as st
+
+
+PROFILE_DIR = os.environ.get("EHR_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("EHR_PROFILE_INTERVAL_MS", "5"))
+SESSION_KEY = "profile_reruns"
+SESSION_IDLE_SECONDS = 30 * 60  # a profiling session that stops rerunning this long is forgotten
+
+_pages = {page.strip() for page in os.environ.get("EHR_PROFILE_PAGES", "").split(",") if page.strip()}
+_sessions = {}  # token of a session profiling its reruns -> its last rerun; while empty, no session state is read
+_expired_at = 0.0
+_lock = threading.Lock()
+_sampler = contextvars.ContextVar("ehr_sampler", default=None)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Sampler:
+    """Samples one thread's stack from a daemon thread until stopped."""
+
+    def __init__(self, root, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.root = root  # code object of the page function; frames above it are dropped
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame))
+            if frame.f_code is self.root:
+                break
+            frame = frame.f_back
+        else:
+            return  # the page has already returned
+        self.stacks[";".join(reversed(names))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def stop(self, page):
+        """Stop sampling and write the profile; returns its path, or None."""
+        self._stop.set()
+        self._thread.join()
+        if not self.stacks:
+            return None
+        elapsed = time.perf_counter() - self.started
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{page}-{datetime.now():%Y%m%d-%H%M%S-%f}-{elapsed * 1000:.0f}ms.collapsed")
+        try:
+            with open(path, "w") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Error writing profile {path}: {e}")
+            return None
+        return path
+
+
+def _expire(now):
+    # Sessions closed or expired without switching profiling off
+    global _expired_at
+    with _lock:
+        if now - _expired_at < 60:
+            return
+        _expired_at = now
+        for token in [token for token, seen in _sessions.items() if now - seen > SESSION_IDLE_SECONDS]:
+            del _sessions[token]
+
+
+def wanted(page):
+    if page in _pages:
+        return True
+    if not _sessions:
+        return False
+    now = time.monotonic()
+    token = st.session_state.get(SESSION_KEY)
+    if token in _sessions:
+        _sessions[token] = now
+        return True
+    _expire(now)
+    return False
+
+
+def start(func):
+    """Start sampling the current thread below ``func``, unless a sampler already runs."""
+    if _sampler.get() is not None:
+        return None
+    sampler = Sampler(func.__code__, threading.get_ident())
+    _sampler.set(sampler)
+    return sampler
+
+
+def stop(sampler, page):
+    _sampler.set(None)
+    return sampler.stop(page)
+
+
+def profiled_pages():
+    return sorted(_pages)
+
+
+def set_profiled_pages(pages):
+    with _lock:
+        _pages.clear()
+        _pages.update(pages)
+
+
+def session_enabled():
+    return st.session_state.get(SESSION_KEY) in _sessions
+
+
+def set_session_enabled(enabled):
+    if enabled == session_enabled():
+        return
+    with _lock:
+        if enabled:
+            token = st.session_state[SESSION_KEY] = uuid.uuid4().hex
+            _sessions[token] = time.monotonic()
+        else:
+            _sessions.pop(st.session_state.pop(SESSION_KEY, None), None)
+
+
+def read_profile(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def recent_profiles(limit=20):
+    """Newest profile files first."""
+    paths = glob.glob(os.path.join(PROFILE_DIR, "*.collapsed"))
+    return sorted(paths, key=os.path.getmtime, reverse=True)[:limit]
+
+
+def top_functions(paths, limit=25):
+    """Hottest (function, self samples, total samples) over collapsed files, and the sample count."""
+    own, total = Counter(), Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                frames = stack.split(";")
+                own[frames[-1]] += int(count)
+                for name in set(frames):
+                    total[name] += int(count)
+    rows = [(name, own[name], samples) for name, samples in total.most_common(limit)]
+    return rows, sum(own.values())
+
+
+def main(argv):
+    if len(argv) > 2 and argv[1] == "top":
+        rows, samples = top_functions(argv[2:])
+        if not samples:
+            print("No samples in these profiles.")
+            return 1
+        print(f"{'self %':>7} {'total %':>8}  function")
+        for name, own, total in rows:
+            print(f"{own * 100 / samples:>7.1f} {total * 100 / samples:>8.1f}  {name}")
+        return 0
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from database import db_connection
+
+
+QUERY_CACHE_TTL = float(os.environ.get("EHR_QUERY_CACHE_TTL", "300"))  # seconds
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("EHR_QUERY_CACHE_MAX_ENTRIES", "256"))
+
+
+class QueryCache:
+    """Read-through cache of query results keyed by (query, params).
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted once ``max_entries`` is reached. Every entry is tagged with the
+    tables it reads so a write can drop exactly the entries it affects.
+    """
+
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tags, rows)
+        self._keys_by_tag = {}
+        self._generations = {}  # bumped on every invalidation of a tag
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return True, entry[2]
+            if entry is not None:
+                self._remove(key)
+            self._stats["misses"] += 1
+            return False, None
+
+    def generation(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def put(self, key, rows, tags, generation=None, ttl=None):
+        with self._lock:
+            # A write landed while the rows were being loaded; don't cache them
+            if generation is not None and generation != tuple(self._generations.get(tag, 0) for tag in tags):
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires_at, tags, rows)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                hit_ratio=self._stats["hits"] / lookups if lookups else 0.0,
+            )
+
+
+# One cache per server process, shared across Streamlit sessions
+@st.cache_resource
+def get_query_cache():
+    return QueryCache()
+
+
+def cached_fetchall(query, params=(), tables=(), ttl=None, row_type=None):
+    """Run a SELECT through the query cache, loading it from MySQL on a miss.
+
+    ``tables`` lists the tables the query reads; pass the same names to
+    ``invalidate_tables`` after writing to them. With ``row_type`` the rows
+    are cached already built as that namedtuple.
+    """
+    cache = get_query_cache()
+    key = (query, tuple(params), row_type)
+    hit, rows = cache.get(key)
+    if hit:
+        return rows
+
+    tags = tuple(tables)
+    generation = cache.generation(tags)
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        cursor = conn.cursor()
+        cursor.execute(query, params or None)
+        rows = cursor.fetchall()
+    if row_type is not None:
+        rows = tuple(map(row_type._make, rows))
+    cache.put(key, rows, tags, generation=generation, ttl=ttl)
+    return rows
+
+
+def invalidate_tables(*tables):
+    get_query_cache().invalidate(*tables)
@@ -0,0 +1,1110 @@
+"""Data access for the EHR tables.
+
+Every SQL statement the app runs lives in STATEMENTS under a dotted name and
+is executed through a Repository, which checks a connection out of the pool,
+runs the statement and returns rows as namedtuples (plain tuples underneath,
+so a listing costs no per-row dict). pymysql interpolates parameters client
+side, so there is no server-side statement to prepare; the templates are
+built once at import and shared with migrate.py's plan check instead.
+
+The UI talks to the module-level instances: ``patients``, ``doctors``,
+``admins``, ``appointments``, ``medical_records``, ``billing``,
+``lab_tests``, ``test_results``, ``wallets``, ``availability``,
+``dashboard``, ``search``, ``timeline`` and ``worklist``.
+"""
+from collections import namedtuple
+from datetime import date
+
+import pymysql
+
+from availability import BookingResult, as_time, get_slot_index, slot_times
+from database import STREAM_CHUNK_ROWS, db_connection, stream_query
+from filters import build_filters, escape_like, name_condition
+from lab_assignments import assign_lab_tests
+from ledger import append_admin_entry, append_wallet_entry, fetch_admin_wallet_balance, fetch_wallet_balance
+from pagination import EMPTY_PAGE, PAGE_SIZES, fetch_keyset_page, keyset_page, keyset_query
+from payments import pay_bill_with_wallet
+from query_cache import cached_fetchall, invalidate_tables
+from scheduling import schedule_series
+from search import boolean_query, scope_conditions
+from summaries import count_appointment, count_bill, count_lab_tests
+from worklist import refresh_appointments, refresh_records, refresh_test, remove_appointment
+
+
+TYPEAHEAD_LIMIT = 20  # matches returned to a picker
+
+def patient_tag(patient_id):
+    """Query cache tag for everything cached about one patient (their timeline)."""
+    return f"Patient:{patient_id}"
+
+
+def invalidate_patients(*patient_ids):
+    if patient_ids:
+        invalidate_tables(*(patient_tag(patient_id) for patient_id in patient_ids))
+
+
+# Export bounds when no date range is given
+EARLIEST_DATE = date(1000, 1, 1)
+LATEST_DATE = date(9999, 12, 31)
+
+
+# Row types
+Credentials = namedtuple("Credentials", ["user_id", "password_hash", "first_name", "last_name", "email", "wallet_id"])
+PatientMatch = namedtuple("PatientMatch", ["patient_id", "first_name", "last_name", "email"])
+Doctor = namedtuple("Doctor", ["doctor_id", "first_name", "last_name", "specialization"])
+PatientAppointment = namedtuple("PatientAppointment", [
+    "appointment_id", "date", "time", "doctor_first_name", "doctor_last_name", "specialization", "doctor_id"])
+DoctorAppointment = namedtuple("DoctorAppointment", [
+    "appointment_id", "date", "time", "patient_first_name", "patient_last_name", "patient_email"])
+AdminAppointment = namedtuple("AdminAppointment", [
+    "appointment_id", "date", "time", "patient_first_name", "patient_last_name", "patient_email",
+    "doctor_first_name", "doctor_last_name", "specialization"])
+AppointmentOption = namedtuple("AppointmentOption", ["appointment_id", "patient_first_name", "date"])
+MedicalRecord = namedtuple("MedicalRecord", ["record_id", "prescription", "diagnosis", "test_taken"])
+DoctorMedicalRecord = namedtuple("DoctorMedicalRecord", [
+    "record_id", "patient_name", "appointment_date", "prescription", "diagnosis", "test_taken"])
+AdminMedicalRecord = namedtuple("AdminMedicalRecord", [
+    "record_id", "patient_name", "appointment_date", "doctor_name", "prescription", "diagnosis",
+    "test_taken", "appointment_time"])
+RecordWithTests = namedtuple("RecordWithTests", ["appointment_id", "record_id", "test_taken"])
+RecordOption = namedtuple("RecordOption", ["record_id", "appointment_date", "diagnosis"])
+FollowUpOption = namedtuple("FollowUpOption", [
+    "record_id", "patient_id", "patient_name", "appointment_date", "diagnosis"])
+DayRecord = namedtuple("DayRecord", ["record_id", "appointment_id", "patient_name"])
+LabTest = namedtuple("LabTest", ["lab_test_id", "test_name", "description", "cost", "created_at", "updated_at"])
+LabTestOption = namedtuple("LabTestOption", ["lab_test_id", "test_name"])
+WorklistItem = namedtuple("WorklistItem", [
+    "appointment_id", "date", "time", "patient_id", "patient_name", "records", "tests_pending", "bills"])
+PendingTest = namedtuple("PendingTest", ["test_id", "test_name", "record_id", "result"])
+PatientTestResult = namedtuple("PatientTestResult", [
+    "appointment_id", "appointment_date", "doctor_name", "test_name", "result"])
+Bill = namedtuple("Bill", ["billing_id", "total_amount", "payment_status"])
+AdminBill = namedtuple("AdminBill", [
+    "billing_id", "patient_name", "total_amount", "payment_status", "transaction_id", "diagnosis"])
+TimelineEvent = namedtuple("TimelineEvent", [
+    "date", "time", "kind", "ref_id", "title", "detail", "amount", "status"])
+RecordHit = namedtuple("RecordHit", [
+    "record_id", "appointment_date", "patient_name", "doctor_name", "diagnosis", "prescription", "score"])
+TestResultHit = namedtuple("TestResultHit", [
+    "test_id", "record_id", "appointment_date", "patient_name", "doctor_name", "test_name", "result", "score"])
+DoctorDay = namedtuple("DoctorDay", ["date", "doctor_name", "appointments"])
+BillingTotal = namedtuple("BillingTotal", ["payment_status", "bills", "amount"])
+LabTestCount = namedtuple("LabTestCount", ["test_name", "assigned"])
+RevenueDay = namedtuple("RevenueDay", ["day", "credits", "amount"])
+
+
+STATEMENTS = {
+    # Patient
+    "patients.insert": """
+        INSERT INTO Patient (FirstName, LastName, DOB, Address, PhoneNumber, Email, Password)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """,
+    "patients.id_by_email": "SELECT PatientID FROM Patient WHERE Email = %s",
+    "patients.credentials": """
+        SELECT p.PatientID, p.Password, p.FirstName, p.LastName, p.Email, w.WalletID
+        FROM Patient p LEFT JOIN Wallets w ON w.PatientID = p.PatientID
+        WHERE p.Email = %s
+    """,
+    "patients.update_password": "UPDATE Patient SET Password = %s WHERE PatientID = %s",
+    # Typeahead: one indexed condition (ID, email prefix or name prefix) is appended
+    "patients.search": "SELECT PatientID, FirstName, LastName, Email FROM Patient WHERE ",
+    # Appended to patients.search: only patients with an appointment with the doctor
+    "patients.search_of_doctor": """
+        EXISTS (SELECT 1 FROM Appointment a WHERE a.PatientID = Patient.PatientID AND a.DoctorID = %s)
+    """,
+
+    # Doctor
+    "doctors.insert": """
+        INSERT INTO Doctor (FirstName, LastName, Specialization, PhoneNumber, Email, Password)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """,
+    "doctors.all": "SELECT DoctorID, FirstName, LastName, Specialization FROM Doctor",
+    "doctors.credentials": """
+        SELECT DoctorID, Password, FirstName, LastName, Email, NULL FROM Doctor WHERE Email = %s
+    """,
+    "doctors.update_password": "UPDATE Doctor SET Password = %s WHERE DoctorID = %s",
+
+    # admin
+    "admins.insert": "INSERT INTO admin (Email, Password) VALUES (%s, %s)",
+    "admins.id_by_email": "SELECT id FROM admin WHERE Email = %s",
+    "admins.credentials": """
+        SELECT a.id, a.password, NULL, NULL, a.email, aw.WalletID
+        FROM admin a LEFT JOIN AdminWallets aw ON aw.id = a.id
+        WHERE a.Email = %s
+    """,
+    "admins.update_password": "UPDATE admin SET password = %s WHERE id = %s",
+
+    # Appointment
+    "appointments.insert": """
+        INSERT INTO Appointment (PatientID, DoctorID, AppointmentDate, AppointmentTime)
+        VALUES (%s, %s, %s, %s)
+    """,
+    "appointments.for_patient": """
+        SELECT a.AppointmentID, a.AppointmentDate, a.AppointmentTime,
+               d.FirstName, d.LastName, d.Specialization, a.DoctorID
+        FROM Appointment a
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        WHERE a.PatientID = %s
+        ORDER BY a.AppointmentDate DESC, a.AppointmentTime DESC
+    """,
+    "appointments.for_doctor": """
+        SELECT a.AppointmentID, a.AppointmentDate, a.AppointmentTime,
+               p.FirstName, p.LastName, p.Email
+        FROM Appointment a
+        JOIN Patient p ON a.PatientID = p.PatientID
+        WHERE a.DoctorID = %s
+        ORDER BY a.AppointmentDate DESC, a.AppointmentTime DESC
+    """,
+    "appointments.options_for_doctor": """
+        SELECT Appointment.AppointmentID, Patient.FirstName, Appointment.AppointmentDate
+        FROM Appointment
+        JOIN Patient ON Appointment.PatientID = Patient.PatientID
+        WHERE Appointment.DoctorID = %s
+    """,
+    # Paged with keyset on (date, time, id), so every page is an index range scan
+    "appointments.admin_page": """
+        SELECT a.AppointmentID, a.AppointmentDate, a.AppointmentTime,
+               p.FirstName, p.LastName, p.Email,
+               d.FirstName, d.LastName, d.Specialization
+        FROM Appointment a
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+    """,
+    "appointments.update": """
+        UPDATE Appointment SET AppointmentDate = %s, AppointmentTime = %s WHERE AppointmentID = %s
+    """,
+    "appointments.delete": "DELETE FROM Appointment WHERE AppointmentID = %s",
+    "appointments.slot_for_update": """
+        SELECT DoctorID, AppointmentDate, AppointmentTime, PatientID FROM Appointment
+        WHERE AppointmentID = %s FOR UPDATE
+    """,
+
+    # DoctorAvailability (read through availability.working_hours)
+    "availability.clear": "DELETE FROM DoctorAvailability WHERE DoctorID = %s",
+    "availability.insert": """
+        INSERT INTO DoctorAvailability (DoctorID, Weekday, StartTime, EndTime, SlotMinutes)
+        VALUES (%s, %s, %s, %s, %s)
+    """,
+
+    # MedicalRecord
+    "medical_records.insert": """
+        INSERT INTO MedicalRecord (AppointmentID, Prescription, Diagnosis, TestTaken)
+        VALUES (%s, %s, %s, %s)
+    """,
+    "medical_records.for_appointment": """
+        SELECT RecordID, Prescription, Diagnosis, TestTaken FROM MedicalRecord WHERE AppointmentID = %s
+    """,
+    "medical_records.for_doctor": """
+        SELECT MedicalRecord.RecordID,
+               CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName,
+               Appointment.AppointmentDate,
+               MedicalRecord.Prescription, MedicalRecord.Diagnosis, MedicalRecord.TestTaken
+        FROM MedicalRecord
+        JOIN Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
+        JOIN Patient ON Appointment.PatientID = Patient.PatientID
+        WHERE Appointment.DoctorID = %s
+    """,
+    "medical_records.for_patient": """
+        SELECT MedicalRecord.RecordID,
+               CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName,
+               Appointment.AppointmentDate,
+               MedicalRecord.Prescription, MedicalRecord.Diagnosis, MedicalRecord.TestTaken
+        FROM MedicalRecord
+        JOIN Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
+        JOIN Patient ON Appointment.PatientID = Patient.PatientID
+        WHERE Appointment.PatientID = %s
+    """,
+    "medical_records.follow_up_options": """
+        SELECT m.RecordID, a.PatientID, CONCAT(p.FirstName, ' ', p.LastName), a.AppointmentDate, m.Diagnosis
+        FROM Appointment a
+        JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        WHERE a.DoctorID = %s
+        ORDER BY a.AppointmentDate DESC, m.RecordID DESC
+    """,
+    "medical_records.for_doctor_on_day": """
+        SELECT m.RecordID, a.AppointmentID, CONCAT(p.FirstName, ' ', p.LastName)
+        FROM Appointment a
+        JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        WHERE a.DoctorID = %s AND a.AppointmentDate = %s
+        ORDER BY a.AppointmentTime
+    """,
+    "medical_records.admin_page": """
+        SELECT MedicalRecord.RecordID,
+               CONCAT(Patient.FirstName, ' ', Patient.LastName) AS PatientName,
+               Appointment.AppointmentDate,
+               CONCAT(Doctor.FirstName, ' ', Doctor.LastName) AS DoctorName,
+               MedicalRecord.Prescription, MedicalRecord.Diagnosis, MedicalRecord.TestTaken,
+               Appointment.AppointmentTime
+        FROM MedicalRecord
+        JOIN Appointment ON MedicalRecord.AppointmentID = Appointment.AppointmentID
+        JOIN Patient ON Appointment.PatientID = Patient.PatientID
+        JOIN Doctor ON Appointment.DoctorID = Doctor.DoctorID
+    """,
+    "medical_records.with_tests_for_doctor": """
+        SELECT m.AppointmentID, m.RecordID, m.TestTaken
+        FROM Appointment a
+        JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID AND m.TestTaken = TRUE
+        WHERE a.DoctorID = %s
+        ORDER BY a.AppointmentDate DESC, m.RecordID DESC
+    """,
+    "medical_records.options_for_patient": """
+        SELECT m.RecordID, a.AppointmentDate, m.Diagnosis
+        FROM Appointment a
+        JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+        WHERE a.PatientID = %s
+        ORDER BY a.AppointmentDate DESC, m.RecordID DESC
+    """,
+    "medical_records.update": """
+        UPDATE MedicalRecord SET Prescription = %s, Diagnosis = %s, TestTaken = %s WHERE RecordID = %s
+    """,
+    "medical_records.delete": "DELETE FROM MedicalRecord WHERE RecordID = %s",
+
+    # LabTests
+    "lab_tests.all": """
+        SELECT LabTestID, TestName, Description, Cost, CreatedAt, UpdatedAt
+        FROM LabTests
+        ORDER BY CreatedAt DESC
+    """,
+    "lab_tests.options": "SELECT LabTestID, TestName FROM LabTests",
+    "lab_tests.insert": "INSERT INTO LabTests (TestName, Description, Cost) VALUES (%s, %s, %s)",
+    "lab_tests.update": """
+        UPDATE LabTests SET TestName = %s, Description = %s, Cost = %s, UpdatedAt = NOW()
+        WHERE LabTestID = %s
+    """,
+    "lab_tests.delete": "DELETE FROM LabTests WHERE LabTestID = %s",
+
+    # TestResults
+    "test_results.insert": "INSERT INTO TestResults (RecordID, LabTestID, Result) VALUES (%s, %s, %s)",
+    # Only the doctor's worklist items with tests outstanding are joined
+    "test_results.pending_for_doctor": """
+        SELECT tr.TestID, lt.TestName, tr.RecordID, tr.Result
+        FROM DoctorWorklist w
+        JOIN MedicalRecord m ON m.AppointmentID = w.AppointmentID
+        JOIN TestResults tr ON tr.RecordID = m.RecordID
+        JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
+        WHERE w.DoctorID = %s AND w.TestsPending > 0 AND tr.Result IS NULL
+        ORDER BY w.AppointmentDate, w.AppointmentTime, tr.TestID
+    """,
+    "test_results.set_result": "UPDATE TestResults SET Result = %s WHERE TestID = %s",
+    "test_results.for_patient": """
+        SELECT a.AppointmentID, a.AppointmentDate,
+               CONCAT(d.FirstName, ' ', d.LastName) AS DoctorName,
+               lt.TestName, tr.Result
+        FROM TestResults tr
+        JOIN MedicalRecord mr ON tr.RecordID = mr.RecordID
+        JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
+        JOIN Appointment a ON mr.AppointmentID = a.AppointmentID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        WHERE a.PatientID = %s
+    """,
+
+    # Billing
+    "billing.insert": """
+        INSERT INTO Billing (PatientID, RecordID, TotalAmount, PaymentStatus, TransactionID)
+        VALUES (%s, %s, %s, %s, %s)
+    """,
+    "billing.unpaid_for_patient": """
+        SELECT BillingID, TotalAmount, PaymentStatus FROM Billing
+        WHERE PatientID = %s AND PaymentStatus = 'Pending'
+    """,
+    "billing.admin_page": """
+        SELECT b.BillingID, CONCAT(p.FirstName, ' ', p.LastName) AS PatientName,
+               b.TotalAmount, b.PaymentStatus, b.TransactionID, m.Diagnosis
+        FROM Billing b
+        JOIN Patient p ON b.PatientID = p.PatientID
+        JOIN MedicalRecord m ON b.RecordID = m.RecordID
+    """,
+
+    # Full-history exports, streamed (see database.stream_query); each is
+    # bounded by an appointment date range [from, to)
+    "appointments.export": """
+        SELECT a.AppointmentID, a.AppointmentDate, a.AppointmentTime,
+               a.PatientID, CONCAT(p.FirstName, ' ', p.LastName),
+               a.DoctorID, CONCAT(d.FirstName, ' ', d.LastName), d.Specialization
+        FROM Appointment a
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        WHERE a.AppointmentDate >= %s AND a.AppointmentDate < %s
+        ORDER BY a.AppointmentDate, a.AppointmentTime, a.AppointmentID
+    """,
+    "medical_records.export": """
+        SELECT m.RecordID, m.AppointmentID, a.AppointmentDate,
+               CONCAT(p.FirstName, ' ', p.LastName), CONCAT(d.FirstName, ' ', d.LastName),
+               m.Prescription, m.Diagnosis, m.TestTaken
+        FROM MedicalRecord m
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        WHERE a.AppointmentDate >= %s AND a.AppointmentDate < %s
+        ORDER BY a.AppointmentDate, a.AppointmentTime, m.RecordID
+    """,
+    "billing.export": """
+        SELECT b.BillingID, b.PatientID, CONCAT(p.FirstName, ' ', p.LastName), b.RecordID,
+               a.AppointmentDate, b.TotalAmount, b.PaymentStatus, b.TransactionID
+        FROM Billing b
+        JOIN Patient p ON b.PatientID = p.PatientID
+        JOIN MedicalRecord m ON b.RecordID = m.RecordID
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        WHERE a.AppointmentDate >= %s AND a.AppointmentDate < %s
+        ORDER BY a.AppointmentDate, a.AppointmentTime, b.BillingID
+    """,
+    "test_results.export": """
+        SELECT tr.TestID, tr.RecordID, a.AppointmentID, a.AppointmentDate,
+               CONCAT(p.FirstName, ' ', p.LastName), lt.TestName, tr.Result
+        FROM TestResults tr
+        JOIN MedicalRecord m ON tr.RecordID = m.RecordID
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
+        WHERE a.AppointmentDate >= %s AND a.AppointmentDate < %s
+        ORDER BY a.AppointmentDate, a.AppointmentTime, tr.TestID
+    """,
+
+    # Patient timeline: everything about one patient in one statement, each
+    # branch an index lookup on the patient. Takes the PatientID four times.
+    "timeline.events": """
+        SELECT * FROM (
+            SELECT a.AppointmentDate AS EventDate, a.AppointmentTime AS EventTime, 'appointment' AS Kind,
+                   a.AppointmentID AS RefID, CONCAT('Dr. ', d.FirstName, ' ', d.LastName) AS Title,
+                   d.Specialization AS Detail, NULL AS Amount, NULL AS Status
+            FROM Appointment a
+            JOIN Doctor d ON a.DoctorID = d.DoctorID
+            WHERE a.PatientID = %s
+            UNION ALL
+            SELECT a.AppointmentDate, a.AppointmentTime, 'record', m.RecordID, m.Diagnosis, m.Prescription,
+                   NULL, IF(m.TestTaken, 'Tests taken', NULL)
+            FROM Appointment a
+            JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+            WHERE a.PatientID = %s
+            UNION ALL
+            SELECT a.AppointmentDate, a.AppointmentTime, 'test', tr.TestID, lt.TestName, tr.Result,
+                   NULL, IF(tr.Result IS NULL, 'Pending', 'Completed')
+            FROM Appointment a
+            JOIN MedicalRecord m ON m.AppointmentID = a.AppointmentID
+            JOIN TestResults tr ON tr.RecordID = m.RecordID
+            JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
+            WHERE a.PatientID = %s
+            UNION ALL
+            SELECT a.AppointmentDate, a.AppointmentTime, 'bill', b.BillingID, CONCAT('Bill ', b.BillingID),
+                   m.Diagnosis, b.TotalAmount, b.PaymentStatus
+            FROM Billing b
+            JOIN MedicalRecord m ON b.RecordID = m.RecordID
+            JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+            WHERE b.PatientID = %s
+        ) events
+    """,
+    # Whose timeline a write touches
+    "timeline.patient_for_appointment": "SELECT PatientID FROM Appointment WHERE AppointmentID = %s",
+    "timeline.doctor_sees_patient": "SELECT 1 FROM Appointment WHERE PatientID = %s AND DoctorID = %s LIMIT 1",
+    "timeline.patients_for_records": """
+        SELECT DISTINCT a.PatientID FROM MedicalRecord m
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        WHERE m.RecordID IN
+    """,
+    "timeline.patient_for_test": """
+        SELECT a.PatientID FROM TestResults tr
+        JOIN MedicalRecord m ON tr.RecordID = m.RecordID
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        WHERE tr.TestID = %s
+    """,
+
+    # Full-text search (search.py); each takes the boolean-mode query twice,
+    # for the score and the filter. Scope and date conditions are appended.
+    "search.medical_records": """
+        SELECT m.RecordID, a.AppointmentDate, CONCAT(p.FirstName, ' ', p.LastName) AS PatientName,
+               CONCAT(d.FirstName, ' ', d.LastName) AS DoctorName, m.Diagnosis, m.Prescription,
+               MATCH (m.Diagnosis, m.Prescription) AGAINST (%s IN BOOLEAN MODE) AS Score
+        FROM MedicalRecord m
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        WHERE MATCH (m.Diagnosis, m.Prescription) AGAINST (%s IN BOOLEAN MODE)
+    """,
+    "search.test_results": """
+        SELECT tr.TestID, tr.RecordID, a.AppointmentDate, CONCAT(p.FirstName, ' ', p.LastName) AS PatientName,
+               CONCAT(d.FirstName, ' ', d.LastName) AS DoctorName, lt.TestName, tr.Result,
+               MATCH (tr.Result) AGAINST (%s IN BOOLEAN MODE) AS Score
+        FROM TestResults tr
+        JOIN MedicalRecord m ON tr.RecordID = m.RecordID
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        JOIN Patient p ON a.PatientID = p.PatientID
+        JOIN Doctor d ON a.DoctorID = d.DoctorID
+        JOIN LabTests lt ON tr.LabTestID = lt.LabTestID
+        WHERE MATCH (tr.Result) AGAINST (%s IN BOOLEAN MODE)
+    """,
+
+    # Doctor worklist (worklist.py): open items up to today plus all of today's
+    "worklist.for_doctor": """
+        SELECT AppointmentID, AppointmentDate, AppointmentTime, PatientID, PatientName,
+               Records, TestsPending, Bills
+        FROM DoctorWorklist
+        WHERE DoctorID = %s AND AppointmentDate <= %s AND (NOT Done OR AppointmentDate = %s)
+        ORDER BY AppointmentDate DESC, AppointmentTime
+    """,
+    "medical_records.appointment_of": "SELECT AppointmentID FROM MedicalRecord WHERE RecordID = %s",
+
+    # Admin dashboard; reads only the summary tables kept by summaries.py
+    "dashboard.appointments_by_doctor": """
+        SELECT s.AppointmentDate, CONCAT(d.FirstName, ' ', d.LastName), s.Appointments
+        FROM DailyDoctorAppointments s
+        JOIN Doctor d ON s.DoctorID = d.DoctorID
+        WHERE s.AppointmentDate >= %s AND s.AppointmentDate < %s AND s.Appointments > 0
+        ORDER BY s.AppointmentDate, d.LastName, d.FirstName
+    """,
+    "dashboard.billing": """
+        SELECT PaymentStatus, SUM(Bills), SUM(Amount) FROM BillingSummary
+        GROUP BY PaymentStatus ORDER BY PaymentStatus
+    """,
+    "dashboard.lab_test_volume": """
+        SELECT lt.TestName, v.Assigned
+        FROM LabTestVolume v
+        JOIN LabTests lt ON v.LabTestID = lt.LabTestID
+        WHERE v.Assigned > 0
+        ORDER BY v.Assigned DESC, lt.TestName
+    """,
+    "dashboard.revenue": """
+        SELECT Day, SUM(Credits), SUM(Amount) FROM AdminRevenueDaily
+        WHERE Day >= %s AND Day < %s
+        GROUP BY Day ORDER BY Day
+    """,
+    "dashboard.revenue_refreshed_at": "SELECT RefreshedAt FROM SummaryWatermarks WHERE Name = 'AdminRevenueDaily'",
+
+    # Wallets
+    "wallets.insert": "INSERT INTO Wallets (PatientID, Balance) VALUES (%s, 0)",
+    "wallets.insert_admin": "INSERT INTO AdminWallets (id, Balance) VALUES (%s, 0)",
+}
+
+
+class Repository:
+    """Runs named statements on a pooled connection.
+
+    Reads return ``[]`` / ``None`` and writes ``False`` / ``None`` when the
+    database is unavailable or the statement fails; the error is printed.
+    ``tables`` names the query cache tags a successful write invalidates.
+    """
+
+    tables = ()
+
+    def _fetchall(self, name, params=(), row_type=None):
+        with db_connection() as conn:
+            if conn is None:
+                return []
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STATEMENTS[name], params or None)
+                rows = cursor.fetchall()
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                return []
+        return list(map(row_type._make, rows)) if row_type else list(rows)
+
+    def _fetchone(self, name, params=(), row_type=None):
+        with db_connection() as conn:
+            if conn is None:
+                return None
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STATEMENTS[name], params or None)
+                row = cursor.fetchone()
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                return None
+        if row is None or row_type is None:
+            return row
+        return row_type._make(row)
+
+    def _cached(self, name, params=(), row_type=None):
+        try:
+            return cached_fetchall(STATEMENTS[name], params, tables=self.tables, row_type=row_type)
+        except Exception as e:
+            print(f"Error running {name}: {e}")
+            return []
+
+    def _execute(self, name, params=(), background=False):
+        """Run a write and commit it; returns the new row's ID for inserts, True otherwise."""
+        with db_connection(background) as conn:
+            if conn is None:
+                return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STATEMENTS[name], params)
+                conn.commit()
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                return False
+        if self.tables:
+            invalidate_tables(*self.tables)
+        return cursor.lastrowid or True
+
+    def _transaction(self, name, work):
+        """Run ``work(cursor)`` as one transaction; True once committed, False on error."""
+        with db_connection() as conn:
+            if conn is None:
+                return False
+            cursor = conn.cursor()
+            try:
+                conn.begin()
+                work(cursor)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error running {name}: {e}")
+                return False
+        if self.tables:
+            invalidate_tables(*self.tables)
+        return True
+
+    def _patients_of(self, name, params=()):
+        return [row[0] for row in self._fetchall(name, params)]
+
+    def _patients_of_records(self, record_ids):
+        record_ids = sorted(set(record_ids))
+        if not record_ids:
+            return []
+        query = STATEMENTS["timeline.patients_for_records"] + "(" + ", ".join(["%s"] * len(record_ids)) + ")"
+        with db_connection() as conn:
+            if conn is None:
+                return []
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, record_ids)
+                return [row[0] for row in cursor.fetchall()]
+            except Exception as e:
+                print(f"Error running timeline.patients_for_records: {e}")
+                return []
+
+    def _stream(self, name, params=(), chunk_size=STREAM_CHUNK_ROWS):
+        """Generator of row chunks read through an unbuffered server-side cursor."""
+        return stream_query(STATEMENTS[name], params, chunk_size)
+
+    def _export(self, name, date_from=None, date_to=None, chunk_size=STREAM_CHUNK_ROWS):
+        return self._stream(name, (date_from or EARLIEST_DATE, date_to or LATEST_DATE), chunk_size)
+
+    def _page(self, name, key_columns, key_of, row_type, page_size, after, before, where=(), params=()):
+        with db_connection() as conn:
+            if conn is None:
+                return EMPTY_PAGE
+            try:
+                return fetch_keyset_page(
+                    conn.cursor(), STATEMENTS[name], key_columns, key_of, page_size,
+                    after=after, before=before, where=where, params=params, row_type=row_type,
+                )
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                return EMPTY_PAGE
+
+
+class AccountRepository(Repository):
+    prefix = None
+
+    def credentials(self, email):
+        return self._fetchone(f"{self.prefix}.credentials", (email,), Credentials)
+
+    def update_password(self, user_id, hashed_pw, background=False):
+        return bool(self._execute(f"{self.prefix}.update_password", (hashed_pw, user_id), background))
+
+
+class PatientRepository(AccountRepository):
+    prefix = "patients"
+
+    def create(self, first_name, last_name, dob, address, phone, email, hashed_pw):
+        return bool(self._execute("patients.insert", (first_name, last_name, dob, address, phone, email, hashed_pw)))
+
+    def id_for_email(self, email):
+        row = self._fetchone("patients.id_by_email", (email,))
+        return row[0] if row else None
+
+    def search(self, term, limit=TYPEAHEAD_LIMIT, doctor_id=None):
+        """Top ``limit`` patients matching an ID, an email prefix or a name prefix.
+
+        With ``doctor_id``, only patients who have an appointment with that doctor.
+        """
+        term = term.strip()
+        if not term:
+            return []
+        if term.isdigit():
+            condition, params = "PatientID = %s", [int(term)]
+        elif "@" in term:
+            condition, params = "Email LIKE %s", [escape_like(term) + "%"]
+        else:
+            condition, params = name_condition("FirstName", "LastName", term)
+        if doctor_id is not None:
+            condition = f"({condition}) AND {STATEMENTS['patients.search_of_doctor'].strip()}"
+            params = [*params, doctor_id]
+        query = STATEMENTS["patients.search"] + condition + " ORDER BY LastName, FirstName, PatientID LIMIT %s"
+        with db_connection() as conn:
+            if conn is None:
+                return []
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, [*params, limit])
+                rows = cursor.fetchall()
+            except Exception as e:
+                print(f"Error running patients.search: {e}")
+                return []
+        return list(map(PatientMatch._make, rows))
+
+
+class DoctorRepository(AccountRepository):
+    prefix = "doctors"
+    tables = ("Doctor",)
+
+    def create(self, first_name, last_name, specialization, phone, email, hashed_pw):
+        return bool(self._execute("doctors.insert", (first_name, last_name, specialization, phone, email, hashed_pw)))
+
+    def all(self):
+        return self._cached("doctors.all", row_type=Doctor)
+
+
+class AdminRepository(AccountRepository):
+    prefix = "admins"
+
+    def create(self, email, hashed_pw):
+        return bool(self._execute("admins.insert", (email, hashed_pw)))
+
+    def id_for_email(self, email):
+        row = self._fetchone("admins.id_by_email", (email,))
+        return row[0] if row else None
+
+
+DUPLICATE_KEY = 1062
+
+SLOT_TAKEN = BookingResult("slot_taken", None, "That slot has just been booked. Please pick another time.")
+NOT_WORKING = BookingResult("unavailable", None, "The doctor does not work at that time.")
+
+
+class AppointmentRepository(Repository):
+    """Appointments; bookings go through the Appointment unique slot key
+    and keep the shared SlotIndex (availability.py) current."""
+
+    def _book(self, name, work, status="booked"):
+        """Run a booking transaction. ``work(cursor)`` returns a BookingResult
+        to reject (and roll back) or the (appointment_id, patient_id, doctor_id,
+        old_slot, new_slot) it booked, a slot being a (date, time) pair or None."""
+        with db_connection() as conn:
+            if conn is None:
+                return BookingResult("error", None, "Could not connect to the database.")
+            cursor = conn.cursor()
+            try:
+                conn.begin()
+                outcome = work(cursor)
+                if isinstance(outcome, BookingResult):
+                    conn.rollback()
+                    return outcome
+                conn.commit()
+            except pymysql.IntegrityError as err:
+                conn.rollback()
+                if err.args and err.args[0] == DUPLICATE_KEY:
+                    return SLOT_TAKEN
+                print(f"Error running {name}: {err}")
+                return BookingResult("error", None, "The appointment could not be saved.")
+            except Exception as e:
+                conn.rollback()
+                print(f"Error running {name}: {e}")
+                return BookingResult("error", None, "The appointment could not be saved.")
+
+        appointment_id, patient_id, doctor_id, old_slot, new_slot = outcome
+        invalidate_patients(patient_id)
+        index = get_slot_index()
+        if old_slot is not None:
+            index.remove(doctor_id, *old_slot)
+        if new_slot is not None:
+            index.add(doctor_id, *new_slot)
+        return BookingResult(status, appointment_id, "Appointment saved.")
+
+    def book(self, patient_id, doctor_id, day, slot):
+        """Book one of the doctor's slots; returns an availability.BookingResult."""
+        slot = as_time(slot)
+        if slot not in slot_times(doctor_id, day):
+            return NOT_WORKING
+
+        def work(cursor):
+            cursor.execute(STATEMENTS["appointments.insert"], (patient_id, doctor_id, day, slot))
+            appointment_id = cursor.lastrowid
+            count_appointment(cursor, appointment_id, 1)
+            refresh_appointments(cursor, [appointment_id])
+            return appointment_id, patient_id, doctor_id, None, (day, slot)
+        result = self._book("appointments.insert", work)
+        if result is SLOT_TAKEN:
+            get_slot_index().invalidate(doctor_id)  # booked elsewhere; reload on next read
+        return result
+
+    def for_patient(self, patient_id):
+        return self._fetchall("appointments.for_patient", (patient_id,), PatientAppointment)
+
+    def for_doctor(self, doctor_id):
+        return self._fetchall("appointments.for_doctor", (doctor_id,), DoctorAppointment)
+
+    def options_for_doctor(self, doctor_id):
+        return self._fetchall("appointments.options_for_doctor", (doctor_id,), AppointmentOption)
+
+    def page(self, page_size=PAGE_SIZES[0], after=None, before=None,
+             patient_name=None, doctor_name=None, date_from=None, date_to=None):
+        where, params = build_filters(patient_name, doctor_name, date_from, date_to)
+        return self._page(
+            "appointments.admin_page",
+            ["a.AppointmentDate", "a.AppointmentTime", "a.AppointmentID"],
+            lambda appt: (appt.date, appt.time, appt.appointment_id),
+            AdminAppointment, page_size, after, before, where, params,
+        )
+
+    def export(self, date_from=None, date_to=None, chunk_size=STREAM_CHUNK_ROWS):
+        return self._export("appointments.export", date_from, date_to, chunk_size)
+
+    def schedule_series(self, patient_id, doctor_id, first_date, slot, occurrences, interval_days=7,
+                        record_id=None, skip_conflicts=False):
+        """Book a recurring or follow-up series; see scheduling.schedule_series."""
+        result = schedule_series(patient_id, doctor_id, first_date, slot, occurrences, interval_days,
+                                 record_id, skip_conflicts)
+        if result.series_id is not None:
+            invalidate_patients(patient_id)
+        return result
+
+    def reschedule(self, appointment_id, doctor_id, new_date, new_time):
+        """Move an appointment to another slot of the same doctor; returns a BookingResult."""
+        new_time = as_time(new_time)
+        if new_time not in slot_times(doctor_id, new_date):
+            return NOT_WORKING
+
+        def work(cursor):
+            cursor.execute(STATEMENTS["appointments.slot_for_update"], (appointment_id,))
+            row = cursor.fetchone()
+            if row is None or row[0] != doctor_id:
+                return BookingResult("not_found", None, "Appointment not found.")
+            _, old_date, old_time, patient_id = row
+            count_appointment(cursor, appointment_id, -1)
+            cursor.execute(STATEMENTS["appointments.update"], (new_date, new_time, appointment_id))
+            count_appointment(cursor, appointment_id, 1)
+            refresh_appointments(cursor, [appointment_id])
+            return appointment_id, patient_id, doctor_id, (old_date, old_time), (new_date, new_time)
+        result = self._book("appointments.update", work)
+        if result is SLOT_TAKEN:
+            get_slot_index().invalidate(doctor_id)
+        return result
+
+    def delete(self, appointment_id):
+        def work(cursor):
+            cursor.execute(STATEMENTS["appointments.slot_for_update"], (appointment_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return BookingResult("not_found", None, "Appointment not found.")
+            count_appointment(cursor, appointment_id, -1)
+            remove_appointment(cursor, appointment_id)
+            cursor.execute(STATEMENTS["appointments.delete"], (appointment_id,))
+            return appointment_id, row[3], row[0], (row[1], row[2]), None
+        return self._book("appointments.delete", work, status="cancelled").status == "cancelled"
+
+
+class AvailabilityRepository(Repository):
+    tables = ("DoctorAvailability",)
+
+    def set_hours(self, doctor_id, shifts):
+        """Replace the doctor's working hours with ``shifts`` (availability.Shift)."""
+        def work(cursor):
+            cursor.execute(STATEMENTS["availability.clear"], (doctor_id,))
+            if shifts:
+                cursor.executemany(STATEMENTS["availability.insert"], [
+                    (doctor_id, shift.weekday, shift.start, shift.end, shift.slot_minutes) for shift in shifts
+                ])
+        return self._transaction("availability.insert", work)
+
+
+class MedicalRecordRepository(Repository):
+    def create(self, appointment_id, prescription, diagnosis, test_taken):
+        def work(cursor):
+            cursor.execute(STATEMENTS["medical_records.insert"], (appointment_id, prescription, diagnosis, test_taken))
+            refresh_appointments(cursor, [appointment_id])
+        success = self._transaction("medical_records.insert", work)
+        if success:
+            invalidate_patients(*self._patients_of("timeline.patient_for_appointment", (appointment_id,)))
+        return success
+
+    def for_appointment(self, appointment_id):
+        return self._fetchall("medical_records.for_appointment", (appointment_id,), MedicalRecord)
+
+    def for_doctor(self, doctor_id):
+        return self._fetchall("medical_records.for_doctor", (doctor_id,), DoctorMedicalRecord)
+
+    def for_patient(self, patient_id):
+        return self._fetchall("medical_records.for_patient", (patient_id,), DoctorMedicalRecord)
+
+    def follow_up_options(self, doctor_id):
+        return self._fetchall("medical_records.follow_up_options", (doctor_id,), FollowUpOption)
+
+    def for_doctor_on_day(self, doctor_id, day):
+        return self._fetchall("medical_records.for_doctor_on_day", (doctor_id, day), DayRecord)
+
+    def page(self, page_size=PAGE_SIZES[0], after=None, before=None,
+             patient_name=None, doctor_name=None, date_from=None, date_to=None):
+        where, params = build_filters(
+            patient_name, doctor_name, date_from, date_to,
+            patient_columns=("Patient.FirstName", "Patient.LastName"),
+            doctor_columns=("Doctor.FirstName", "Doctor.LastName"),
+            date_column="Appointment.AppointmentDate",
+        )
+        return self._page(
+            "medical_records.admin_page",
+            ["Appointment.AppointmentDate", "Appointment.AppointmentTime", "MedicalRecord.RecordID"],
+            lambda record: (record.appointment_date, record.appointment_time, record.record_id),
+            AdminMedicalRecord, page_size, after, before, where, params,
+        )
+
+    def export(self, date_from=None, date_to=None, chunk_size=STREAM_CHUNK_ROWS):
+        return self._export("medical_records.export", date_from, date_to, chunk_size)
+
+    def with_tests_for_doctor(self, doctor_id):
+        return self._fetchall("medical_records.with_tests_for_doctor", (doctor_id,), RecordWithTests)
+
+    def options_for_patient(self, patient_id):
+        return self._fetchall("medical_records.options_for_patient", (patient_id,), RecordOption)
+
+    def update(self, record_id, prescription, diagnosis, test_taken):
+        success = bool(self._execute("medical_records.update", (prescription, diagnosis, test_taken, record_id)))
+        if success:
+            invalidate_patients(*self._patients_of_records([record_id]))
+        return success
+
+    def delete(self, record_id):
+        patient_ids = self._patients_of_records([record_id])
+
+        def work(cursor):
+            cursor.execute(STATEMENTS["medical_records.appointment_of"], (record_id,))
+            appointment_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(STATEMENTS["medical_records.delete"], (record_id,))
+            refresh_appointments(cursor, appointment_ids)
+        success = self._transaction("medical_records.delete", work)
+        if success:
+            invalidate_patients(*patient_ids)
+        return success
+
+
+class LabTestRepository(Repository):
+    tables = ("LabTests",)
+
+    def all(self):
+        return self._cached("lab_tests.all", row_type=LabTest)
+
+    def options(self):
+        return self._cached("lab_tests.options", row_type=LabTestOption)
+
+    def create(self, test_name, description, cost):
+        return bool(self._execute("lab_tests.insert", (test_name, description, cost)))
+
+    def update(self, lab_test_id, test_name, description, cost):
+        return bool(self._execute("lab_tests.update", (test_name, description, cost, lab_test_id)))
+
+    def delete(self, lab_test_id):
+        return bool(self._execute("lab_tests.delete", (lab_test_id,)))
+
+
+class TestResultRepository(Repository):
+    def assign(self, pairs):
+        """Assign (record_id, lab_test_id) pairs in bulk; see lab_assignments.assign_lab_tests."""
+        pairs = list(pairs)
+        result = assign_lab_tests(pairs)
+        if result.assigned:
+            invalidate_patients(*self._patients_of_records(record_id for record_id, _ in pairs))
+        return result
+
+    def add(self, record_id, lab_test_id, result):
+        def work(cursor):
+            cursor.execute(STATEMENTS["test_results.insert"], (record_id, lab_test_id, result))
+            count_lab_tests(cursor, [lab_test_id])
+            refresh_records(cursor, [record_id])
+        success = self._transaction("test_results.insert", work)
+        if success:
+            invalidate_patients(*self._patients_of_records([record_id]))
+        return success
+
+    def pending_for_doctor(self, doctor_id):
+        return self._fetchall("test_results.pending_for_doctor", (doctor_id,), PendingTest)
+
+    def set_result(self, test_id, result):
+        def work(cursor):
+            cursor.execute(STATEMENTS["test_results.set_result"], (result, test_id))
+            refresh_test(cursor, test_id)
+        success = self._transaction("test_results.set_result", work)
+        if success:
+            invalidate_patients(*self._patients_of("timeline.patient_for_test", (test_id,)))
+        return success
+
+    def for_patient(self, patient_id):
+        return self._fetchall("test_results.for_patient", (patient_id,), PatientTestResult)
+
+    def export(self, date_from=None, date_to=None, chunk_size=STREAM_CHUNK_ROWS):
+        return self._export("test_results.export", date_from, date_to, chunk_size)
+
+
+class BillingRepository(Repository):
+    def create(self, patient_id, record_id, total_amount, payment_status, transaction_id):
+        def work(cursor):
+            cursor.execute(
+                STATEMENTS["billing.insert"], (patient_id, record_id, total_amount, payment_status, transaction_id))
+            count_bill(cursor, cursor.lastrowid, payment_status, total_amount)
+            refresh_records(cursor, [record_id])
+        success = self._transaction("billing.insert", work)
+        if success:
+            invalidate_patients(patient_id)
+        return success
+
+    def unpaid_for_patient(self, patient_id):
+        return self._fetchall("billing.unpaid_for_patient", (patient_id,), Bill)
+
+    def page(self, page_size=PAGE_SIZES[0], after=None, before=None):
+        return self._page(
+            "billing.admin_page", ["b.BillingID"], lambda bill: (bill.billing_id,),
+            AdminBill, page_size, after, before,
+        )
+
+    def export(self, date_from=None, date_to=None, chunk_size=STREAM_CHUNK_ROWS):
+        return self._export("billing.export", date_from, date_to, chunk_size)
+
+
+class WalletRepository(Repository):
+    """Patient and admin wallets. Balances are ledger based (see ledger.py)."""
+
+    def create(self, patient_id, initial_balance=0.0):
+        # The snapshot starts at zero; any opening balance is a ledger entry
+        created = []
+
+        def work(cursor):
+            cursor.execute(STATEMENTS["wallets.insert"], (patient_id,))
+            created.append(cursor.lastrowid)
+            if initial_balance:
+                append_wallet_entry(cursor, cursor.lastrowid, initial_balance, "Opening balance")
+
+        return created[0] if self._transaction("wallets.insert", work) else None
+
+    def create_admin(self, admin_id):
+        wallet_id = self._execute("wallets.insert_admin", (admin_id,))
+        return wallet_id or None
+
+    def balance(self, patient_id):
+        return fetch_wallet_balance(patient_id)
+
+    def admin_balance(self, wallet_id):
+        return fetch_admin_wallet_balance(wallet_id)
+
+    def top_up(self, wallet_id, amount):
+        return self._transaction(
+            "wallets.top_up", lambda cursor: append_wallet_entry(cursor, wallet_id, amount, "Wallet top-up"))
+
+    def top_up_admin(self, wallet_id, amount):
+        return self._transaction(
+            "wallets.top_up_admin", lambda cursor: append_admin_entry(cursor, wallet_id, amount, "Admin top-up"))
+
+    def pay_bill(self, patient_id, billing_id, idempotency_key=None):
+        """Pay a bill from the patient's wallet; returns a payments.PaymentResult."""
+        result = pay_bill_with_wallet(patient_id, billing_id, idempotency_key)
+        if result.status == "paid":
+            invalidate_patients(patient_id)
+        return result
+
+
+class WorklistRepository(Repository):
+    def for_doctor(self, doctor_id, today=None):
+        """The doctor's worklist from DoctorWorklist; see worklist.py."""
+        today = today or date.today()
+        return self._fetchall("worklist.for_doctor", (doctor_id, today, today), WorklistItem)
+
+
+class TimelineRepository(Repository):
+    """A patient's appointments, records, tests and bills as one history.
+
+    Pages are cached per patient (tag ``Patient:<id>``); every write that
+    touches a patient's data invalidates that patient's pages only. Doctors
+    only see patients they have an appointment with, as in search.
+    """
+
+    def page(self, patient_id, page_size=PAGE_SIZES[0], after=None, before=None, doctor_id=None):
+        if doctor_id is not None and not self._fetchone("timeline.doctor_sees_patient", (patient_id, doctor_id)):
+            return EMPTY_PAGE
+        key_columns = ["events.EventDate", "events.EventTime", "events.Kind", "events.RefID"]
+        query, values = keyset_query(
+            STATEMENTS["timeline.events"].rstrip(), key_columns, page_size, after, before,
+            params=[patient_id] * 4,
+        )
+        try:
+            rows = cached_fetchall(query, values, tables=(patient_tag(patient_id),), row_type=TimelineEvent)
+        except Exception as e:
+            print(f"Error running timeline.events: {e}")
+            return EMPTY_PAGE
+        return keyset_page(rows, lambda event: (event.date, event.time, event.kind, event.ref_id),
+                           page_size, after, before)
+
+
+class SearchRepository(Repository):
+    """Ranked full-text search, limited to what the caller's role may see."""
+
+    def _search(self, name, id_column, row_type, text, role, user_id, page_size, after, before,
+                date_from, date_to):
+        query = boolean_query(text)
+        if query is None:
+            return EMPTY_PAGE
+        conditions, params = scope_conditions(role, user_id)
+        where, date_params = build_filters(date_from=date_from, date_to=date_to)
+        inner = STATEMENTS[name].rstrip() + "".join(f"\n  AND {condition}" for condition in conditions + where)
+        # Rank in a derived table so the pager can use (Score, id) as its key
+        select = f"SELECT * FROM ({inner}) hits"
+        with db_connection() as conn:
+            if conn is None:
+                return EMPTY_PAGE
+            try:
+                return fetch_keyset_page(
+                    conn.cursor(), select, ["hits.Score", f"hits.{id_column}"],
+                    lambda hit: (hit.score, hit[0]), page_size,
+                    after=after, before=before, params=[query, query, *params, *date_params], row_type=row_type,
+                )
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                return EMPTY_PAGE
+
+    def medical_records(self, text, role, user_id, page_size=PAGE_SIZES[0], after=None, before=None,
+                        date_from=None, date_to=None):
+        return self._search("search.medical_records", "RecordID", RecordHit, text, role, user_id,
+                            page_size, after, before, date_from, date_to)
+
+    def test_results(self, text, role, user_id, page_size=PAGE_SIZES[0], after=None, before=None,
+                     date_from=None, date_to=None):
+        return self._search("search.test_results", "TestID", TestResultHit, text, role, user_id,
+                            page_size, after, before, date_from, date_to)
+
+
+class DashboardRepository(Repository):
+    """Admin dashboard figures; each read touches summary rows only."""
+
+    def appointments_by_doctor(self, date_from, date_to):
+        return self._fetchall("dashboard.appointments_by_doctor", (date_from, date_to), DoctorDay)
+
+    def billing(self):
+        return self._fetchall("dashboard.billing", row_type=BillingTotal)
+
+    def lab_test_volume(self):
+        return self._fetchall("dashboard.lab_test_volume", row_type=LabTestCount)
+
+    def revenue(self, date_from, date_to):
+        return self._fetchall("dashboard.revenue", (date_from, date_to), RevenueDay)
+
+    def revenue_refreshed_at(self):
+        row = self._fetchone("dashboard.revenue_refreshed_at")
+        return row[0] if row else None
+
+
+patients = PatientRepository()
+doctors = DoctorRepository()
+admins = AdminRepository()
+appointments = AppointmentRepository()
+medical_records = MedicalRecordRepository()
+billing = BillingRepository()
+lab_tests = LabTestRepository()
+test_results = TestResultRepository()
+wallets = WalletRepository()
+availability = AvailabilityRepository()
+dashboard = DashboardRepository()
+search = SearchRepository()
+timeline = TimelineRepository()
+worklist = WorklistRepository()
+
+ACCOUNTS = {"Patient": patients, "Doctor": doctors, "Admin": admins}
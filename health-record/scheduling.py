@@ -0,0 +1,122 @@
+"""Recurring and follow-up appointment series.
+
+schedule_series() books a whole course of visits in one operation, for
+example weekly physiotherapy for 12 weeks, optionally linked to the
+MedicalRecord it follows up on. Every planned slot is checked against the
+doctor's working hours and the SlotIndex in a single pass. The series row
+and all of its appointments are then written in one transaction with one
+multi-row INSERT; the dashboard counts and the doctor's worklist are each
+updated with one upsert.
+The Appointment unique slot key still guards against a concurrent booking
+that the index had not seen yet; in that case nothing is written.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pymysql
+
+from availability import as_time, get_slot_index, slot_times
+from database import db_connection
+from summaries import count_series
+from worklist import refresh_series
+
+
+MAX_SERIES_OCCURRENCES = 52
+DUPLICATE_KEY = 1062
+
+PlannedVisit = namedtuple("PlannedVisit", ["date", "time", "conflict"])
+SeriesResult = namedtuple("SeriesResult", ["series_id", "appointment_ids", "skipped", "error"])
+
+
+def plan_series(doctor_id, first_date, slot, occurrences, interval_days=7, now=None):
+    """The visits of a series, each with the reason it can't be booked (or None)."""
+    slot = as_time(slot)
+    now = now or datetime.now()
+    index = get_slot_index()
+    visits = []
+    for number in range(occurrences):
+        day = first_date + timedelta(days=interval_days * number)
+        if datetime.combine(day, slot) <= now:
+            conflict = "in the past"
+        elif slot not in slot_times(doctor_id, day):
+            conflict = "outside working hours"
+        elif slot in index.booked(doctor_id, day):
+            conflict = "already booked"
+        else:
+            conflict = None
+        visits.append(PlannedVisit(day, slot, conflict))
+    return visits
+
+
+def _series_origin(cursor, record_id):
+    cursor.execute("""
+        SELECT a.PatientID, a.DoctorID FROM MedicalRecord m
+        JOIN Appointment a ON m.AppointmentID = a.AppointmentID
+        WHERE m.RecordID = %s
+    """, (record_id,))
+    return cursor.fetchone()
+
+
+def schedule_series(patient_id, doctor_id, first_date, slot, occurrences, interval_days=7,
+                    record_id=None, skip_conflicts=False):
+    """Book ``occurrences`` visits every ``interval_days`` starting at ``first_date``.
+
+    Returns a SeriesResult. Unless ``skip_conflicts`` is set, a single
+    unbookable visit rejects the whole series; with it, those visits are
+    left out and listed in ``skipped``.
+    """
+    if not 1 <= occurrences <= MAX_SERIES_OCCURRENCES:
+        return SeriesResult(None, [], [], f"A series has 1 to {MAX_SERIES_OCCURRENCES} visits.")
+    if interval_days < 1:
+        return SeriesResult(None, [], [], "Visits must be at least a day apart.")
+
+    visits = plan_series(doctor_id, first_date, slot, occurrences, interval_days)
+    skipped = [visit for visit in visits if visit.conflict]
+    bookable = [visit for visit in visits if not visit.conflict]
+    if skipped and not skip_conflicts:
+        return SeriesResult(None, [], skipped, "Some visits can't be booked.")
+    if not bookable:
+        return SeriesResult(None, [], skipped, "None of the visits can be booked.")
+
+    with db_connection() as conn:
+        if conn is None:
+            return SeriesResult(None, [], skipped, "Could not connect to the database.")
+        cursor = conn.cursor()
+        try:
+            conn.begin()
+            if record_id is not None:
+                origin = _series_origin(cursor, record_id)
+                if origin is None or origin != (patient_id, doctor_id):
+                    conn.rollback()
+                    return SeriesResult(None, [], skipped, "The medical record does not belong to this patient and doctor.")
+            cursor.execute(
+                "INSERT INTO AppointmentSeries (PatientID, DoctorID, RecordID, IntervalDays, Occurrences) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                (patient_id, doctor_id, record_id, interval_days, len(bookable)),
+            )
+            series_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO Appointment (PatientID, DoctorID, AppointmentDate, AppointmentTime, SeriesID) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(patient_id, doctor_id, visit.date, visit.time, series_id) for visit in bookable],
+            )
+            count_series(cursor, series_id)
+            refresh_series(cursor, series_id)
+            cursor.execute(
+                "SELECT AppointmentID FROM Appointment WHERE SeriesID = %s ORDER BY AppointmentDate",
+                (series_id,),
+            )
+            appointment_ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+        except pymysql.MySQLError as err:
+            conn.rollback()
+            if err.args and err.args[0] == DUPLICATE_KEY:
+                get_slot_index().invalidate(doctor_id)  # booked elsewhere meanwhile
+                return SeriesResult(None, [], skipped, "A visit was just booked by someone else. Please review the plan again.")
+            print(f"Error scheduling series: {err}")
+            return SeriesResult(None, [], skipped, f"Error scheduling series: {err}")
+
+    index = get_slot_index()
+    for visit in bookable:
+        index.add(doctor_id, visit.date, visit.time)
+    return SeriesResult(series_id, appointment_ids, skipped, None)
@@ -0,0 +1,35 @@
+"""Helpers for ranked full-text search over medical records and test results.
+
+Searches run against the FULLTEXT indexes from migrations/0008 in boolean
+mode: every word the user types must appear (as a word or word prefix) and
+rows are ranked by MySQL's relevance score. Results are scoped by role and
+paged by keyset on (score, id), see SearchRepository in repositories.py.
+"""
+import re
+
+
+# Characters with a meaning in boolean mode; user input is matched literally
+_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+MIN_WORD_LENGTH = 3  # innodb_ft_min_token_size
+
+
+def boolean_query(text):
+    """Turn free text into a boolean-mode query requiring every word as a prefix.
+
+    Returns None when no word is long enough to be in the index.
+    """
+    words = [word for word in _OPERATORS.sub(" ", text).split() if len(word) >= MIN_WORD_LENGTH]
+    if not words:
+        return None
+    return " ".join(f"+{word}*" for word in words)
+
+
+def scope_conditions(role, user_id, doctor_column="a.DoctorID", patient_column="a.PatientID"):
+    """WHERE conditions limiting a search to what ``role`` may see."""
+    if role == "Admin":
+        return [], []
+    if role == "Doctor":
+        return [f"{doctor_column} = %s"], [user_id]
+    if role == "Patient":
+        return [f"{patient_column} = %s"], [user_id]
+    return ["FALSE"], []
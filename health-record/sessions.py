@@ -0,0 +1,129 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+import streamlit as st
+
+
+# Set EHR_SESSION_SECRET to keep tokens valid across restarts and server processes
+SESSION_SECRET = (os.environ.get("EHR_SESSION_SECRET") or secrets.token_hex(32)).encode("utf-8")
+SESSION_TTL = float(os.environ.get("EHR_SESSION_TTL", str(8 * 60 * 60)))  # seconds
+
+ROLE_PERMISSIONS = {
+    "Patient": frozenset({"appointments:own", "records:own", "tests:own", "wallet:own"}),
+    "Doctor": frozenset({"appointments:assigned", "records:write", "records:search", "tests:write", "billing:write",
+                         "availability:own"}),
+    "Admin": frozenset({"appointments:all", "records:all", "records:search", "lab_tests:manage", "billing:all",
+                        "admin_wallet", "diagnostics"}),
+}
+
+
+class UserSession:
+    """Identity resolved once at login and read from memory on every rerun."""
+
+    __slots__ = ("session_id", "token", "user_id", "role", "profile", "wallet_id", "permissions", "expires_at")
+
+    def __init__(self, session_id, user_id, role, profile, wallet_id, expires_at):
+        self.session_id = session_id
+        self.token = f"{session_id}.{_sign(session_id)}"
+        self.user_id = user_id
+        self.role = role
+        self.profile = profile
+        self.wallet_id = wallet_id
+        self.permissions = ROLE_PERMISSIONS.get(role, frozenset())
+        self.expires_at = expires_at
+
+    def has_permission(self, permission):
+        return permission in self.permissions
+
+    @property
+    def display_name(self):
+        name = " ".join(part for part in (self.profile.get("first_name"), self.profile.get("last_name")) if part)
+        return name or self.profile.get("email") or self.role
+
+
+def _sign(session_id):
+    return hmac.new(SESSION_SECRET, session_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class SessionStore:
+    """Server-side session registry; removing an entry revokes its token."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, user_id, role, profile=None, wallet_id=None):
+        session_id = secrets.token_urlsafe(24)
+        session = UserSession(session_id, user_id, role, profile or {}, wallet_id, time.time() + self.ttl)
+        with self._lock:
+            self._purge_expired()
+            self._sessions[session_id] = session
+        return session
+
+    def get(self, token):
+        if not token or "." not in token:
+            return None
+        session_id, signature = token.rsplit(".", 1)
+        if not hmac.compare_digest(signature, _sign(session_id)):
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.expires_at <= time.time():
+                del self._sessions[session_id]
+                return None
+            return session
+
+    def revoke(self, token):
+        if token and "." in token:
+            with self._lock:
+                self._sessions.pop(token.rsplit(".", 1)[0], None)
+
+    def active_count(self):
+        with self._lock:
+            self._purge_expired()
+            return len(self._sessions)
+
+    def _purge_expired(self):
+        now = time.time()
+        for session_id in [sid for sid, s in self._sessions.items() if s.expires_at <= now]:
+            del self._sessions[session_id]
+
+
+# One registry per server process, shared across Streamlit sessions
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+
+def bind_session(session):
+    """Attach a session's token to the current browser session."""
+    st.session_state["session_token"] = session.token
+    st.session_state["logged_in"] = True
+    st.session_state["user_id"] = session.user_id
+    st.session_state["role"] = session.role
+    return session
+
+
+def current_session():
+    return get_session_store().get(st.session_state.get("session_token"))
+
+
+def authorized_session(permission):
+    """The current session if it grants ``permission``, else None."""
+    session = current_session()
+    if session is None or not session.has_permission(permission):
+        return None
+    return session
+
+
+def end_session():
+    get_session_store().revoke(st.session_state.get("session_token"))
+    st.session_state["session_token"] = None
+    st.session_state["logged_in"] = False
+    st.session_state["user_id"] = None
+    st.session_state["role"] = None
@@ -0,0 +1,204 @@
+"""Incrementally maintained summaries behind the admin dashboard.
+
+Writes keep their summary rows current in the same transaction, through
+the helpers below, so the dashboard reads a handful of summary rows
+instead of scanning history:
+
+    DailyDoctorAppointments  appointments per doctor per day
+    BillingSummary           bills and amounts per PaymentStatus, spread over BILLING_SLOTS rows
+    LabTestVolume            assignments per lab test
+
+Admin revenue comes from the append-only AdminWalletCredits ledger, so
+instead of adding a write to every payment it is folded into
+AdminRevenueDaily by a delta job from a watermark. Only bill payments
+(credits with a BillingID) count as revenue; manual admin top-ups move
+the watermark but are not summed:
+
+    python summaries.py refresh   fold settled admin payment credits into AdminRevenueDaily
+    python summaries.py check     compare every summary with its source tables; exit 1 on drift
+"""
+import sys
+from collections import Counter, namedtuple
+
+import pymysql
+
+from database import db_connection
+from ledger import SETTLE_SECONDS
+
+
+# Must match the BillingID % 16 backfill in migrations/0005_dashboard_summaries.sql
+BILLING_SLOTS = 16
+REFRESH_BATCH = 10000  # credits folded per transaction
+
+SummaryDrift = namedtuple("SummaryDrift", ["summary", "key", "summary_value", "source_value"])
+
+
+def count_appointment(cursor, appointment_id, delta):
+    """Add ``delta`` (+1 / -1) to the day of an existing appointment.
+
+    Call with -1 before deleting or moving it and +1 after inserting or
+    moving it, inside the same transaction.
+    """
+    cursor.execute("""
+        INSERT INTO DailyDoctorAppointments (DoctorID, AppointmentDate, Appointments)
+        SELECT DoctorID, AppointmentDate, %s FROM Appointment WHERE AppointmentID = %s
+        ON DUPLICATE KEY UPDATE Appointments = Appointments + VALUES(Appointments)
+    """, (delta, appointment_id))
+
+
+def count_series(cursor, series_id):
+    """Count every appointment of a just inserted series in one statement."""
+    cursor.execute("""
+        INSERT INTO DailyDoctorAppointments (DoctorID, AppointmentDate, Appointments)
+        SELECT DoctorID, AppointmentDate, COUNT(*) FROM Appointment WHERE SeriesID = %s
+        GROUP BY DoctorID, AppointmentDate
+        ON DUPLICATE KEY UPDATE Appointments = Appointments + VALUES(Appointments)
+    """, (series_id,))
+
+
+def count_bill(cursor, billing_id, payment_status, amount, delta=1):
+    cursor.execute("""
+        INSERT INTO BillingSummary (PaymentStatus, Slot, Bills, Amount) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE Bills = Bills + VALUES(Bills), Amount = Amount + VALUES(Amount)
+    """, (payment_status, billing_id % BILLING_SLOTS, delta, (amount or 0) * delta))
+
+
+def count_payment(cursor, billing_id, amount):
+    """Move a bill from Pending to Completed."""
+    count_bill(cursor, billing_id, "Pending", amount, -1)
+    count_bill(cursor, billing_id, "Completed", amount)
+
+
+def count_lab_tests(cursor, lab_test_ids):
+    """Add one assignment per entry of ``lab_test_ids`` in a single statement."""
+    counts = sorted(Counter(lab_test_ids).items())
+    if not counts:
+        return
+    cursor.execute(
+        "INSERT INTO LabTestVolume (LabTestID, Assigned) VALUES "
+        + ", ".join(["(%s, %s)"] * len(counts))
+        + " ON DUPLICATE KEY UPDATE Assigned = Assigned + VALUES(Assigned)",
+        [value for pair in counts for value in pair],
+    )
+
+
+def refresh_revenue(batch_size=REFRESH_BATCH):
+    """Fold settled payment credits past the watermark into AdminRevenueDaily.
+
+    Each batch moves the watermark in the same transaction as the sums, so a
+    crashed run is simply resumed. Returns the number of credits folded.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        folded = 0
+        while True:
+            try:
+                conn.begin()
+                cursor.execute(
+                    "SELECT LastID FROM SummaryWatermarks WHERE Name = 'AdminRevenueDaily' FOR UPDATE")
+                row = cursor.fetchone()
+                last_id = row[0] if row else 0
+                cursor.execute("""
+                    SELECT CreditID FROM AdminWalletCredits
+                    WHERE CreditID > %s AND CreatedAt < NOW() - INTERVAL %s SECOND
+                    ORDER BY CreditID LIMIT %s
+                """, (last_id, SETTLE_SECONDS, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    conn.commit()
+                    return folded
+                cursor.execute("""
+                    INSERT INTO AdminRevenueDaily (WalletID, Day, Credits, Amount)
+                    SELECT WalletID, DATE(CreatedAt), COUNT(*), SUM(Amount)
+                    FROM AdminWalletCredits WHERE CreditID > %s AND CreditID <= %s AND BillingID IS NOT NULL
+                    GROUP BY WalletID, DATE(CreatedAt)
+                    ON DUPLICATE KEY UPDATE Credits = Credits + VALUES(Credits), Amount = Amount + VALUES(Amount)
+                """, (last_id, ids[-1]))
+                cursor.execute("""
+                    INSERT INTO SummaryWatermarks (Name, LastID, RefreshedAt) VALUES ('AdminRevenueDaily', %s, NOW())
+                    ON DUPLICATE KEY UPDATE LastID = VALUES(LastID), RefreshedAt = VALUES(RefreshedAt)
+                """, (ids[-1],))
+                conn.commit()
+                folded += len(ids)
+            except pymysql.MySQLError as err:
+                conn.rollback()
+                print(f"Error refreshing AdminRevenueDaily: {err}")
+                return folded
+
+
+# summary name, key columns, summary query, source query; both return (key..., value)
+CHECKS = [
+    ("DailyDoctorAppointments", 2,
+     "SELECT DoctorID, AppointmentDate, Appointments FROM DailyDoctorAppointments WHERE Appointments <> 0",
+     "SELECT DoctorID, AppointmentDate, COUNT(*) FROM Appointment GROUP BY DoctorID, AppointmentDate"),
+    ("BillingSummary.Bills", 1,
+     "SELECT PaymentStatus, SUM(Bills) FROM BillingSummary GROUP BY PaymentStatus HAVING SUM(Bills) <> 0",
+     "SELECT PaymentStatus, COUNT(*) FROM Billing GROUP BY PaymentStatus"),
+    ("BillingSummary.Amount", 1,
+     "SELECT PaymentStatus, SUM(Amount) FROM BillingSummary GROUP BY PaymentStatus "
+     "HAVING SUM(Bills) <> 0 OR SUM(Amount) <> 0",
+     "SELECT PaymentStatus, COALESCE(SUM(TotalAmount), 0) FROM Billing GROUP BY PaymentStatus"),
+    ("LabTestVolume", 1,
+     "SELECT LabTestID, Assigned FROM LabTestVolume WHERE Assigned <> 0",
+     "SELECT LabTestID, COUNT(*) FROM TestResults WHERE LabTestID IS NOT NULL GROUP BY LabTestID"),
+    ("AdminRevenueDaily.Credits", 2,
+     "SELECT WalletID, Day, Credits FROM AdminRevenueDaily",
+     """SELECT c.WalletID, DATE(c.CreatedAt), COUNT(*) FROM AdminWalletCredits c
+        JOIN SummaryWatermarks w ON w.Name = 'AdminRevenueDaily' AND c.CreditID <= w.LastID
+        WHERE c.BillingID IS NOT NULL
+        GROUP BY c.WalletID, DATE(c.CreatedAt)"""),
+    ("AdminRevenueDaily.Amount", 2,
+     "SELECT WalletID, Day, Amount FROM AdminRevenueDaily",
+     """SELECT c.WalletID, DATE(c.CreatedAt), SUM(c.Amount) FROM AdminWalletCredits c
+        JOIN SummaryWatermarks w ON w.Name = 'AdminRevenueDaily' AND c.CreditID <= w.LastID
+        WHERE c.BillingID IS NOT NULL
+        GROUP BY c.WalletID, DATE(c.CreatedAt)"""),
+]
+
+
+def check():
+    """Summaries whose values differ from a full aggregate of their source tables.
+
+    This is the one O(history) operation; run it off-peak.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        drifted = []
+        for summary, width, summary_query, source_query in CHECKS:
+            cursor.execute(summary_query)
+            summarized = {row[:width]: row[width] for row in cursor.fetchall()}
+            cursor.execute(source_query)
+            source = {row[:width]: row[width] for row in cursor.fetchall()}
+            for key in sorted(set(summarized) | set(source), key=str):
+                if summarized.get(key, 0) != source.get(key, 0):
+                    drifted.append(SummaryDrift(summary, key, summarized.get(key, 0), source.get(key, 0)))
+        conn.commit()
+        return drifted
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command == "refresh":
+        print(f"AdminRevenueDaily: folded {refresh_revenue()} admin credits")
+    elif command == "check":
+        drifted = check()
+        if drifted is None:
+            print("Could not connect to the database.")
+            return 1
+        for drift in drifted:
+            print(f"DRIFT  {drift.summary} {drift.key}: summary {drift.summary_value}, source {drift.source_value}")
+        if drifted:
+            return 1
+        print("All summaries match their source tables.")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,113 @@
+"""Per-doctor worklist read model.
+
+DoctorWorklist holds one row per appointment with the patient's name and
+how far its paperwork has got (medical records written, lab tests still
+waiting for a result, bills raised). A doctor's worklist is then a single
+range read on (DoctorID, AppointmentDate) instead of joins across
+Appointment, Patient, MedicalRecord, TestResults and Billing.
+
+Writes call refresh_appointments() and friends in their own transaction.
+The refresh recomputes the touched appointments' rows from the source
+tables with indexed lookups, so a row is never off by a missed delta, and
+it re-creates rows that were pruned when an old item is reopened.
+
+    python worklist.py prune   remove finished items from before today
+"""
+import sys
+from datetime import date
+
+import pymysql
+
+from database import db_connection
+
+
+# Recompute the rows of the appointments matching {condition}
+_REFRESH = """
+    INSERT INTO DoctorWorklist
+        (AppointmentID, DoctorID, AppointmentDate, AppointmentTime, PatientID, PatientName,
+         Records, TestsPending, Bills)
+    SELECT a.AppointmentID, a.DoctorID, a.AppointmentDate, a.AppointmentTime, a.PatientID,
+           CONCAT(p.FirstName, ' ', p.LastName),
+           (SELECT COUNT(*) FROM MedicalRecord m WHERE m.AppointmentID = a.AppointmentID),
+           (SELECT COUNT(*) FROM MedicalRecord m JOIN TestResults tr ON tr.RecordID = m.RecordID
+            WHERE m.AppointmentID = a.AppointmentID AND tr.Result IS NULL),
+           (SELECT COUNT(*) FROM MedicalRecord m JOIN Billing b ON b.RecordID = m.RecordID
+            WHERE m.AppointmentID = a.AppointmentID)
+    FROM Appointment a
+    JOIN Patient p ON a.PatientID = p.PatientID
+    WHERE {condition}
+    ON DUPLICATE KEY UPDATE
+        DoctorID = VALUES(DoctorID), AppointmentDate = VALUES(AppointmentDate),
+        AppointmentTime = VALUES(AppointmentTime), Records = VALUES(Records),
+        TestsPending = VALUES(TestsPending), Bills = VALUES(Bills)
+"""
+
+
+def _placeholders(values):
+    return "(" + ", ".join(["%s"] * len(values)) + ")"
+
+
+def refresh_appointments(cursor, appointment_ids):
+    """Bring the worklist rows of ``appointment_ids`` up to date."""
+    appointment_ids = sorted(set(appointment_ids))
+    if appointment_ids:
+        cursor.execute(
+            _REFRESH.format(condition="a.AppointmentID IN " + _placeholders(appointment_ids)), appointment_ids)
+
+
+def refresh_series(cursor, series_id):
+    cursor.execute(_REFRESH.format(condition="a.SeriesID = %s"), (series_id,))
+
+
+def refresh_records(cursor, record_ids):
+    """Refresh the appointments of existing medical records."""
+    record_ids = sorted(set(record_ids))
+    if record_ids:
+        cursor.execute(
+            "SELECT DISTINCT AppointmentID FROM MedicalRecord WHERE RecordID IN " + _placeholders(record_ids),
+            record_ids,
+        )
+        refresh_appointments(cursor, [row[0] for row in cursor.fetchall()])
+
+
+def refresh_test(cursor, test_id):
+    cursor.execute("SELECT RecordID FROM TestResults WHERE TestID = %s", (test_id,))
+    refresh_records(cursor, [row[0] for row in cursor.fetchall()])
+
+
+def remove_appointment(cursor, appointment_id):
+    cursor.execute("DELETE FROM DoctorWorklist WHERE AppointmentID = %s", (appointment_id,))
+
+
+def prune(today=None):
+    """Delete finished items from before ``today``; returns how many went."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM DoctorWorklist WHERE Done AND AppointmentDate < %s",
+                           (today or date.today(),))
+            conn.commit()
+        except pymysql.MySQLError as err:
+            conn.rollback()
+            print(f"Error pruning DoctorWorklist: {err}")
+            return None
+        return cursor.rowcount
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command == "prune":
+        pruned = prune()
+        if pruned is None:
+            return 1
+        print(f"DoctorWorklist: removed {pruned} finished items")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))